@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from dotenv import load_dotenv
+
+from e2b_desktop import AsyncSandbox
+
+# Load environment variables
+load_dotenv()
+
+
+async def run_agent(index: int):
+    start_time = time.time()
+    desktop = await AsyncSandbox.create()
+    print(f"[{index}] Sandbox creation time: {time.time() - start_time:.3f}s")
+
+    try:
+        screen_size = await desktop.get_screen_size()
+        print(f"[{index}] Screen size:", screen_size)
+
+        await desktop.move_mouse(100, 100)
+        await desktop.left_click()
+        print(f"[{index}] Cursor position:", await desktop.get_cursor_position())
+
+        screenshot = await desktop.screenshot("bytes")
+        with open(f"{index}.png", "wb") as f:
+            f.write(screenshot)
+    finally:
+        await desktop.kill()
+
+
+async def main():
+    print("Starting desktop sandboxes...")
+    await asyncio.gather(*(run_agent(i) for i in range(3)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Measure how many bytes incremental screenshots save compared to full
+screenshots on typical desktop workloads.
+
+Every step runs an action and then captures the screen twice: once with
+`screenshot()` and once with `screenshot_delta()`. The reassembled delta frame
+is checked against the full frame.
+
+Usage: poetry run python benchmarks/delta_screenshots.py
+"""
+
+import base64
+import io
+import time
+
+from dotenv import load_dotenv
+from PIL import Image, ImageChops
+
+from e2b_desktop import FrameAssembler, Sandbox
+
+load_dotenv()
+
+
+def run_workload(desktop: Sandbox, name: str, actions) -> None:
+    frames = FrameAssembler()
+    full_bytes, delta_bytes, delta_ms, full_ms = 0, 0, 0.0, 0.0
+
+    for action in actions:
+        action()
+
+        start = time.perf_counter()
+        delta = desktop.screenshot_delta(since=frames.hash, include_pointer=False)
+        delta_ms += (time.perf_counter() - start) * 1000
+        delta_bytes += delta.transferred_bytes
+        image = frames.apply(delta)
+
+        start = time.perf_counter()
+        full = desktop.screenshot(include_pointer=False)
+        full_ms += (time.perf_counter() - start) * 1000
+        # Count the base64 encoded size, the way it's transferred
+        full_bytes += len(base64.b64encode(full))
+
+        reference = Image.open(io.BytesIO(full)).convert("RGB")
+        if ImageChops.difference(reference, image).getbbox() is not None:
+            print("  warning: reassembled frame differs from the full screenshot")
+
+    saved = 100 * (1 - delta_bytes / full_bytes)
+    steps = len(actions)
+    print(
+        f"{name:<16} full {full_bytes / 1024:9.1f} KiB ({full_ms / steps:6.1f} ms/frame)   "
+        f"delta {delta_bytes / 1024:9.1f} KiB ({delta_ms / steps:6.1f} ms/frame)   "
+        f"saved {saved:5.1f} %"
+    )
+
+
+def main() -> None:
+    desktop = Sandbox.create()
+    try:
+        time.sleep(5)
+
+        run_workload(desktop, "idle", [lambda: time.sleep(0.5)] * 10)
+        run_workload(
+            desktop,
+            "mouse moves",
+            [
+                lambda i=i: desktop.move_mouse(100 + i * 40, 100 + i * 20)
+                for i in range(10)
+            ],
+        )
+
+        desktop.files.write("/home/user/bench.txt", "")
+        desktop.launch("gedit", "/home/user/bench.txt")
+        desktop.wait(3000)
+        run_workload(
+            desktop,
+            "typing",
+            [lambda: desktop.write("The quick brown fox ", delay_in_ms=10)] * 10,
+        )
+        run_workload(
+            desktop,
+            "scrolling",
+            [lambda: desktop.press("enter")] * 5
+            + [lambda: desktop.scroll("up", 3), lambda: desktop.scroll("down", 3)] * 3,
+        )
+    finally:
+        desktop.kill()
+
+
+if __name__ == "__main__":
+    main()
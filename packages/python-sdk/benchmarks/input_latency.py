@@ -0,0 +1,79 @@
+"""
+Compare the latency of mouse and keyboard actions sent through `xdotool`
+(one process per action) with the persistent input server.
+
+Usage: poetry run python benchmarks/input_latency.py [iterations]
+"""
+
+import sys
+import time
+from statistics import mean, median
+
+from dotenv import load_dotenv
+
+from e2b_desktop import Sandbox
+
+load_dotenv()
+
+
+def measure(label: str, action, iterations: int) -> None:
+    durations = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        action(i)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    durations.sort()
+    p95 = durations[int(len(durations) * 0.95) - 1]
+    print(
+        f"{label:<32} mean {mean(durations):7.1f} ms   "
+        f"median {median(durations):7.1f} ms   p95 {p95:7.1f} ms"
+    )
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    desktop = Sandbox.create(input_server=True)
+    input_server = desktop._input_server
+    assert input_server is not None
+
+    try:
+        print(f"{iterations} iterations per action\n")
+
+        measure(
+            "move_mouse (xdotool)",
+            lambda i: desktop.commands.run(f"xdotool mousemove --sync {i} {i}"),
+            iterations,
+        )
+        measure(
+            "move_mouse (input server)",
+            lambda i: input_server.send(["move", i, i]),
+            iterations,
+        )
+        measure(
+            "get_cursor_position (xdotool)",
+            lambda i: desktop.commands.run("xdotool getmouselocation"),
+            iterations,
+        )
+        measure(
+            "get_cursor_position (server)",
+            lambda i: input_server.send(["location"]),
+            iterations,
+        )
+        measure(
+            "press (xdotool)",
+            lambda i: desktop.commands.run("xdotool key shift"),
+            iterations,
+        )
+        measure(
+            "press (input server)",
+            lambda i: input_server.send(["key", "Shift_L"]),
+            iterations,
+        )
+    finally:
+        desktop.kill()
+
+
+if __name__ == "__main__":
+    main()
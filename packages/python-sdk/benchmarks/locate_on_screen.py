@@ -0,0 +1,115 @@
+"""
+Compare finding an image on the screen inside the sandbox with
+`locate_on_screen()` against the client-side approach: a full `screenshot()`
+transferred as PNG, decoded and searched on the client.
+
+Both run the same normalized cross-correlation, the one of the `locate.py`
+sandbox program, so the difference is the transfer and decoding of the
+screenshot. The needle is cropped from the screen, a 48x48 block with a lot of
+detail. The first `locate_on_screen()` call also uploads the needle and is
+reported separately.
+
+The client-side search uses numpy from the dev dependencies.
+
+Usage: poetry run python benchmarks/locate_on_screen.py [iterations]
+"""
+
+import importlib.util
+import io
+import sys
+import time
+from pathlib import Path
+from statistics import median
+
+import numpy as np
+from dotenv import load_dotenv
+from PIL import Image
+
+from e2b_desktop import Sandbox
+
+load_dotenv()
+
+SCRIPT = Path(__file__).parent.parent / "e2b_desktop" / "scripts" / "locate.py"
+NEEDLE_SIZE = 48
+
+
+def load_matcher():
+    spec = importlib.util.spec_from_file_location("locate_script", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def detailed_needle(screen: np.ndarray) -> tuple:
+    """
+    The block of the screen whose pixels vary the most, so it's found in one place only.
+    """
+    blocks = [
+        (screen[y : y + NEEDLE_SIZE, x : x + NEEDLE_SIZE].std(), x, y)
+        for y in range(0, screen.shape[0] - NEEDLE_SIZE, NEEDLE_SIZE)
+        for x in range(0, screen.shape[1] - NEEDLE_SIZE, NEEDLE_SIZE)
+    ]
+    _, x, y = max(blocks)
+    return x, y
+
+
+def locate_on_client(desktop: Sandbox, matcher, needle: np.ndarray) -> tuple:
+    png = desktop.screenshot(include_pointer=False)
+    screen = np.asarray(Image.open(io.BytesIO(png)).convert("RGB"))
+    scores = matcher.match_scores(
+        matcher.prepare(screen, False), matcher.prepare(needle, False)
+    )
+    (x, y, _), *_ = matcher.best_matches(scores, NEEDLE_SIZE, NEEDLE_SIZE, 0.9, 1)
+    return x, y, len(png)
+
+
+def report(label: str, durations: list, transferred: str) -> None:
+    print(
+        f"{label:<22} median {median(durations):7.1f} ms   "
+        f"min {min(durations):7.1f} ms   {transferred}"
+    )
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    matcher = load_matcher()
+    desktop = Sandbox.create()
+    try:
+        desktop.wait_until_stable(quiet_ms=1000, timeout=30)
+        screen = np.asarray(
+            Image.open(io.BytesIO(desktop.screenshot(include_pointer=False))).convert(
+                "RGB"
+            )
+        )
+        x, y = detailed_needle(screen)
+        needle = screen[y : y + NEEDLE_SIZE, x : x + NEEDLE_SIZE]
+        data = io.BytesIO()
+        Image.fromarray(needle).save(data, format="PNG")
+        print(f"needle at ({x}, {y}), {len(data.getvalue())} bytes as PNG")
+
+        start = time.perf_counter()
+        match = desktop.locate_on_screen(data.getvalue())
+        report("sandbox, first call", [(time.perf_counter() - start) * 1000], "")
+        assert match and (match.x, match.y) == (x, y), match
+
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            match = desktop.locate_on_screen(data.getvalue())
+            durations.append((time.perf_counter() - start) * 1000)
+        report("sandbox", durations, "only the match is transferred")
+
+        durations, sizes = [], []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            found_x, found_y, size = locate_on_client(desktop, matcher, needle)
+            durations.append((time.perf_counter() - start) * 1000)
+            sizes.append(size)
+        assert (found_x, found_y) == (x, y)
+        report("client", durations, f"{median(sizes) / 1024:.1f} KiB PNG per search")
+    finally:
+        desktop.kill()
+
+
+if __name__ == "__main__":
+    main()
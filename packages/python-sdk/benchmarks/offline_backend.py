@@ -0,0 +1,272 @@
+"""
+Local stand-in for the sandbox's `commands` and `files`, so the SDK can be
+benchmarked without network access.
+
+By default commands are only recorded and answered with canned output. With
+`execute=True` they run in a local shell instead, e.g. against a local Xvfb.
+Either way every request is counted and timed, so the time the SDK spends on
+its own can be told apart from the time spent waiting for the sandbox.
+"""
+
+import base64
+import io
+import json
+import os
+import re
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from e2b import CommandExitException, CommandResult, Sandbox as SandboxBase
+from e2b.connection_config import ConnectionConfig
+from packaging.version import Version
+from PIL import Image
+
+from e2b_desktop import Sandbox
+
+
+def _blank_png(width: int = 1024, height: int = 768) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (58, 110, 165)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+_SCREENSHOT = base64.b64encode(_blank_png()).decode()
+
+_BOOT_OUTPUT = (
+    '{"phase": "x11", "ms": 0.0}\n'
+    '{"phase": "session_started", "ms": 0.0, "pid": 1}\n'
+    '{"phase": "session", "ms": 0.0}\n'
+)
+
+
+def _input_payload(cmd: str, files: "LocalFiles") -> str:
+    batch = re.search(r"--batch (?:'(.*)'|@(\S+))$", cmd, re.S)
+    ops = json.loads(batch.group(1) or files.read(batch.group(2)))
+    results = [[512, 384] if op[0] == "location" else None for op in ops]
+    return json.dumps({"results": results, "timings": [0.0] * len(ops)})
+
+
+def _screenshot_file(cmd: str, files: "LocalFiles") -> str:
+    # ffmpeg writes the image to the path at the end of the command
+    files._files[cmd.rsplit(" ", 1)[1]] = base64.b64decode(_SCREENSHOT)
+    return ""
+
+
+# Canned output of the commands the SDK runs, matched by the start of the command
+_RESPONSES = [
+    ("python3 -c", lambda cmd, files: _BOOT_OUTPUT),
+    ("set -o pipefail; ffmpeg", lambda cmd, files: _SCREENSHOT),
+    ("ffmpeg", _screenshot_file),
+    ("python3 /tmp/.e2b_desktop/", _input_payload),
+    ("xdotool getmouselocation", lambda cmd, files: "x:512 y:384 screen:0 window:1"),
+    ("xrandr", lambda cmd, files: "Screen 0: minimum 8 x 8, current 1024x768"),
+]
+
+
+@dataclass
+class BackendStats:
+    requests: int = 0
+    """Number of requests the SDK made to the sandbox."""
+    remote_ms: float = 0.0
+    """Time spent inside the backend, in milliseconds."""
+    bytes_received: int = 0
+    """Size of the command output and the files read, as transferred."""
+    commands: List[str] = field(default_factory=list)
+
+
+class LocalHandle:
+    """
+    Handle of a background command, with the parts of `CommandHandle` the SDK uses.
+    """
+
+    def __init__(self, process: Optional[subprocess.Popen], output: str = ""):
+        self._process = process
+        self._output = output
+        self.pid = process.pid if process else 0
+
+    def __iter__(self):
+        if self._process is None:
+            yield self._output, None, None
+            return
+        for line in self._process.stdout:
+            yield line, None, None
+
+    def wait(self) -> CommandResult:
+        if self._process is None:
+            return CommandResult(
+                stdout=self._output, stderr="", exit_code=0, error=None
+            )
+        stdout, stderr = self._process.communicate()
+        return CommandResult(
+            stdout=stdout or "",
+            stderr=stderr or "",
+            exit_code=self._process.returncode,
+            error=None,
+        )
+
+    def disconnect(self) -> None:
+        pass
+
+    def kill(self) -> bool:
+        if self._process is not None:
+            self._process.kill()
+        return True
+
+
+class LocalCommands:
+    """
+    Stand-in for `Sandbox.commands`.
+
+    :param execute: Run the commands in a local shell instead of answering them with canned output.
+    """
+
+    def __init__(
+        self,
+        stats: BackendStats,
+        execute: bool = False,
+        envs=None,
+        files: Optional["LocalFiles"] = None,
+    ):
+        self._stats = stats
+        self._execute = execute
+        self._envs = {**os.environ, **(envs or {})}
+        self._files = files
+
+    def _canned(self, cmd: str) -> str:
+        for prefix, response in _RESPONSES:
+            if cmd.startswith(prefix):
+                return response(cmd, self._files)
+        return ""
+
+    def run(self, cmd: str, background: bool = False, envs=None, **opts):
+        start = time.perf_counter()
+        self._stats.requests += 1
+        self._stats.commands.append(cmd)
+        try:
+            # The desktop is booted by the benchmark itself, never by the SDK
+            if not self._execute or cmd.startswith("python3 -c"):
+                output = self._canned(cmd)
+                if background:
+                    return LocalHandle(None, output)
+                self._stats.bytes_received += len(output)
+                return CommandResult(stdout=output, stderr="", exit_code=0, error=None)
+
+            process = subprocess.Popen(
+                ["bash", "-c", cmd],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env={**self._envs, **(envs or {})},
+                text=True,
+            )
+            handle = LocalHandle(process)
+            if background:
+                return handle
+            result = handle.wait()
+            self._stats.bytes_received += len(result.stdout)
+            if result.exit_code != 0:
+                raise CommandExitException(
+                    stdout=result.stdout,
+                    stderr=result.stderr,
+                    exit_code=result.exit_code,
+                    error=result.stderr,
+                )
+            return result
+        finally:
+            self._stats.remote_ms += (time.perf_counter() - start) * 1000
+
+
+class LocalFiles:
+    """
+    Stand-in for `Sandbox.files`, keeping the files in memory unless they're executed locally.
+    """
+
+    def __init__(self, stats: BackendStats, execute: bool = False):
+        self._stats = stats
+        self._execute = execute
+        self._files: Dict[str, bytes] = {}
+
+    def _count(self, start: float) -> None:
+        self._stats.requests += 1
+        self._stats.remote_ms += (time.perf_counter() - start) * 1000
+
+    def write(self, path: str, data, **opts) -> None:
+        start = time.perf_counter()
+        content = data.encode() if isinstance(data, str) else bytes(data)
+        if self._execute:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+        else:
+            self._files[path] = content
+        self._count(start)
+
+    def read(self, path: str, format: str = "text", **opts):
+        start = time.perf_counter()
+        if self._execute:
+            with open(path, "rb") as f:
+                content = f.read()
+        else:
+            content = self._files[path]
+        self._stats.bytes_received += len(content)
+        self._count(start)
+        if format == "bytes":
+            return bytearray(content)
+        return content.decode()
+
+    def remove(self, path: str, **opts) -> None:
+        start = time.perf_counter()
+        if self._execute:
+            os.remove(path)
+        else:
+            self._files.pop(path, None)
+        self._count(start)
+
+
+class _OfflineBase(SandboxBase):
+    """
+    Creates the sandbox locally instead of through the E2B API.
+
+    `OfflineSandbox` lists it after `Sandbox`, so `Sandbox.create` calls it in
+    place of the E2B sandbox's `create`.
+    """
+
+    execute = False
+    stats: BackendStats
+
+    @classmethod
+    def create(cls, envs=None, **opts):
+        stats = BackendStats()
+        start = time.perf_counter()
+        # Creating the sandbox is a request to the E2B API
+        stats.requests += 1
+        sbx = cls(
+            sandbox_id="offline",
+            envd_version=Version("0.2.0"),
+            envd_access_token=None,
+            sandbox_domain="e2b.local",
+            connection_config=ConnectionConfig(api_key="e2b_offline"),
+        )
+        sbx.stats = stats
+        sbx._filesystem = LocalFiles(stats, execute=cls.execute)
+        sbx._commands = LocalCommands(
+            stats, execute=cls.execute, envs=envs, files=sbx._filesystem
+        )
+        stats.remote_ms += (time.perf_counter() - start) * 1000
+        return sbx
+
+
+class OfflineSandbox(Sandbox, _OfflineBase):
+    """
+    `Sandbox` backed by `LocalCommands` and `LocalFiles`.
+    """
+
+
+class LocalXvfbSandbox(OfflineSandbox):
+    """
+    `Sandbox` that runs its commands against the X server on the local `DISPLAY`.
+    """
+
+    execute = True
@@ -0,0 +1,66 @@
+"""
+Compare the per-frame latency of the previous screenshot path (`scrot` to a
+temporary file, `files.read`, `files.remove`) with the single-command capture
+that `Sandbox.screenshot()` uses.
+
+Usage: poetry run python benchmarks/screenshot_latency.py [iterations]
+"""
+
+import sys
+import time
+from statistics import mean, median
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+from e2b_desktop import Sandbox
+
+load_dotenv()
+
+
+def measure(label: str, capture, iterations: int) -> None:
+    durations, sizes = [], []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        image = capture()
+        durations.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(image))
+
+    durations.sort()
+    p95 = durations[int(len(durations) * 0.95) - 1]
+    print(
+        f"{label:<28} mean {mean(durations):7.1f} ms   median {median(durations):7.1f} ms"
+        f"   p95 {p95:7.1f} ms   {mean(sizes) / 1024:7.1f} KiB/frame"
+    )
+
+
+def scrot_screenshot(desktop: Sandbox) -> bytearray:
+    path = f"/tmp/screenshot-{uuid4()}.png"
+    desktop.commands.run(f"scrot --pointer {path}")
+    file = desktop.files.read(path, format="bytes")
+    desktop.files.remove(path)
+    return file
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    desktop = Sandbox.create()
+    try:
+        # Let the desktop session settle so both paths capture similar frames
+        time.sleep(5)
+        print(f"{iterations} frames per capture path\n")
+
+        measure("scrot + read + remove", lambda: scrot_screenshot(desktop), iterations)
+        measure("screenshot()", lambda: desktop.screenshot(), iterations)
+        measure(
+            "screenshot('stream')",
+            lambda: b"".join(desktop.screenshot("stream")),
+            iterations,
+        )
+    finally:
+        desktop.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Measure the time the SDK itself spends per call and the number of round trips
+each call makes to the sandbox, without network access.
+
+The sandbox's `commands` and `files` are replaced by the local stand-in from
+`offline_backend.py`. The overhead is the wall time of a call minus the time
+spent inside the stand-in. With `--xvfb` the commands run against the X server
+on the local `DISPLAY` (e.g. `Xvfb :99 & DISPLAY=:99 ...`), which needs
+`xdotool`, `ffmpeg` and `python3-xlib` on the host.
+
+Exits with status 1 if a method makes more round trips than its budget, so the
+benchmark can run in CI to catch regressions.
+
+`screenshot_file` is the alternative to the base64 encoded output of
+`screenshot()`: the image is written to a file and read with `files.read`. It
+transfers a third fewer bytes, the benchmark shows what the extra round trips
+cost in exchange.
+
+Usage: poetry run python benchmarks/sdk_overhead.py [--iterations N] [--xvfb] [--json PATH]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from statistics import mean, median
+from uuid import uuid4
+
+from offline_backend import LocalXvfbSandbox, OfflineSandbox
+
+# Maximum number of round trips per call, after the helper programs were uploaded
+ROUND_TRIP_BUDGET = {
+    "create": 2,
+    "screenshot": 1,
+    "screenshot_file": 3,
+    "write": 1,
+    "press": 1,
+    "drag": 1,
+    "get_cursor_position": 1,
+}
+
+
+def screenshot_file(desktop) -> bytearray:
+    path = f"/tmp/screenshot-{uuid4()}.png"
+    desktop.commands.run(
+        f"ffmpeg -loglevel error -f x11grab -draw_mouse 1 -i {desktop.display} "
+        f"-frames:v 1 -y {path}"
+    )
+    image = desktop.files.read(path, format="bytes")
+    desktop.files.remove(path)
+    return image
+
+
+def measure(create, name: str, action, iterations: int) -> dict:
+    overheads, walls, requests, received = [], [], [], []
+    desktop = create()
+    # Upload the helper programs before measuring
+    action(desktop)
+
+    for i in range(iterations):
+        if name == "create":
+            desktop = None
+        before_requests = desktop.stats.requests if desktop else 0
+        before_remote = desktop.stats.remote_ms if desktop else 0.0
+        before_received = desktop.stats.bytes_received if desktop else 0
+
+        start = time.perf_counter()
+        result = action(desktop)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        stats = (result if name == "create" else desktop).stats
+        walls.append(wall_ms)
+        overheads.append(wall_ms - (stats.remote_ms - before_remote))
+        requests.append(stats.requests - before_requests)
+        received.append(stats.bytes_received - before_received)
+
+    overheads.sort()
+    return {
+        "overhead_mean_ms": mean(overheads),
+        "overhead_median_ms": median(overheads),
+        "overhead_p95_ms": overheads[max(int(len(overheads) * 0.95) - 1, 0)],
+        "wall_mean_ms": mean(walls),
+        "round_trips": max(requests),
+        "bytes_received": max(received),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument(
+        "--xvfb", action="store_true", help="Run against the local DISPLAY"
+    )
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    sandbox_class = LocalXvfbSandbox if args.xvfb else OfflineSandbox
+    if args.xvfb and not os.environ.get("DISPLAY"):
+        sys.exit("--xvfb needs DISPLAY to be set to a running X server")
+
+    def create():
+        return sandbox_class.create(display=os.environ.get("DISPLAY", ":0"))
+
+    actions = {
+        "create": lambda desktop: create(),
+        "screenshot": lambda desktop: desktop.screenshot(),
+        "screenshot_file": screenshot_file,
+        "write": lambda desktop: desktop.write("Hello, world!"),
+        "press": lambda desktop: desktop.press("enter"),
+        "drag": lambda desktop: desktop.drag((100, 100), (200, 200)),
+        "get_cursor_position": lambda desktop: desktop.get_cursor_position(),
+    }
+
+    print(
+        f"{args.iterations} iterations per method, "
+        f"{'local X server' if args.xvfb else 'recorded commands'}\n"
+    )
+    results, over_budget = {}, []
+    for name, action in actions.items():
+        result = measure(create, name, action, args.iterations)
+        results[name] = result
+        if result["round_trips"] > ROUND_TRIP_BUDGET[name]:
+            over_budget.append(name)
+        print(
+            f"{name:<20} overhead mean {result['overhead_mean_ms'] * 1000:8.1f} us   "
+            f"median {result['overhead_median_ms'] * 1000:8.1f} us   "
+            f"p95 {result['overhead_p95_ms'] * 1000:8.1f} us   "
+            f"wall {result['wall_mean_ms']:7.2f} ms   "
+            f"round trips {result['round_trips']} (budget {ROUND_TRIP_BUDGET[name]})   "
+            f"received {result['bytes_received'] / 1024:7.1f} KiB"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if over_budget:
+        sys.exit(f"\nOver the round trip budget: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
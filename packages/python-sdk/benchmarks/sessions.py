@@ -0,0 +1,53 @@
+"""
+Compare the boot time and idle memory of the desktop sessions.
+
+Boots the desktop template in a fresh local Docker container once per run and
+session, the way `Sandbox.create(session=...)` does, and sums up the resident
+memory of all processes in the container after it sat idle for a while. See
+`template_variants.py` for how the boot is measured; it includes starting the
+container, so compare the sessions with each other rather than with a sandbox.
+
+Build the image from the `template` directory first:
+
+    poetry run python build_docker.py full | docker build -t e2b-desktop-full -f - files
+
+Usage: python benchmarks/sessions.py [--image e2b-desktop-full] [--runs 3] [--idle-seconds 10] [--json]
+"""
+
+import argparse
+import json
+import sys
+
+from e2b_desktop.boot import SESSION_COMMANDS
+from template_variants import median_boot
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--image", default="e2b-desktop-full")
+    parser.add_argument("--sessions", default=",".join(SESSION_COMMANDS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--idle-seconds", type=float, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        session: median_boot(
+            args.image, SESSION_COMMANDS[session], args.runs, args.idle_seconds
+        )
+        for session in args.sessions.split(",")
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for session, result in results.items():
+        print(
+            f"{session:<8} boot {result['boot_ms']:7.1f} ms "
+            f"(x11 {result['x11_ms']:6.1f} ms, session {result['session_ms']:7.1f} ms)   "
+            f"idle RSS {result['idle_rss_bytes'] / 2**20:6.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
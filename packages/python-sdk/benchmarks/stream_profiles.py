@@ -0,0 +1,409 @@
+"""
+Measure the bandwidth and the update latency of the VNC stream profiles.
+
+Runs the desktop template in a local Docker container and starts x11vnc with
+the flags of each profile, the same way `stream.start(profile=...)` does. A
+minimal RFB client asks for the same encodings as noVNC with the profile's
+quality and compression, while a painter in the container draws a moving,
+photo-like image on the screen a few times per second. The client reports the
+bytes per second it received and the time from each repaint to the update that
+shows it, which includes the few milliseconds it takes to hand the repaint to
+the container.
+
+Build the image from the `template` directory first:
+
+    poetry run python build_docker.py | docker build -t e2b-desktop -f - files
+
+Usage: python benchmarks/stream_profiles.py [--image e2b-desktop] [--seconds 10] [--json]
+"""
+
+import argparse
+import json
+import select
+import socket
+import struct
+import subprocess
+import sys
+import time
+from statistics import mean, median
+from typing import Dict, List, Optional, Tuple
+
+from e2b_desktop.streaming import (
+    STREAM_PROFILES,
+    StreamSettings,
+    stream_settings,
+    x11vnc_flags,
+)
+
+DISPLAY = ":0"
+RESOLUTION = (1024, 768)
+
+# Interval between repaints, longer than the update interval of every profile
+REPAINT_INTERVAL = 0.5
+
+# Draws one of a few precomputed frames of a smooth, noisy image at a moving
+# position for every line it reads, and answers once the frame is drawn
+PAINTER = r"""
+import ctypes, ctypes.util, math, random, sys
+
+x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+x11.XOpenDisplay.restype = ctypes.c_void_p
+x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+x11.XDefaultRootWindow.restype = ctypes.c_ulong
+x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+x11.XDefaultGC.restype = ctypes.c_void_p
+x11.XDefaultGC.argtypes = [ctypes.c_void_p, ctypes.c_int]
+x11.XDefaultVisual.restype = ctypes.c_void_p
+x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+x11.XCreateImage.restype = ctypes.c_void_p
+x11.XCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+    ctypes.c_int, ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint, ctypes.c_int, ctypes.c_int]
+x11.XPutImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_void_p,
+    ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint]
+x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+
+display = x11.XOpenDisplay(None)
+root = x11.XDefaultRootWindow(display)
+gc = x11.XDefaultGC(display, 0)
+visual = x11.XDefaultVisual(display, 0)
+width, height, screen_width, screen_height = map(int, sys.argv[1:5])
+
+buffers, images = [], []
+for i in range(8):
+    noise = random.Random(i)
+    data = bytearray(width * height * 4)
+    offset = 0
+    for y in range(height):
+        for x in range(width):
+            wave = math.sin((x + i * 24) / 37) + math.cos((y - i * 16) / 29)
+            data[offset] = int(96 + 60 * wave) + noise.randrange(24)
+            data[offset + 1] = int(128 + 50 * math.sin((x + y) / 53 + i)) + noise.randrange(24)
+            data[offset + 2] = (x * 255 // width + i * 20) % 232 + noise.randrange(24)
+            offset += 4
+    buffers.append(bytes(data))
+    images.append(x11.XCreateImage(display, visual, 24, 2, 0, buffers[-1], width, height, 32, 0))
+
+print("ready", flush=True)
+for step, _ in enumerate(sys.stdin):
+    x = step * 97 % (screen_width - width)
+    y = step * 61 % (screen_height - height)
+    x11.XPutImage(display, root, gc, images[step % len(images)], 0, 0, x, y, width, height)
+    x11.XSync(display, 0)
+"""
+
+ENCODING_RAW = 0
+ENCODING_COPY_RECT = 1
+ENCODING_TIGHT = 7
+ENCODING_DESKTOP_SIZE = -223
+QUALITY_LEVEL_0 = -32
+COMPRESS_LEVEL_0 = -256
+
+
+class RFBClient:
+    """
+    Just enough of an RFB client to count the bytes of every framebuffer update without decoding it.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self._socket = socket.create_connection((host, port), timeout=10)
+        self._buffer = b""
+        self.bytes_received = 0
+
+    def recv_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            chunk = self._socket.recv(65536)
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            self.bytes_received += len(chunk)
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def pending(self, timeout: float) -> bool:
+        if self._buffer:
+            return True
+        readable, _, _ = select.select([self._socket], [], [], max(timeout, 0))
+        return bool(readable)
+
+    def handshake(self, settings: StreamSettings) -> Tuple[int, int]:
+        self.recv_exact(12)
+        self._socket.sendall(b"RFB 003.008\n")
+        types = self.recv_exact(self.recv_exact(1)[0])
+        if 1 not in types:
+            raise ConnectionError("Server requires authentication")
+        self._socket.sendall(b"\x01")
+        if struct.unpack(">I", self.recv_exact(4))[0] != 0:
+            raise ConnectionError("Security handshake failed")
+
+        # Shared session, then the server's framebuffer size and name
+        self._socket.sendall(b"\x01")
+        width, height = struct.unpack(">HH", self.recv_exact(4))
+        self.recv_exact(16)
+        self.recv_exact(struct.unpack(">I", self.recv_exact(4))[0])
+
+        # 32 bits per pixel true colour, so Tight sends 3 bytes per pixel
+        self._socket.sendall(
+            struct.pack(">B3xBBBBHHHBBB3x", 0, 32, 24, 0, 1, 255, 255, 255, 16, 8, 0)
+        )
+        # The encodings noVNC asks for, in its order of preference
+        encodings = [ENCODING_TIGHT, ENCODING_COPY_RECT, ENCODING_RAW]
+        if settings.quality is not None:
+            encodings.append(QUALITY_LEVEL_0 + settings.quality)
+        if settings.compression is not None:
+            encodings.append(COMPRESS_LEVEL_0 + settings.compression)
+        self._socket.sendall(
+            struct.pack(f">BxH{len(encodings)}i", 2, len(encodings), *encodings)
+        )
+        return width, height
+
+    def request_update(self, width: int, height: int, incremental: bool) -> None:
+        self._socket.sendall(
+            struct.pack(">BBHHHH", 3, int(incremental), 0, 0, width, height)
+        )
+
+    def read_message(self) -> int:
+        """
+        Read one server message.
+
+        :return: Number of rectangles if it was a framebuffer update, -1 otherwise.
+        """
+        kind = self.recv_exact(1)[0]
+        if kind == 0:
+            self.recv_exact(1)
+            (count,) = struct.unpack(">H", self.recv_exact(2))
+            for _ in range(count):
+                _, _, width, height, encoding = struct.unpack(
+                    ">HHHHi", self.recv_exact(12)
+                )
+                self._skip_rect(width, height, encoding)
+            return count
+        if kind == 1:
+            self.recv_exact(3)
+            (colours,) = struct.unpack(">H", self.recv_exact(2))
+            self.recv_exact(colours * 6)
+        elif kind == 3:
+            self.recv_exact(3)
+            self.recv_exact(struct.unpack(">I", self.recv_exact(4))[0])
+        elif kind != 2:
+            raise ValueError(f"Unknown server message {kind}")
+        return -1
+
+    def _compact_length(self) -> int:
+        length = 0
+        for shift in (0, 7, 14):
+            byte = self.recv_exact(1)[0]
+            length |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+        return length
+
+    def _skip_rect(self, width: int, height: int, encoding: int) -> None:
+        if encoding == ENCODING_RAW:
+            self.recv_exact(width * height * 4)
+        elif encoding == ENCODING_COPY_RECT:
+            self.recv_exact(4)
+        elif encoding == ENCODING_TIGHT:
+            self._skip_tight(width, height)
+        elif encoding != ENCODING_DESKTOP_SIZE:
+            raise ValueError(f"Unexpected encoding {encoding}")
+
+    def _skip_tight(self, width: int, height: int) -> None:
+        method = self.recv_exact(1)[0] >> 4
+        if method == 0x8:
+            # Fill with a single colour
+            self.recv_exact(3)
+            return
+        if method == 0x9:
+            self.recv_exact(self._compact_length())
+            return
+        if method & 0x8:
+            raise ValueError(f"Unexpected Tight compression {method}")
+
+        size = width * height * 3
+        if method & 0x4:
+            tight_filter = self.recv_exact(1)[0]
+            if tight_filter == 1:
+                colours = self.recv_exact(1)[0] + 1
+                self.recv_exact(colours * 3)
+                if colours == 2:
+                    size = (width + 7) // 8 * height
+                else:
+                    size = width * height
+        # Small rectangles are sent without compression
+        if size < 12:
+            self.recv_exact(size)
+        else:
+            self.recv_exact(self._compact_length())
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class Container:
+    def __init__(self, image: str, ports: Tuple[int, ...] = (5900,)) -> None:
+        published = [flag for port in ports for flag in ("-p", f"127.0.0.1::{port}")]
+        self.id = subprocess.run(
+            ["docker", "run", "-d", "--rm", *published, image, "sleep", "infinity"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        self.ports = {port: self._host_port(port) for port in ports}
+        self.vnc_port = self.ports[5900]
+
+    def _host_port(self, port: int) -> int:
+        mapping = subprocess.run(
+            ["docker", "port", self.id, str(port)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()[0]
+        return int(mapping.rsplit(":", 1)[1])
+
+    def exec(self, *command: str, detach: bool = False) -> None:
+        subprocess.run(
+            ["docker", "exec", *(["-d"] if detach else []), "-e", f"DISPLAY={DISPLAY}"]
+            + [self.id, *command],
+            check=True,
+            capture_output=True,
+        )
+
+    def painter(self, width: int, height: int) -> subprocess.Popen:
+        painter = subprocess.Popen(
+            ["docker", "exec", "-i", "-e", f"DISPLAY={DISPLAY}", self.id]
+            + ["python3", "-c", PAINTER, str(width), str(height)]
+            + [str(RESOLUTION[0]), str(RESOLUTION[1])],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        assert painter.stdout is not None
+        painter.stdout.readline()
+        return painter
+
+    def remove(self) -> None:
+        subprocess.run(["docker", "rm", "-f", self.id], capture_output=True)
+
+
+def connect(
+    port: int, settings: StreamSettings, timeout: float = 10
+) -> Tuple[RFBClient, Tuple[int, int]]:
+    """
+    Connect to x11vnc once it listens.
+
+    :return: The client and the size of the framebuffer, which is smaller than the screen if it's scaled.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client = RFBClient("127.0.0.1", port)
+            return client, client.handshake(settings)
+        except (ConnectionError, OSError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.1)
+
+
+def measure(
+    container: Container,
+    painter: subprocess.Popen,
+    settings: StreamSettings,
+    seconds: float,
+) -> Dict[str, float]:
+    container.exec(
+        "x11vnc",
+        "-display",
+        DISPLAY,
+        "-forever",
+        *x11vnc_flags(settings),
+        "-shared",
+        "-rfbport",
+        "5900",
+        "-nopw",
+        detach=True,
+    )
+    client, (width, height) = connect(container.vnc_port, settings)
+    assert painter.stdin is not None
+    try:
+        # The first full update is what every viewer pays once, it's not counted
+        client.request_update(width, height, incremental=False)
+        while client.read_message() < 0:
+            pass
+        client.request_update(width, height, incremental=True)
+
+        start = time.monotonic()
+        received = client.bytes_received
+        latencies: List[float] = []
+        updates = 0
+        repainted: Optional[float] = None
+        next_repaint = start
+        while (now := time.monotonic()) < start + seconds:
+            if now >= next_repaint:
+                painter.stdin.write("\n")
+                painter.stdin.flush()
+                repainted = time.monotonic()
+                next_repaint += REPAINT_INTERVAL
+            if not client.pending(next_repaint - time.monotonic()):
+                continue
+            if client.read_message() < 0:
+                continue
+            updates += 1
+            if repainted is not None:
+                latencies.append((time.monotonic() - repainted) * 1000)
+                repainted = None
+            client.request_update(width, height, incremental=True)
+        elapsed = time.monotonic() - start
+    finally:
+        client.close()
+        container.exec("pkill", "-x", "x11vnc")
+
+    latencies.sort()
+    return {
+        "bytes_per_second": (client.bytes_received - received) / elapsed,
+        "updates_per_second": updates / elapsed,
+        "latency_mean_ms": mean(latencies) if latencies else float("nan"),
+        "latency_median_ms": median(latencies) if latencies else float("nan"),
+        "latency_p95_ms": latencies[int(len(latencies) * 0.95) - 1]
+        if latencies
+        else float("nan"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--image", default="e2b-desktop")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    container = Container(args.image)
+    try:
+        container.exec(
+            "Xvfb", DISPLAY, "-ac", "-screen", "0", "%dx%dx24" % RESOLUTION, detach=True
+        )
+        time.sleep(1)
+        painter = container.painter(480, 360)
+
+        results = {}
+        for name in ["default", *STREAM_PROFILES]:
+            settings = stream_settings(None if name == "default" else name)  # type: ignore
+            results[name] = measure(container, painter, settings, args.seconds)
+        painter.kill()
+    finally:
+        container.remove()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        print(
+            f"{name:<14} {result['bytes_per_second'] / 1024:9.1f} KiB/s   "
+            f"{result['updates_per_second']:5.1f} updates/s   "
+            f"latency mean {result['latency_mean_ms']:7.1f} ms   "
+            f"median {result['latency_median_ms']:7.1f} ms   "
+            f"p95 {result['latency_p95_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Compare the image size, boot time and idle memory of the desktop template variants.
+
+Builds every variant of `template/template.py` with Docker from the output of
+`build_docker.py <variant>`, then boots it a few times the way
+`Sandbox.create()` does: a fresh container, the `desktop_launcher.py` program
+with the variant's session, until the session manages the screen. The boot
+time is measured from `docker run` and includes starting the container, which
+an E2B sandbox does from a snapshot instead, so compare the variants with each
+other rather than with a sandbox. After the boot the desktop sits idle for a
+while and the resident memory of all processes in the container is summed up.
+
+Needs Docker and the `e2b` package, which the SDK depends on, to render the
+Dockerfiles.
+
+Usage: python benchmarks/template_variants.py [--variants minimal,browser,full] [--runs 3] [--idle-seconds 10] [--skip-build] [--json]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from statistics import median
+from typing import Dict, List
+
+from e2b_desktop.boot import SESSION_COMMANDS, BootProgress, launcher_command
+
+TEMPLATE_DIR = Path(__file__).parent.parent.parent.parent / "template"
+DISPLAY = ":0"
+RESOLUTION = (1024, 768)
+DPI = 96
+
+# The session each variant is meant to run with
+SESSIONS = {
+    "minimal": "openbox",
+    "browser": "openbox",
+    "full": "xfce",
+}
+
+# Sums up the resident memory of every process, awk itself takes about a megabyte
+IDLE_RSS = "awk '/^VmRSS:/ { total += $2 } END { print total }' /proc/[0-9]*/status"
+
+
+def image_name(variant: str) -> str:
+    return f"e2b-desktop-{variant}"
+
+
+def build(variant: str) -> float:
+    """
+    Build the image of a variant.
+
+    :return: Time the build took in seconds, which depends mostly on Docker's layer cache.
+    """
+    dockerfile = subprocess.run(
+        [sys.executable, "build_docker.py", variant],
+        cwd=TEMPLATE_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    start = time.monotonic()
+    subprocess.run(
+        ["docker", "build", "-t", image_name(variant), "-f", "-", "files"],
+        cwd=TEMPLATE_DIR,
+        input=dockerfile,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return time.monotonic() - start
+
+
+def image_size(variant: str) -> int:
+    return int(
+        subprocess.run(
+            ["docker", "image", "inspect", "-f", "{{.Size}}", image_name(variant)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    )
+
+
+def boot(
+    image: str, session_command: List[str], idle_seconds: float
+) -> Dict[str, float]:
+    """
+    Boot the desktop in a fresh container and measure its memory once it's idle.
+    """
+    start = time.monotonic()
+    container = subprocess.run(
+        ["docker", "run", "-d", "--rm", image, "sleep", "infinity"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    try:
+        started = time.monotonic()
+        command = launcher_command(DISPLAY, *RESOLUTION, DPI, session_command)
+        output = subprocess.run(
+            ["docker", "exec", container, "sh", "-c", command],
+            capture_output=True,
+            text=True,
+        ).stdout
+        booted = time.monotonic()
+
+        progress = BootProgress("session")
+        progress.feed(output)
+        if not progress.done or progress.error:
+            raise RuntimeError(
+                f"Could not boot {image}: {progress.error or 'launcher exited'}"
+            )
+
+        time.sleep(idle_seconds)
+        rss_kib = int(
+            subprocess.run(
+                ["docker", "exec", container, "sh", "-c", IDLE_RSS],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+    finally:
+        subprocess.run(["docker", "rm", "-f", container], capture_output=True)
+
+    return {
+        "container_ms": (started - start) * 1000,
+        "x11_ms": progress.timings["x11"],
+        "session_ms": progress.timings["session"],
+        "boot_ms": (booted - start) * 1000,
+        "idle_rss_bytes": rss_kib * 1024,
+    }
+
+
+def median_boot(
+    image: str, session_command: List[str], runs: int, idle_seconds: float
+) -> Dict[str, float]:
+    """
+    Boot the image a few times, the median of each measurement.
+    """
+    boots = [boot(image, session_command, idle_seconds) for _ in range(runs)]
+    return {key: median(run[key] for run in boots) for key in boots[0]}
+
+
+def measure(
+    variant: str, runs: int, idle_seconds: float, skip_build: bool
+) -> Dict[str, float]:
+    result: Dict[str, float] = {}
+    if not skip_build:
+        result["build_seconds"] = build(variant)
+    result["image_bytes"] = image_size(variant)
+    result.update(
+        median_boot(
+            image_name(variant),
+            SESSION_COMMANDS[SESSIONS[variant]],
+            runs,
+            idle_seconds,
+        )
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--variants", default=",".join(SESSIONS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--idle-seconds", type=float, default=10)
+    parser.add_argument(
+        "--skip-build", action="store_true", help="Use the images built before"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        variant: measure(variant, args.runs, args.idle_seconds, args.skip_build)
+        for variant in args.variants.split(",")
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for variant, result in results.items():
+        print(
+            f"{variant:<8} image {result['image_bytes'] / 2**30:5.2f} GiB   "
+            f"boot {result['boot_ms']:7.1f} ms "
+            f"(x11 {result['x11_ms']:6.1f} ms, session {result['session_ms']:7.1f} ms)   "
+            f"idle RSS {result['idle_rss_bytes'] / 2**20:6.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Compare the bandwidth and the update latency of the video stream with the VNC stream.
+
+Runs the desktop template in a local Docker container, with the same painter
+as `stream_profiles.py` drawing a moving, photo-like image a few times per
+second. The VNC stream is measured with x11vnc's default settings, the way
+`stream.start()` runs it. The video stream runs the `video_stream.py` sandbox
+program with the ffmpeg command of `video_stream.start(...)` for each codec,
+and a minimal WebSocket client counts the bytes it receives and the time from
+each repaint to the first frame that carries it. The time it takes to decode
+the frames in the browser is not included for either stream.
+
+Build the image from the `template` directory first:
+
+    poetry run python build_docker.py | docker build -t e2b-desktop -f - files
+
+Usage: python benchmarks/video_stream.py [--image e2b-desktop] [--seconds 10] [--fps 30] [--bitrate 1000] [--json]
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import tarfile
+import time
+from statistics import mean, median
+from typing import Dict, List, Optional, Tuple
+
+from e2b_desktop.capture import video_stream_command
+from e2b_desktop.scripts import load_script
+from e2b_desktop.streaming import stream_settings
+from stream_profiles import DISPLAY, REPAINT_INTERVAL, RESOLUTION, Container, measure
+
+VIDEO_PORT = 6200
+SERVER_PATH = "/tmp/video_stream.py"
+
+# Frames without a repaint only carry the pointer and encoder noise, a repainted
+# region of the painter's size takes far more
+CHANGED_FRAME_BYTES = 1000
+
+
+class VideoClient:
+    """
+    Just enough of a WebSocket client to receive the frames of the video stream.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self._socket = socket.create_connection((host, port), timeout=10)
+        self._buffer = b""
+        self.bytes_received = 0
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        self._socket.sendall(
+            f"GET /ws HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        while not self._buffer.endswith(b"\r\n\r\n"):
+            self._buffer += self.recv_exact(1)
+        if not self._buffer.startswith(b"HTTP/1.1 101"):
+            raise ConnectionError(self._buffer.split(b"\r\n", 1)[0].decode())
+        self._buffer = b""
+
+    def recv_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            self.bytes_received += len(chunk)
+            data += chunk
+        return data
+
+    def pending(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._socket], [], [], max(timeout, 0))
+        return bool(readable)
+
+    def read_message(self) -> Tuple[int, bytes]:
+        """
+        :return: A tuple with the opcode and the payload of the next message.
+        """
+        first, second = self.recv_exact(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self.recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self.recv_exact(8))[0]
+        return first & 0x0F, self.recv_exact(length)
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+def connect_video(port: int, timeout: float = 10) -> VideoClient:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return VideoClient("127.0.0.1", port)
+        except (ConnectionError, OSError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.1)
+
+
+def summarize(
+    received: int, updates: int, elapsed: float, latencies: List[float]
+) -> Dict[str, float]:
+    latencies.sort()
+    return {
+        "bytes_per_second": received / elapsed,
+        "updates_per_second": updates / elapsed,
+        "latency_mean_ms": mean(latencies) if latencies else float("nan"),
+        "latency_median_ms": median(latencies) if latencies else float("nan"),
+        "latency_p95_ms": latencies[int(len(latencies) * 0.95) - 1]
+        if latencies
+        else float("nan"),
+    }
+
+
+def measure_video(
+    container: Container,
+    painter: subprocess.Popen,
+    codec: str,
+    fps: float,
+    bitrate: int,
+    seconds: float,
+) -> Dict[str, float]:
+    command = video_stream_command(
+        DISPLAY,
+        SERVER_PATH,
+        VIDEO_PORT,
+        fps=fps,
+        bitrate=bitrate,
+        codec=codec,  # type: ignore
+    )
+    container.exec("sh", "-c", command, detach=True)
+    client = connect_video(container.ports[VIDEO_PORT])
+    assert painter.stdin is not None
+    try:
+        # The config and the first keyframe are what every viewer pays once, they're not counted
+        while client.read_message()[0] != 0x2:
+            pass
+
+        start = time.monotonic()
+        received = client.bytes_received
+        latencies: List[float] = []
+        frames = 0
+        repainted: Optional[float] = None
+        next_repaint = start
+        while (now := time.monotonic()) < start + seconds:
+            if now >= next_repaint:
+                painter.stdin.write("\n")
+                painter.stdin.flush()
+                repainted = time.monotonic()
+                next_repaint += REPAINT_INTERVAL
+            if not client.pending(next_repaint - time.monotonic()):
+                continue
+            opcode, payload = client.read_message()
+            if opcode != 0x2:
+                continue
+            frames += 1
+            if repainted is not None and len(payload) - 9 >= CHANGED_FRAME_BYTES:
+                latencies.append((time.monotonic() - repainted) * 1000)
+                repainted = None
+        elapsed = time.monotonic() - start
+    finally:
+        client.close()
+        container.exec("pkill", "-f", SERVER_PATH)
+
+    return summarize(client.bytes_received - received, frames, elapsed, latencies)
+
+
+def _tar(name: str, source: str) -> bytes:
+    """
+    A tar archive with a single file, the format `docker cp -` reads.
+    """
+    data = source.encode()
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return archive.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--image", default="e2b-desktop")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--bitrate", type=int, default=1000, help="kbit/s")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    container = Container(args.image, ports=(5900, VIDEO_PORT))
+    try:
+        container.exec(
+            "Xvfb", DISPLAY, "-ac", "-screen", "0", "%dx%dx24" % RESOLUTION, detach=True
+        )
+        time.sleep(1)
+        subprocess.run(
+            ["docker", "cp", "-", f"{container.id}:/tmp"],
+            input=_tar(
+                os.path.basename(SERVER_PATH), load_script("video_stream.py")[1]
+            ),
+            check=True,
+            capture_output=True,
+        )
+        painter = container.painter(480, 360)
+
+        results = {
+            "vnc": measure(container, painter, stream_settings(), args.seconds),
+        }
+        for codec in ("h264", "vp8"):
+            results[codec] = measure_video(
+                container, painter, codec, args.fps, args.bitrate, args.seconds
+            )
+        painter.kill()
+    finally:
+        container.remove()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        print(
+            f"{name:<5} {result['bytes_per_second'] / 1024:9.1f} KiB/s   "
+            f"{result['updates_per_second']:5.1f} updates/s   "
+            f"latency mean {result['latency_mean_ms']:7.1f} ms   "
+            f"median {result['latency_median_ms']:7.1f} ms   "
+            f"p95 {result['latency_p95_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,20 @@
 from e2b import *
 
+from .async_main import AsyncSandbox
+from .batch import ActionBatch, AsyncActionBatch, BatchResult, BatchStep
+from .delta import FrameAssembler, ScreenshotDelta, ScreenshotTile
+from .frames import AsyncFrameStream, Frame, FrameStream
+from .instrumentation import (
+    CallRecord,
+    LatencyRecorder,
+    MethodStats,
+    OpenTelemetryHook,
+)
+from .local import AsyncLocalSandbox, LocalSandbox
+from .locate import ScreenMatch
 from .main import Sandbox
+from .ocr import ScreenText, TextBox, TextLine
+from .pool import AsyncDesktopPool, DesktopPool, PoolStats
+from .recording import RecordingSegment
+from .screen_wait import ScreenChange
+from .streaming import StreamSettings
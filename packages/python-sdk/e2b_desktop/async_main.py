@@ -0,0 +1,1412 @@
+import asyncio
+import base64
+import inspect
+import json
+import posixpath
+import time
+import uuid
+from shlex import quote as quote_string
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    overload,
+    Tuple,
+    Union,
+)
+
+from e2b import (
+    AsyncSandbox as SandboxBase,
+    TimeoutException,
+    CommandExitException,
+)
+from e2b.connection_config import ApiParams
+from typing_extensions import Self, Unpack
+
+from .batch import AsyncActionBatch, WriteMode, _MAX_INLINE_BATCH, _estimate_duration
+from .boot import (
+    SESSION_COMMANDS,
+    BootProgress,
+    Session,
+    WaitFor,
+    launcher_command,
+    parse_stream_output,
+    session_alive_command,
+    session_command_for,
+    session_restart_command,
+    stream_command,
+    stream_config,
+    validate_wait_for,
+)
+from .capture import (
+    Base64StreamDecoder,
+    ImageFormat,
+    frames_command,
+    locate_command,
+    ocr_command,
+    screen_wait_command,
+    screenshot_command,
+)
+from .displays import (
+    INPUT_SERVER_PORT,
+    STREAM_PORT,
+    VNC_PORT,
+    _DisplayCommands,
+    display_number,
+    next_display,
+    stop_display_command,
+    validate_display,
+)
+from .delta import ScreenshotDelta, parse_delta, validate_session
+from .frames import AsyncFrameStream
+from .instrumentation import CallHook, set_instrumentation
+from .input_server import _AsyncInputServer
+from .keys import MOUSE_BUTTONS, map_key
+from .locate import ScreenMatch, decode_needle, needle_path, parse_matches
+from .ocr import ScreenText, TextBox, parse_screen_text, validate_language
+from .readiness import (
+    ReadinessResult,
+    parse_readiness,
+    readiness_command,
+)
+from .recording import _AsyncRecording
+from .screen_wait import ScreenChange, parse_screen_change
+from .streaming import (
+    StreamOption,
+    StreamProfile,
+    StreamSettings,
+    stream_options,
+    stream_settings,
+    viewer_params,
+    x11vnc_flags,
+)
+from .video_stream import _AsyncVideoStream
+from .state import _AsyncDesktopState
+from .scripts import load_script
+from .utils import parse_cursor_position, parse_screen_size
+
+
+class _AsyncVNCServer:
+    def __init__(self, desktop: "AsyncSandbox") -> None:
+        self._novnc_pid: Optional[int] = None
+
+        number = display_number(desktop._display)
+        self._vnc_port = VNC_PORT + number
+        self._port = STREAM_PORT + number
+        self._novnc_auth_enabled = False
+        self._novnc_password = None
+        self._settings = StreamSettings()
+        self.start_timings: Dict[str, float] = {}
+        """Time it took until x11vnc ('vnc') and the noVNC proxy ('novnc') listened, and the whole start ('total'), in milliseconds."""
+
+        self._url = f"{desktop._service_url(self._port)}/vnc.html"
+
+        self.__desktop = desktop
+
+    def _vnc_pattern(self) -> str:
+        # The brackets keep the pattern from matching the shell that runs pkill
+        return quote_string(f"[x]11vnc -display {self.__desktop._display} ")
+
+    @staticmethod
+    def _generate_password(length: int = 16) -> str:
+        import secrets
+        import string
+
+        characters = string.ascii_letters + string.digits
+        return "".join(secrets.choice(characters) for _ in range(length))
+
+    def get_url(
+        self,
+        auto_connect: bool = True,
+        view_only: bool = False,
+        resize: str = "scale",
+        auth_key: Optional[str] = None,
+    ) -> str:
+        params = []
+        if auto_connect:
+            params.append("autoconnect=true")
+        if view_only:
+            params.append("view_only=true")
+        if resize:
+            params.append(f"resize={resize}")
+        params.extend(viewer_params(self._settings))
+        if auth_key:
+            params.append(f"password={auth_key}")
+        if params:
+            return f"{self._url}?{'&'.join(params)}"
+        return self._url
+
+    def get_auth_key(self) -> str:
+        if not self._novnc_password:
+            raise RuntimeError(
+                "Unable to retrieve stream auth key, check if require_auth is enabled"
+            )
+        return self._novnc_password
+
+    async def start(
+        self,
+        vnc_port: Optional[int] = None,
+        port: Optional[int] = None,
+        require_auth: bool = False,
+        window_id: Optional[str] = None,
+        profile: Optional[StreamProfile] = None,
+        *,
+        wait_ms: Optional[int] = None,
+        max_fps: Optional[float] = None,
+        quality: Optional[int] = None,
+        compression: Optional[int] = None,
+        scale: Optional[float] = None,
+        client_cache: Optional[int] = None,
+    ) -> None:
+        """
+        Start streaming the display over VNC, viewable in the browser at `get_url()`.
+
+        The profile sets all the trade-offs at once, the other options override single ones of it.
+        x11vnc and the noVNC proxy are started together and awaited inside the sandbox, in a single request.
+        The time each took is available in `start_timings` afterwards.
+
+        :param profile: "low_latency", "low_bandwidth" or "quality". Defaults to x11vnc's settings, polling every 50 ms.
+        :param wait_ms: How often the screen is polled for changes, in milliseconds.
+        :param max_fps: Upper bound of updates per second sent to each viewer.
+        :param quality: JPEG quality the viewer asks for, from 0 (smallest) to 9 (best).
+        :param compression: zlib compression level the viewer asks for, from 0 (fastest) to 9 (smallest).
+        :param scale: Scale the screen down by this factor before it's sent, e.g. `0.5`.
+        :param client_cache: Number of screens of pixels the viewer caches. Only for viewers that support the x11vnc client-side caching.
+        :raises RuntimeError: If the stream is already running
+        :raises ValueError: If the profile is unknown or an option is out of range
+        """
+        start = time.perf_counter()
+        config, settings = self._prepare(
+            vnc_port,
+            port,
+            require_auth,
+            window_id,
+            profile,
+            wait_ms=wait_ms,
+            max_fps=max_fps,
+            quality=quality,
+            compression=compression,
+            scale=scale,
+            client_cache=client_cache,
+        )
+
+        try:
+            result = await self.__desktop.commands.run(
+                stream_command(self.__desktop._display, config),
+                timeout=config["timeout"] + 30,
+            )
+            output = result.stdout
+        except CommandExitException as e:
+            # The launcher reports why it failed before exiting
+            output = e.stdout
+
+        self._started(config, settings, parse_stream_output(output))
+        self.start_timings["total"] = (time.perf_counter() - start) * 1000
+
+    def _prepare(
+        self,
+        vnc_port: Optional[int] = None,
+        port: Optional[int] = None,
+        require_auth: bool = False,
+        window_id: Optional[str] = None,
+        profile: Optional[StreamProfile] = None,
+        **options: Any,
+    ) -> Tuple[dict, StreamSettings]:
+        """
+        Validate the options of `start` and build the launcher's stream config, without applying them yet.
+
+        :return: A tuple with the config and the settings of the stream.
+        """
+        settings = stream_settings(profile, **options)
+        config = stream_config(
+            vnc_port or self._vnc_port,
+            port or self._port,
+            x11vnc_flags(settings),
+            password=self._generate_password() if require_auth else None,
+            window_id=window_id,
+        )
+        return config, settings
+
+    def _started(self, config: dict, settings: StreamSettings, phase: dict) -> None:
+        """
+        Apply the options once the launcher reported the `stream` phase.
+        """
+        self._settings = settings
+        self._vnc_port = config["vnc_port"]
+        self._port = config["port"]
+        self._novnc_password = config["password"]
+        self._novnc_auth_enabled = config["password"] is not None
+        self._novnc_pid = phase["novnc_pid"]
+        self.start_timings = {"vnc": phase["vnc_ms"], "novnc": phase["novnc_ms"]}
+
+        # Update URL with new port
+        self._url = f"{self.__desktop._service_url(self._port)}/vnc.html"
+
+    async def stop(self) -> None:
+        command = f"pkill -f {self._vnc_pattern()}"
+        if self._novnc_pid:
+            # The proxy runs in its own process group
+            command += f"; kill -- -{self._novnc_pid} 2>/dev/null"
+        await self.__desktop.commands.run(f"{command}; true")
+        self._novnc_pid = None
+
+
+class AsyncSandbox(SandboxBase):
+    default_template = "desktop"
+    __vnc_server: _AsyncVNCServer
+    __recording: _AsyncRecording
+    __video_stream: _AsyncVideoStream
+    __state: _AsyncDesktopState
+    _session_pid: Optional[int] = None
+    _session_command: Optional[List[str]] = None
+    _display: str
+    _displays: Dict[str, "AsyncSandbox"]
+    _parent: Optional["AsyncSandbox"] = None
+    _input_server: Optional[_AsyncInputServer] = None
+    _uploaded_scripts: set[str]
+    _uploaded_needles: Dict[str, Tuple[int, int]]
+    boot_timings: Dict[str, float]
+
+    @classmethod
+    async def create(
+        cls,
+        template: Optional[str] = None,
+        resolution: Optional[Tuple[int, int]] = None,
+        dpi: Optional[int] = None,
+        display: Optional[str] = None,
+        timeout: Optional[int] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        envs: Optional[Dict[str, str]] = None,
+        secure: bool = True,
+        allow_internet_access: bool = True,
+        input_server: bool = False,
+        wait_for: WaitFor = "x11",
+        session: Session = "xfce",
+        stream: StreamOption = False,
+        **opts: Unpack[ApiParams],
+    ) -> Self:
+        """
+        Create a new sandbox.
+
+        By default, the sandbox is created from the default `desktop` sandbox template.
+
+
+        :param template: Sandbox template name or ID
+        :param resolution: Startup the desktop with custom screen resolution. Defaults to (1024, 768)
+        :param dpi: Startup the desktop with custom DPI. Defaults to 96
+        :param display: Startup the desktop with custom display. Defaults to ":0"
+        :param timeout: Timeout for the sandbox in **seconds**, default to 300 seconds. The maximum time a sandbox can be kept alive is 24 hours (86_400 seconds) for Pro users and 1 hour (3_600 seconds) for Hobby users.
+        :param metadata: Custom metadata for the sandbox
+        :param envs: Custom environment variables for the sandbox
+        :param secure: Envd is secured with access token and cannot be used without it
+        :param allow_internet_access: Allow sandbox to access the internet, defaults to `True`.
+        :param input_server: Start a persistent input server in the sandbox and send mouse and keyboard actions to it instead of running a new `xdotool` process for each action. Defaults to `False`
+        :param wait_for: Return once the X server is ready ('x11'), once the desktop session manages the screen ('session'), or right after starting the boot ('none'). The rest of the boot continues in the background. Defaults to 'x11'
+        :param session: Desktop session to start: the full xfce4 desktop ('xfce'), a bare window manager ('openbox'), or the X server alone ('none'). Lighter sessions boot faster and take less memory. Defaults to 'xfce'
+        :param stream: Start the stream as part of the boot, so `stream.get_url()` works once the sandbox is returned. `True` for the default settings, a profile name, or a dict of `stream.start` options. Defaults to `False`
+
+        :return: An AsyncSandbox instance for the new sandbox
+
+        Use this method instead of using the constructor to create a new sandbox.
+        """
+
+        validate_wait_for(wait_for)
+        session_command = session_command_for(session)
+        stream_start = stream_options(stream)
+
+        # Initialize environment variables with DISPLAY
+        display = display or ":0"
+        if envs is None:
+            envs = {}
+        envs["DISPLAY"] = display
+
+        start = time.perf_counter()
+        sbx = await super().create(
+            template=template,
+            timeout=timeout,
+            metadata=metadata,
+            envs=envs,
+            secure=secure,
+            allow_internet_access=allow_internet_access,
+            **opts,
+        )
+        sandbox_ms = (time.perf_counter() - start) * 1000
+
+        await sbx._init_desktop(
+            display,
+            resolution,
+            dpi,
+            wait_for,
+            input_server,
+            start,
+            sandbox_ms,
+            session_command=session_command,
+            stream=stream_start,
+        )
+        return sbx
+
+    async def _init_desktop(
+        self,
+        display: str,
+        resolution: Optional[Tuple[int, int]],
+        dpi: Optional[int],
+        wait_for: WaitFor,
+        input_server: bool,
+        start: float,
+        sandbox_ms: float,
+        session_command: Optional[List[str]] = None,
+        stream: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Boot the desktop in a newly created sandbox and set up the desktop's components.
+
+        :param start: `time.perf_counter()` at the start of the creation, to measure the total boot time.
+        :param sandbox_ms: Time it took to create the sandbox, in milliseconds.
+        :param session_command: Command that starts the desktop session, an empty list for no session. Defaults to `["startxfce4"]`.
+        :param stream: Options of `stream.start` to start the stream during the boot, `None` to not start it.
+        """
+        self._uploaded_scripts = set()
+        self._uploaded_needles = {}
+        self._displays = {display: self}
+        self._attach_display(display)
+        self.boot_timings = {
+            "sandbox": sandbox_ms,
+            **(
+                await self._start_display(
+                    resolution, dpi, wait_for, input_server, session_command, stream
+                )
+            ),
+        }
+        self.boot_timings["total"] = (time.perf_counter() - start) * 1000
+
+    def _attach_display(self, display: str) -> None:
+        """
+        Point the desktop API at the display and set up the display's components.
+        """
+        self._display = display
+        self.__vnc_server = _AsyncVNCServer(self)
+        self.__recording = _AsyncRecording(self)
+        self.__video_stream = _AsyncVideoStream(self)
+        self.__state = _AsyncDesktopState(self)
+
+    async def _start_display(
+        self,
+        resolution: Optional[Tuple[int, int]],
+        dpi: Optional[int],
+        wait_for: WaitFor,
+        input_server: bool,
+        session_command: Optional[List[str]],
+        stream: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, float]:
+        """
+        Boot the attached display and start its input server.
+
+        :return: Time since the launcher started until each awaited phase finished, in milliseconds.
+        """
+        width, height = resolution or (1024, 768)
+        self._session_command = (
+            SESSION_COMMANDS["xfce"] if session_command is None else session_command
+        )
+        timings = await self._boot(
+            width,
+            height,
+            dpi or 96,
+            wait_for,
+            self._session_command,
+            stream,
+        )
+
+        if input_server:
+            self._input_server = _AsyncInputServer(
+                self, port=INPUT_SERVER_PORT + display_number(self._display)
+            )
+            await self._input_server.start()
+        return timings
+
+    async def add_display(
+        self,
+        resolution: Optional[Tuple[int, int]] = None,
+        dpi: Optional[int] = None,
+        display: Optional[str] = None,
+        input_server: bool = False,
+        wait_for: WaitFor = "x11",
+        session: Session = "xfce",
+        session_command: Optional[List[str]] = None,
+        stream: StreamOption = False,
+    ) -> Self:
+        """
+        Start another display in the same sandbox, with its own X server and desktop session.
+
+        The returned handle has the same desktop API as the sandbox, but every action, screenshot, stream,
+        recording, state mirror and command of the handle targets the new display. The services of display `:N`
+        listen on their default ports plus N, e.g. the stream of display `:1` on port 6081, so the displays
+        are limited to `:0` to `:19`, the ports of the next ones overlap with other services' ports.
+        Calling `kill` on any of the handles kills the whole sandbox.
+
+        :param resolution: Startup the display with custom screen resolution. Defaults to (1024, 768)
+        :param dpi: Startup the display with custom DPI. Defaults to 96
+        :param display: Name of the new display. Defaults to the display after the highest one in use
+        :param input_server: Start a persistent input server for the display. Defaults to `False`
+        :param wait_for: Return once the X server is ready ('x11'), once the desktop session manages the screen ('session'), or right after starting the boot ('none'). Defaults to 'x11'
+        :param session: Desktop session to start: 'xfce', 'openbox' or 'none', see `create`. Defaults to 'xfce'
+        :param session_command: Custom command that starts the desktop session, it takes precedence over `session`
+        :param stream: Start the display's stream as part of its boot. `True` for the default settings, a profile name, or a dict of `stream.start` options. Defaults to `False`
+        :return: A handle for the new display
+        :raises ValueError: If the display is already in use or out of range, the session is unknown or a stream option is invalid
+        """
+        validate_wait_for(wait_for)
+        session_command = session_command_for(session, session_command)
+        stream_start = stream_options(stream)
+        display = display or self._next_display()
+        self._validate_display(display)
+        if display in self._displays:
+            raise ValueError(f"Display {display} is already in use")
+
+        start = time.perf_counter()
+        handle = self._display_handle(display)
+        self._displays[display] = handle
+        try:
+            handle.boot_timings = await handle._start_display(
+                resolution, dpi, wait_for, input_server, session_command, stream_start
+            )
+        except BaseException:
+            await handle.stop_display()
+            raise
+        handle.boot_timings["total"] = (time.perf_counter() - start) * 1000
+        return handle
+
+    def _next_display(self) -> str:
+        return next_display(self._displays)
+
+    def _validate_display(self, display: str) -> None:
+        validate_display(display)
+
+    def _display_handle(self, display: str) -> Self:
+        """
+        Create a handle for another display that shares the connection to the sandbox.
+        """
+        handle = object.__new__(type(self))
+        # Instrumentation wrappers are bound to this handle, so they're left out
+        handle.__dict__.update(
+            (name, value)
+            for name, value in vars(self).items()
+            if not inspect.isfunction(value)
+        )
+        handle._parent = self._parent or self
+        handle._commands = _DisplayCommands(handle._parent._commands, display)
+        handle._input_server = None
+        handle._session_pid = None
+        handle._attach_display(display)
+        return handle
+
+    @property
+    def display(self) -> str:
+        """
+        The X display the desktop API of this handle targets, e.g. ":0".
+        """
+        return self._display
+
+    async def stop_display(self) -> None:
+        """
+        Stop a display started with `add_display`, together with its desktop session and components.
+
+        :raises RuntimeError: If called on the first display of the sandbox, kill the sandbox instead
+        """
+        if self._parent is None:
+            raise RuntimeError(
+                "The first display of the sandbox can't be stopped, kill the sandbox instead"
+            )
+        if self._displays.get(self._display) is not self:
+            return
+
+        await self.__state.stop()
+        if self.__recording.is_recording:
+            await self.__recording.stop()
+        await self.__vnc_server.stop()
+        if self.__video_stream.is_running:
+            await self.__video_stream.stop()
+        if self._input_server:
+            await self._input_server.stop()
+            self._input_server = None
+        await self.commands.run(stop_display_command(self._display, self._session_pid))
+        del self._displays[self._display]
+
+    async def ensure_session(self, timeout: float = 60) -> bool:
+        """
+        Restart the desktop session if it's no longer running, e.g. after logging out or a crash of the window manager.
+
+        Displays started with `session="none"` are left as they are.
+
+        :param timeout: Deadline for the restarted session to manage the screen, in seconds.
+        :return: `True` if the session was restarted.
+        :raises TimeoutException: If the restarted session didn't manage the screen in time
+        """
+        session_command = (
+            SESSION_COMMANDS["xfce"]
+            if self._session_command is None
+            else self._session_command
+        )
+        if not session_command:
+            return False
+        if self._session_pid is not None:
+            result = await self.commands.run(session_alive_command(self._session_pid))
+            if "alive" in result.stdout:
+                return False
+
+        try:
+            output = (
+                await self.commands.run(
+                    session_restart_command(self._display, session_command, timeout),
+                    timeout=timeout + 30,
+                )
+            ).stdout
+        except CommandExitException as e:
+            # The launcher reports why it failed before exiting
+            output = e.stdout
+
+        progress = BootProgress("session")
+        progress.feed(output + "\n")
+        if progress.session_started:
+            self._session_pid = progress.session_pid
+        if progress.error or not progress.done:
+            raise TimeoutException(
+                f"Could not restart the desktop session: {progress.error or 'launcher exited'}"
+            )
+        return True
+
+    def _service_url(self, port: int) -> str:
+        """
+        Base URL of a service listening on the port in the sandbox.
+        """
+        return f"https://{self.get_host(port)}"
+
+    async def _upload_script(self, name: str) -> str:
+        """
+        Upload a bundled helper program to the sandbox, once per sandbox.
+
+        :param name: File name of the program in the `scripts` directory.
+        :return: Path of the program in the sandbox.
+        """
+        path, source = load_script(name)
+        if path not in self._uploaded_scripts:
+            await self.files.write(path, source)
+            self._uploaded_scripts.add(path)
+        return path
+
+    async def _upload_needle(self, needle_png: bytes) -> Tuple[str, Tuple[int, int]]:
+        """
+        Upload a needle image for `locate_on_screen()` to the sandbox, once per sandbox and image.
+
+        :return: A tuple with the path of the needle's raw RGB pixels in the sandbox and its `(width, height)`.
+        """
+        path = needle_path(needle_png)
+        if path not in self._uploaded_needles:
+            pixels, width, height = decode_needle(needle_png)
+            await self.files.write(path, pixels)
+            self._uploaded_needles[path] = (width, height)
+        return path, self._uploaded_needles[path]
+
+    async def _wait_until_ready(
+        self, *conditions: str, timeout: float = 10, pid: Optional[int] = None
+    ) -> ReadinessResult:
+        """
+        Block until all conditions hold inside the sandbox, in a single request.
+
+        :param conditions: Conditions built by the `readiness` helpers, e.g. `port_condition(6080)`.
+        :param timeout: Deadline for the conditions in seconds.
+        :param pid: Give up early if the process with this pid exits.
+        :return: Whether the conditions hold and how long each one took.
+        """
+        result = await self.commands.run(
+            readiness_command(conditions, timeout, pid=pid), timeout=timeout + 30
+        )
+        return parse_readiness(result.stdout)
+
+    async def _boot(
+        self,
+        width: int,
+        height: int,
+        dpi: int,
+        wait_for: WaitFor,
+        session_command: List[str],
+        stream: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, float]:
+        """
+        Start Xvfb, the desktop session and optionally the stream with a single command in the sandbox.
+
+        :param stream: Options of `stream.start`, the stream is awaited regardless of `wait_for`.
+        :return: Time since the launcher started until each awaited phase finished, in milliseconds.
+        """
+        config = settings = None
+        if stream is not None:
+            config, settings = self.__vnc_server._prepare(**stream)
+
+        command = launcher_command(
+            self._display, width, height, dpi, session_command, stream=config
+        )
+        if wait_for == "none" and config is None:
+            handle = await self.commands.run(command, background=True, timeout=0)
+            await handle.disconnect()
+            return {}
+
+        progress = BootProgress(wait_for, stream=config is not None)
+        finished = asyncio.Event()
+
+        def on_stdout(chunk: str) -> None:
+            if progress.feed(chunk):
+                finished.set()
+
+        handle = await self.commands.run(
+            command, background=True, timeout=0, on_stdout=on_stdout
+        )
+
+        async def wait_for_exit() -> None:
+            try:
+                await handle.wait()
+            except CommandExitException:
+                pass
+            finally:
+                finished.set()
+
+        exit_task = asyncio.create_task(wait_for_exit())
+        await finished.wait()
+        exit_task.cancel()
+        await handle.disconnect()
+
+        if progress.session_started:
+            self._session_pid = progress.session_pid
+        if progress.stream is not None:
+            self.__vnc_server._started(config, settings, progress.stream)
+        if progress.error or not progress.done:
+            raise TimeoutException(
+                f"Could not start the desktop: {progress.error or 'launcher exited'}"
+            )
+        return progress.timings
+
+    def batch(self, delay_in_ms: int = 0) -> AsyncActionBatch:
+        """
+        Record a sequence of mouse and keyboard actions and execute it in a single request.
+
+        The returned batch has the same methods as the sandbox (`move_mouse`, `left_click`,
+        `write`, `press`, `drag`, `wait`, ...). Call `run()` to execute the recorded actions.
+
+        :param delay_in_ms: Delay between the recorded actions.
+        :return: An empty action batch.
+        """
+        return AsyncActionBatch(self, delay_in_ms=delay_in_ms)
+
+    async def _run_input_ops(self, ops: list) -> Tuple[dict, float]:
+        """
+        Execute input operations in a single request, on the input server if it's running.
+
+        :return: A tuple with the raw response and the wall time in milliseconds.
+        """
+        timeout = 60 + _estimate_duration(ops)
+        start = time.perf_counter()
+
+        if self._input_server:
+            payload = await self._input_server.run(ops, timeout=timeout)
+        else:
+            path = await self._upload_script("input_server.py")
+            batch = json.dumps(ops)
+            if len(batch) > _MAX_INLINE_BATCH:
+                # Command lines are limited to 128 KiB, large batches are handed over in a file
+                batch_path = f"{posixpath.dirname(path)}/batch-{uuid.uuid4().hex}.json"
+                await self.files.write(batch_path, batch)
+                batch = f"@{batch_path}"
+            result = await self.commands.run(
+                f"python3 {path} --batch {quote_string(batch)}",
+                timeout=timeout,
+            )
+            payload = json.loads(result.stdout)
+
+        self.__state._cache.applied(ops)
+        return payload, (time.perf_counter() - start) * 1000
+
+    async def _send_input(self, op: List[Any], command: str) -> None:
+        """
+        Execute a single input operation on the input server if it's running, or with `xdotool` otherwise.
+
+        :param op: The input server operation, e.g. `["click", 1]`.
+        :param command: The equivalent `xdotool` command.
+        """
+        if self._input_server:
+            await self._input_server.send(op)
+        else:
+            await self.commands.run(command)
+        self.__state._cache.applied([op])
+
+    def instrument(self, hook: Optional[CallHook]) -> None:
+        """
+        Report measurements of every public method call to the hook.
+
+        Each call reports its wall time, the number of requests it made to the sandbox, the time spent
+        waiting for them and the bytes transferred. Calls made by other methods are counted in the outer call.
+        The methods are only wrapped while a hook is set, so there is no overhead when it's disabled.
+
+        :param hook: Called with a `CallRecord` after every call, e.g. a `LatencyRecorder` or an `OpenTelemetryHook`. Pass `None` to disable.
+        """
+        set_instrumentation(self, SandboxBase, hook)
+
+    @property
+    def stream(self) -> _AsyncVNCServer:
+        return self.__vnc_server
+
+    @property
+    def video_stream(self) -> _AsyncVideoStream:
+        """
+        Stream of the display as encoded video, an alternative to the VNC `stream` that takes less bandwidth.
+        """
+        return self.__video_stream
+
+    @property
+    def recording(self) -> _AsyncRecording:
+        return self.__recording
+
+    @property
+    def state(self) -> _AsyncDesktopState:
+        return self.__state
+
+    @overload
+    async def screenshot(
+        self,
+        format: Literal["stream"],
+        *,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        scale: Optional[float] = None,
+        max_size: Optional[Union[int, Tuple[int, int]]] = None,
+        image_format: ImageFormat = "png",
+        quality: Optional[int] = None,
+        include_pointer: bool = True,
+    ) -> AsyncIterator[bytes]:
+        """
+        Take a screenshot and return it as a stream of bytes.
+        """
+
+    @overload
+    async def screenshot(
+        self,
+        format: Literal["bytes"] = "bytes",
+        *,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        scale: Optional[float] = None,
+        max_size: Optional[Union[int, Tuple[int, int]]] = None,
+        image_format: ImageFormat = "png",
+        quality: Optional[int] = None,
+        include_pointer: bool = True,
+    ) -> bytearray:
+        """
+        Take a screenshot and return it as a bytearray.
+        """
+
+    async def screenshot(
+        self,
+        format: Literal["bytes", "stream"] = "bytes",
+        *,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        scale: Optional[float] = None,
+        max_size: Optional[Union[int, Tuple[int, int]]] = None,
+        image_format: ImageFormat = "png",
+        quality: Optional[int] = None,
+        include_pointer: bool = True,
+    ):
+        """
+        Take a screenshot and return it in the specified format.
+
+        The image is cropped, scaled and encoded inside the sandbox, so only the final image is transferred.
+
+        :param format: The format of the screenshot. Can be 'bytes' or 'stream'.
+        :param region: Capture only the `(x, y, width, height)` region of the screen.
+        :param scale: Scale the image by the given factor, e.g. `0.5` for half the size.
+        :param max_size: Scale the image down to fit into the given `(width, height)`, or a square if a single number is given. Keeps the aspect ratio and never scales up.
+        :param image_format: The image encoding. Can be 'png', 'jpeg' or 'webp'. Defaults to 'png'.
+        :param quality: Quality of 'jpeg' and 'webp' images from 1 to 100. Defaults to 80.
+        :param include_pointer: Draw the mouse pointer into the image. Defaults to `True`.
+        :returns: The screenshot in the specified format.
+        :raises ValueError: If the options are invalid
+        """
+        command = screenshot_command(
+            self._display,
+            region=region,
+            scale=scale,
+            max_size=max_size,
+            image_format=image_format,
+            quality=quality,
+            include_pointer=include_pointer,
+        )
+
+        if format == "stream":
+            return await self._stream_output(command)
+
+        result = await self.commands.run(command)
+        return bytearray(base64.b64decode(result.stdout))
+
+    async def _stream_output(self, command: str) -> AsyncIterator[bytes]:
+        """
+        Run a command that writes base64 encoded data to stdout and stream the decoded bytes.
+        """
+        queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        handle = await self.commands.run(
+            command, background=True, on_stdout=queue.put_nowait
+        )
+
+        async def finish() -> None:
+            try:
+                await handle.wait()
+            finally:
+                queue.put_nowait(None)
+
+        waiter = asyncio.create_task(finish())
+
+        async def stream() -> AsyncIterator[bytes]:
+            decoder = Base64StreamDecoder()
+            while (stdout := await queue.get()) is not None:
+                chunk = decoder.feed(stdout)
+                if chunk:
+                    yield chunk
+            await waiter
+            decoder.finish()
+
+        return stream()
+
+    async def screenshot_delta(
+        self,
+        since: Optional[str] = None,
+        *,
+        session: str = "default",
+        tile_size: int = 64,
+        include_pointer: bool = True,
+    ) -> ScreenshotDelta:
+        """
+        Take a screenshot and return only the parts of the screen that changed since the given frame.
+
+        The sandbox keeps the last frame of each session on each display. If `since` matches it, only the changed
+        tiles are returned, or a "not modified" marker if nothing changed. Otherwise the whole frame
+        is returned as a keyframe. Use `FrameAssembler` to reassemble the full frames.
+
+        :param since: Hash of the frame the client already has, `None` to request a keyframe.
+        :param session: Name of the session, use one per client that tracks frames independently.
+        :param tile_size: Size of the tiles the screen is compared in, in pixels.
+        :param include_pointer: Draw the mouse pointer into the image. Defaults to `True`.
+        :return: The changes since the given frame.
+        """
+        validate_session(session)
+        if tile_size <= 0:
+            raise ValueError("tile_size must be greater than 0")
+
+        path = await self._upload_script("delta_capture.py")
+        result = await self.commands.run(
+            f"python3 {path} {session} {since or '-'} {tile_size} {int(include_pointer)}"
+        )
+        return parse_delta(result.stdout)
+
+    async def wait_for_screen_change(
+        self,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        timeout: float = 10,
+        *,
+        since: Optional[str] = None,
+        min_changed_pixels: int = 1,
+        include_pointer: bool = False,
+        fps: float = 20,
+    ) -> ScreenChange:
+        """
+        Wait until the screen, or a region of it, changes.
+
+        The screen is captured and compared inside the sandbox, so the wait takes a single request
+        and returns as soon as a changed frame is captured.
+
+        :param region: Watch only the `(x, y, width, height)` region of the screen.
+        :param timeout: Give up after this many seconds.
+        :param since: `hash` of the result of a previous wait on the same region. Changes since the
+            frame that wait ended with count, so a change that happens before this wait starts,
+            e.g. right after a click, isn't missed.
+        :param min_changed_pixels: Ignore changes of fewer pixels, e.g. a blinking text cursor.
+        :param include_pointer: Count movements of the mouse pointer as changes. Defaults to `False`.
+        :param fps: Number of frames captured and compared per second.
+        :return: Whether the screen changed before the timeout and the bounding box of the change.
+        :raises ValueError: If the options are invalid
+        """
+        return await self._wait_for_screen(
+            "change",
+            region,
+            timeout,
+            since=since,
+            min_changed_pixels=min_changed_pixels,
+            include_pointer=include_pointer,
+            fps=fps,
+        )
+
+    async def wait_until_stable(
+        self,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        quiet_ms: float = 500,
+        timeout: float = 10,
+        *,
+        min_changed_pixels: int = 1,
+        include_pointer: bool = False,
+        fps: float = 20,
+    ) -> ScreenChange:
+        """
+        Wait until the screen, or a region of it, stops changing, e.g. after an application started
+        or a page loaded.
+
+        The screen is captured and compared inside the sandbox, so the wait takes a single request
+        and returns as soon as nothing changed for `quiet_ms` milliseconds.
+
+        :param region: Watch only the `(x, y, width, height)` region of the screen.
+        :param quiet_ms: How long the screen must not change, in milliseconds.
+        :param timeout: Give up after this many seconds.
+        :param min_changed_pixels: Ignore changes of fewer pixels, e.g. a blinking text cursor.
+        :param include_pointer: Count movements of the mouse pointer as changes. Defaults to `False`.
+        :param fps: Number of frames captured and compared per second.
+        :return: Whether the screen became stable before the timeout and the bounding box of everything that changed until then.
+        :raises ValueError: If the options are invalid
+        """
+        return await self._wait_for_screen(
+            "stable",
+            region,
+            timeout,
+            quiet_ms=quiet_ms,
+            min_changed_pixels=min_changed_pixels,
+            include_pointer=include_pointer,
+            fps=fps,
+        )
+
+    async def _wait_for_screen(
+        self,
+        mode: str,
+        region: Optional[Tuple[int, int, int, int]],
+        timeout: float,
+        **options,
+    ) -> ScreenChange:
+        command = screen_wait_command(
+            self._display,
+            await self._upload_script("screen_wait.py"),
+            mode,
+            timeout,
+            region=region,
+            **options,
+        )
+        try:
+            output = (await self.commands.run(command, timeout=timeout + 30)).stdout
+        except CommandExitException as e:
+            # The program reports why it failed before exiting
+            output = e.stdout
+        return parse_screen_change(output)
+
+    async def locate_on_screen(
+        self,
+        needle_png: bytes,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        confidence: float = 0.9,
+        *,
+        grayscale: bool = False,
+        include_pointer: bool = False,
+    ) -> Optional[ScreenMatch]:
+        """
+        Find an image, e.g. of a button, on the screen.
+
+        The screen is searched inside the sandbox, only the position is transferred. The image is
+        uploaded once per sandbox, repeated searches for it reuse the uploaded copy.
+
+        :param needle_png: The image to find, as PNG or any other format Pillow can read.
+        :param region: Search only the `(x, y, width, height)` region of the screen.
+        :param confidence: Minimum score of a match, from 0 to 1. Lower it to also find images that differ slightly, e.g. by antialiasing.
+        :param grayscale: Compare only the brightness of the pixels, about twice as fast but colors that are equally bright can't be told apart.
+        :param include_pointer: Search the screen with the mouse pointer drawn into it. Defaults to `False`.
+        :return: The best match, `None` if the image wasn't found.
+        :raises ValueError: If the options are invalid
+        """
+        matches = await self._locate(
+            needle_png, region, confidence, 1, grayscale, include_pointer
+        )
+        return matches[0] if matches else None
+
+    async def locate_all(
+        self,
+        needle_png: bytes,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        confidence: float = 0.9,
+        *,
+        limit: int = 100,
+        grayscale: bool = False,
+        include_pointer: bool = False,
+    ) -> List[ScreenMatch]:
+        """
+        Find all occurrences of an image on the screen, see `locate_on_screen()`.
+
+        Matches that overlap a better match are left out.
+
+        :param limit: Maximum number of matches.
+        :return: The matches, best first.
+        :raises ValueError: If the options are invalid
+        """
+        return await self._locate(
+            needle_png, region, confidence, limit, grayscale, include_pointer
+        )
+
+    async def _locate(
+        self,
+        needle_png: bytes,
+        region: Optional[Tuple[int, int, int, int]],
+        confidence: float,
+        limit: int,
+        grayscale: bool,
+        include_pointer: bool,
+    ) -> List[ScreenMatch]:
+        path, size = await self._upload_needle(needle_png)
+        command = locate_command(
+            self._display,
+            await self._upload_script("locate.py"),
+            path,
+            size,
+            confidence,
+            limit,
+            region=region,
+            grayscale=grayscale,
+            include_pointer=include_pointer,
+        )
+        try:
+            output = (await self.commands.run(command)).stdout
+        except CommandExitException as e:
+            # The program reports why it failed before exiting
+            output = e.stdout
+        return parse_matches(output)
+
+    async def read_region(
+        self,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        *,
+        language: str = "eng",
+        scale: int = 2,
+    ) -> ScreenText:
+        """
+        Read the text on the screen, or in a region of it, with OCR.
+
+        The text is recognized inside the sandbox, only the text and its boxes are transferred.
+        The result is cached by the captured frame, so reading an unchanged screen again is fast.
+
+        :param region: Read only the `(x, y, width, height)` region of the screen.
+        :param language: Tesseract language code, e.g. 'eng' or 'eng+deu'. Languages other than
+            English need their `tesseract-ocr-<language>` package in the template.
+        :param scale: Enlarge the screen by this factor before recognizing it, from 1 to 4. Small fonts
+            are recognized better when enlarged, but it takes longer.
+        :return: The recognized lines with the boxes of their words.
+        :raises ValueError: If the options are invalid
+        """
+        validate_language(language)
+        command = ocr_command(
+            self._display,
+            await self._upload_script("ocr.py"),
+            region=region,
+            scale=scale,
+            language=language,
+        )
+        try:
+            output = (await self.commands.run(command)).stdout
+        except CommandExitException as e:
+            # The program reports why it failed before exiting
+            output = e.stdout
+        return parse_screen_text(output)
+
+    async def find_text(
+        self,
+        query: str,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        *,
+        case_sensitive: bool = False,
+        language: str = "eng",
+        scale: int = 2,
+    ) -> List[TextBox]:
+        """
+        Find text on the screen with OCR, see `read_region()`.
+
+        :param query: Text to find, it may span words but not lines.
+        :param region: Search only the `(x, y, width, height)` region of the screen.
+        :param case_sensitive: Compare the case of the letters. Defaults to `False`.
+        :return: One box per occurrence, from top to bottom. Empty if the text wasn't found.
+        :raises ValueError: If the options are invalid
+        """
+        if not query.strip():
+            raise ValueError("query must not be empty")
+        text = await self.read_region(region, language=language, scale=scale)
+        return text.find(query, case_sensitive=case_sensitive)
+
+    async def frames(
+        self,
+        fps: float = 5,
+        *,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        scale: Optional[float] = None,
+        max_size: Optional[Union[int, Tuple[int, int]]] = None,
+        image_format: ImageFormat = "jpeg",
+        quality: Optional[int] = None,
+        include_pointer: bool = True,
+        buffer_size: int = 2,
+    ) -> AsyncFrameStream:
+        """
+        Capture the screen continuously and stream the encoded frames.
+
+        A single capture process runs in the sandbox for the whole stream, so there is no
+        per-frame request or process startup. If the frames are consumed slower than they're
+        captured, the oldest buffered frames are dropped.
+
+        :param fps: Number of frames captured per second.
+        :param region: Capture only the `(x, y, width, height)` region of the screen.
+        :param scale: Scale the frames by the given factor, e.g. `0.5` for half the size.
+        :param max_size: Scale the frames down to fit into the given `(width, height)`, or a square if a single number is given.
+        :param image_format: The image encoding. Can be 'png', 'jpeg' or 'webp'. Defaults to 'jpeg'.
+        :param quality: Quality of 'jpeg' and 'webp' frames from 1 to 100. Defaults to 80.
+        :param include_pointer: Draw the mouse pointer into the frames. Defaults to `True`.
+        :param buffer_size: Number of frames buffered on the client before the oldest ones are dropped.
+        :return: An async iterator over the frames. Close it to stop the capture.
+        :raises ValueError: If the options are invalid
+        """
+        stream = AsyncFrameStream(buffer_size=buffer_size)
+        command = frames_command(
+            self._display,
+            await self._upload_script("frame_stream.py"),
+            fps=fps,
+            region=region,
+            scale=scale,
+            max_size=max_size,
+            image_format=image_format,
+            quality=quality,
+            include_pointer=include_pointer,
+        )
+        handle = await self.commands.run(
+            command, background=True, timeout=0, on_stdout=stream._on_stdout
+        )
+        stream._attach(handle)
+        return stream
+
+    async def left_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        """
+        Left click on the mouse position.
+        """
+        if x and y:
+            await self.batch().left_click(x, y).run()
+            return
+        await self._send_input(["click", 1], "xdotool click 1")
+
+    async def double_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        """
+        Double left click on the mouse position.
+        """
+        if x and y:
+            await self.batch().double_click(x, y).run()
+            return
+        await self._send_input(["click", 1, 2], "xdotool click --repeat 2 1")
+
+    async def right_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        if (x is None) != (y is None):
+            raise ValueError("Both x and y must be provided together")
+        """
+        Right click on the mouse position.
+        """
+        if x and y:
+            await self.batch().right_click(x, y).run()
+            return
+        await self._send_input(["click", 3], "xdotool click 3")
+
+    async def middle_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        """
+        Middle click on the mouse position.
+        """
+        if x and y:
+            await self.batch().middle_click(x, y).run()
+            return
+        await self._send_input(["click", 2], "xdotool click 2")
+
+    async def scroll(self, direction: Literal["up", "down"] = "down", amount: int = 1):
+        """
+        Scroll the mouse wheel by the given amount.
+
+        :param direction: The direction to scroll. Can be "up" or "down".
+        :param amount: The amount to scroll.
+        """
+        await self._send_input(
+            ["click", 4 if direction == "up" else 5, amount],
+            f"xdotool click --repeat {amount} {'4' if direction == 'up' else '5'}",
+        )
+
+    async def move_mouse(self, x: int, y: int):
+        """
+        Move the mouse to the given coordinates.
+
+        :param x: The x coordinate.
+        :param y: The y coordinate.
+        """
+        await self._send_input(["move", x, y], f"xdotool mousemove --sync {x} {y}")
+
+    async def mouse_press(self, button: Literal["left", "right", "middle"] = "left"):
+        """
+        Press the mouse button.
+        """
+        await self._send_input(
+            ["down", MOUSE_BUTTONS[button]],
+            f"xdotool mousedown {MOUSE_BUTTONS[button]}",
+        )
+
+    async def mouse_release(self, button: Literal["left", "right", "middle"] = "left"):
+        """
+        Release the mouse button.
+        """
+        await self._send_input(
+            ["up", MOUSE_BUTTONS[button]], f"xdotool mouseup {MOUSE_BUTTONS[button]}"
+        )
+
+    async def get_cursor_position(self) -> tuple[int, int]:
+        """
+        Get the current cursor position.
+
+        :return: A tuple with the x and y coordinates
+        :raises RuntimeError: If the cursor position cannot be determined
+        """
+        cached = self.__state._cache.pointer()
+        if cached is not None:
+            return cached
+
+        if self._input_server:
+            x, y = (await self._input_server.send(["location"]))[0]
+            return int(x), int(y)
+
+        result = await self.commands.run("xdotool getmouselocation")
+        return parse_cursor_position(result.stdout)
+
+    async def get_screen_size(self) -> tuple[int, int]:
+        """
+        Get the current screen size.
+
+        :return: A tuple with the width and height
+        :raises RuntimeError: If the screen size cannot be determined
+        """
+        cached = self.__state._cache.screen()
+        if cached is not None:
+            return cached
+
+        result = await self.commands.run("xrandr")
+        return parse_screen_size(result.stdout)
+
+    async def write(
+        self,
+        text: str,
+        *,
+        chunk_size: int = 25,
+        delay_in_ms: int = 75,
+        mode: WriteMode = "type",
+        paste_key: Union[str, list[str]] = "ctrl+v",
+    ) -> None:
+        """
+        Write the given text at the current cursor position.
+
+        The text is typed key by key. With `mode="paste"` it's placed on the clipboard instead and
+        pasted with a single key press, which keeps newlines, indentation and any Unicode characters
+        exactly as they are and takes one request regardless of the length. Pasting replaces the
+        content of the clipboard.
+
+        :param text: The text to write.
+        :param chunk_size: The size of each chunk of text to write.
+        :param delay_in_ms: The delay between each chunk of text.
+        :param mode: "type" (the default) to type key by key, "paste" to paste through the clipboard, or "auto" to paste only text longer than 100 characters.
+        :param paste_key: The key combination that pastes in the focused application, e.g. "ctrl+shift+v" in a terminal.
+        :raises RuntimeError: If the text was pasted and no application asked for it
+        """
+        await (
+            self.batch()
+            .write(
+                text,
+                chunk_size=chunk_size,
+                delay_in_ms=delay_in_ms,
+                mode=mode,
+                paste_key=paste_key,
+            )
+            .run()
+        )
+
+    async def press(self, key: Union[str, list[str]]):
+        """
+        Press a key.
+
+        :param key: The key to press (e.g. "enter", "space", "backspace", etc.).
+        """
+        if isinstance(key, list):
+            key = "+".join(map_key(k) for k in key)
+        else:
+            key = map_key(key)
+
+        await self._send_input(["key", key], f"xdotool key {key}")
+
+    async def drag(self, fr: tuple[int, int], to: tuple[int, int]):
+        """
+        Drag the mouse from the given position to the given position.
+
+        :param from: The starting position.
+        :param to: The ending position.
+        """
+        await self.batch().drag(fr, to).run()
+
+    async def wait(self, ms: int):
+        """
+        Wait for the given amount of time.
+
+        :param ms: The amount of time to wait in milliseconds.
+        """
+        await self.commands.run(f"sleep {ms / 1000}")
+
+    async def open(self, file_or_url: str):
+        """
+        Open a file or a URL in the default application.
+
+        :param file_or_url: The file or URL to open.
+        """
+        handle = await self.commands.run(f"xdg-open {file_or_url}", background=True)
+        await handle.disconnect()
+
+    async def get_current_window_id(self) -> str:
+        """
+        Get the current window ID.
+        """
+        cached = self.__state._cache.focus()
+        if cached is not None:
+            return cached
+
+        return (await self.commands.run("xdotool getwindowfocus")).stdout.strip()
+
+    async def get_application_windows(self, application: str) -> list[str]:
+        """
+        Get the window IDs of all windows for the given application.
+        """
+        cached = self.__state._cache.application_windows(application)
+        if cached is not None:
+            return cached
+
+        result = await self.commands.run(
+            f"xdotool search --onlyvisible --class {application}"
+        )
+        return result.stdout.strip().split("\n")
+
+    async def get_window_title(self, window_id: str) -> str:
+        """
+        Get the title of the window with the given ID.
+        """
+        cached = self.__state._cache.window_title(window_id)
+        if cached is not None:
+            return cached
+
+        return (
+            await self.commands.run(f"xdotool getwindowname {window_id}")
+        ).stdout.strip()
+
+    async def launch(self, application: str, uri: Optional[str] = None):
+        """
+        Launch an application.
+        """
+        handle = await self.commands.run(
+            f"gtk-launch {application} {uri or ''}", background=True, timeout=0
+        )
+        await handle.disconnect()
@@ -0,0 +1,286 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Tuple, Union
+
+from .keys import MOUSE_BUTTONS, map_key
+
+if TYPE_CHECKING:
+    from .async_main import AsyncSandbox
+    from .main import Sandbox
+
+WriteMode = Literal["auto", "type", "paste"]
+
+# Text longer than this is pasted through the clipboard by `write(mode="auto")`
+PASTE_MIN_LENGTH = 100
+
+# Larger batches are not passed to the sandbox on the command line, in bytes
+_MAX_INLINE_BATCH = 64 * 1024
+
+# How long the sandbox waits for an application to ask for pasted text, in milliseconds
+_PASTE_TIMEOUT_MS = 2000
+
+
+def _key_combination(key: Union[str, List[str]]) -> str:
+    if isinstance(key, list):
+        return "+".join(map_key(k) for k in key)
+    return map_key(key)
+
+
+@dataclass
+class BatchStep:
+    """
+    Result of a single recorded action.
+    """
+
+    action: str
+    """Name of the recorded method, e.g. `move_mouse`."""
+    result: Any
+    """Return value of the action, e.g. the cursor position for `get_cursor_position`."""
+    duration_ms: float
+    """Time the action took to execute inside the sandbox, in milliseconds."""
+
+
+@dataclass
+class BatchResult:
+    """
+    Result of an executed batch of actions.
+    """
+
+    steps: List[BatchStep] = field(default_factory=list)
+    """Results of the recorded actions, in order."""
+    duration_ms: float = 0
+    """Wall time of the whole batch as seen by the client, in milliseconds."""
+
+    def __getitem__(self, index: int) -> BatchStep:
+        return self.steps[index]
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+
+class _ActionRecorder:
+    """
+    Records mouse and keyboard actions as input operations for the sandbox.
+
+    The recording methods have the same signatures as the `Sandbox` methods
+    and return the batch, so they can be chained.
+    """
+
+    def __init__(self, delay_in_ms: int = 0) -> None:
+        self._steps: List[Tuple[str, List[List[Any]]]] = []
+        self._delay_in_ms = delay_in_ms
+
+    def _add(self, action: str, *ops: List[Any]):
+        self._steps.append((action, list(ops)))
+        return self
+
+    @staticmethod
+    def _move_to(x: Optional[int], y: Optional[int]) -> List[List[Any]]:
+        if x and y:
+            return [["move", x, y]]
+        return []
+
+    def left_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        return self._add("left_click", *self._move_to(x, y), ["click", 1])
+
+    def double_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        return self._add("double_click", *self._move_to(x, y), ["click", 1, 2])
+
+    def right_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        if (x is None) != (y is None):
+            raise ValueError("Both x and y must be provided together")
+        return self._add("right_click", *self._move_to(x, y), ["click", 3])
+
+    def middle_click(self, x: Optional[int] = None, y: Optional[int] = None):
+        return self._add("middle_click", *self._move_to(x, y), ["click", 2])
+
+    def scroll(self, direction: Literal["up", "down"] = "down", amount: int = 1):
+        return self._add("scroll", ["click", 4 if direction == "up" else 5, amount])
+
+    def move_mouse(self, x: int, y: int):
+        return self._add("move_mouse", ["move", x, y])
+
+    def mouse_press(self, button: Literal["left", "right", "middle"] = "left"):
+        return self._add("mouse_press", ["down", MOUSE_BUTTONS[button]])
+
+    def mouse_release(self, button: Literal["left", "right", "middle"] = "left"):
+        return self._add("mouse_release", ["up", MOUSE_BUTTONS[button]])
+
+    def get_cursor_position(self):
+        return self._add("get_cursor_position", ["location"])
+
+    def write(
+        self,
+        text: str,
+        *,
+        chunk_size: int = 25,
+        delay_in_ms: int = 75,
+        mode: WriteMode = "type",
+        paste_key: Union[str, List[str]] = "ctrl+v",
+    ):
+        if mode not in ("auto", "type", "paste"):
+            raise ValueError(f"Unknown write mode: {mode}")
+        if mode == "paste" or (mode == "auto" and len(text) > PASTE_MIN_LENGTH):
+            if isinstance(paste_key, str):
+                paste_key = paste_key.split("+")
+            return self._add("write", ["paste", text, _key_combination(paste_key)])
+        return self._add(
+            "write",
+            *(
+                ["type", text[i : i + chunk_size], delay_in_ms]
+                for i in range(0, len(text), chunk_size)
+            ),
+        )
+
+    def press(self, key: Union[str, List[str]]):
+        return self._add("press", ["key", _key_combination(key)])
+
+    def drag(self, fr: Tuple[int, int], to: Tuple[int, int]):
+        return self._add(
+            "drag",
+            ["move", fr[0], fr[1]],
+            ["down", MOUSE_BUTTONS["left"]],
+            ["move", to[0], to[1]],
+            ["up", MOUSE_BUTTONS["left"]],
+        )
+
+    def wait(self, ms: int):
+        return self._add("wait", ["sleep", ms])
+
+    def _ops(self) -> Tuple[List[List[Any]], List[Optional[int]]]:
+        """
+        Flatten the recorded actions into operations.
+
+        :return: A tuple with the operations and the index of the action each operation belongs to.
+        """
+        ops: List[List[Any]] = []
+        owners: List[Optional[int]] = []
+        for index, (_, step_ops) in enumerate(self._steps):
+            if index and self._delay_in_ms:
+                ops.append(["sleep", self._delay_in_ms])
+                owners.append(None)
+            ops.extend(step_ops)
+            owners.extend([index] * len(step_ops))
+        return ops, owners
+
+    def _result(
+        self, owners: List[Optional[int]], payload: Dict[str, Any], duration_ms: float
+    ) -> BatchResult:
+        step_results: List[List[Any]] = [[] for _ in self._steps]
+        step_timings = [0.0 for _ in self._steps]
+        for owner, result, timing in zip(
+            owners, payload["results"], payload["timings"]
+        ):
+            if owner is not None:
+                step_results[owner].append(result)
+                step_timings[owner] += timing
+
+        if "error" in payload:
+            failed = owners[len(payload["timings"])]
+            action = self._steps[failed][0] if failed is not None else "wait"
+            raise RuntimeError(f"Batch action {action} failed: {payload['error']}")
+
+        return BatchResult(
+            steps=[
+                BatchStep(
+                    action=action,
+                    result=_step_result(action, step_results[index]),
+                    duration_ms=step_timings[index],
+                )
+                for index, (action, _) in enumerate(self._steps)
+            ],
+            duration_ms=duration_ms,
+        )
+
+
+class ActionBatch(_ActionRecorder):
+    """
+    Records mouse and keyboard actions and executes them in the sandbox in a single request.
+
+    The recording methods have the same signatures as the `Sandbox` methods
+    and return the batch, so they can be chained:
+
+    ```python
+    result = (
+        desktop.batch()
+        .move_mouse(100, 200)
+        .left_click()
+        .write("Hello, world!")
+        .press("enter")
+        .run()
+    )
+    ```
+    """
+
+    def __init__(self, desktop: "Sandbox", delay_in_ms: int = 0) -> None:
+        super().__init__(delay_in_ms)
+        self.__desktop = desktop
+
+    def run(self) -> BatchResult:
+        """
+        Execute the recorded actions in order in a single request.
+
+        :return: Per-action results and timings.
+        :raises RuntimeError: If one of the actions fails. Actions after the failing one are not executed.
+        """
+        ops, owners = self._ops()
+        payload, duration_ms = self.__desktop._run_input_ops(ops)
+        return self._result(owners, payload, duration_ms)
+
+
+class AsyncActionBatch(_ActionRecorder):
+    """
+    Records mouse and keyboard actions and executes them in the sandbox in a single request.
+
+    The recording methods have the same signatures as the `AsyncSandbox` methods,
+    but they only record the action, so they are not awaited:
+
+    ```python
+    result = await (
+        desktop.batch()
+        .move_mouse(100, 200)
+        .left_click()
+        .write("Hello, world!")
+        .press("enter")
+        .run()
+    )
+    ```
+    """
+
+    def __init__(self, desktop: "AsyncSandbox", delay_in_ms: int = 0) -> None:
+        super().__init__(delay_in_ms)
+        self.__desktop = desktop
+
+    async def run(self) -> BatchResult:
+        """
+        Execute the recorded actions in order in a single request.
+
+        :return: Per-action results and timings.
+        :raises RuntimeError: If one of the actions fails. Actions after the failing one are not executed.
+        """
+        ops, owners = self._ops()
+        payload, duration_ms = await self.__desktop._run_input_ops(ops)
+        return self._result(owners, payload, duration_ms)
+
+
+def _step_result(action: str, results: List[Any]) -> Any:
+    if action == "get_cursor_position":
+        x, y = results[-1]
+        return int(x), int(y)
+    return None
+
+
+def _estimate_duration(ops: List[List[Any]]) -> float:
+    """
+    Estimate how long the operations will sleep or type inside the sandbox, in seconds.
+    """
+    total_ms = 0.0
+    for op in ops:
+        if op[0] == "sleep":
+            total_ms += op[1]
+        elif op[0] == "type":
+            total_ms += len(op[1]) * op[2]
+        elif op[0] == "paste":
+            total_ms += _PASTE_TIMEOUT_MS
+        elif op[0] == "click" and len(op) > 2:
+            total_ms += op[2] * 100
+    return total_ms / 1000
@@ -0,0 +1,219 @@
+import json
+from shlex import quote as quote_string
+from typing import Dict, List, Literal, Optional
+
+from e2b import TimeoutException
+
+from .scripts import load_script
+
+WaitFor = Literal["x11", "session", "none"]
+
+_WAIT_FOR_PHASES = ("x11", "session", "none")
+
+Session = Literal["xfce", "openbox", "none"]
+
+SESSION_COMMANDS: Dict[str, List[str]] = {
+    # The full desktop, with panel, desktop, settings daemons and autostart entries
+    "xfce": ["startxfce4"],
+    # A bare window manager, enough to manage and focus the windows of a single application
+    "openbox": ["openbox"],
+    # The X server alone, windows are neither decorated nor managed
+    "none": [],
+}
+
+
+def launcher_command(
+    display: str,
+    width: int,
+    height: int,
+    dpi: int,
+    session_command: List[str],
+    x11_timeout: float = 10,
+    session_timeout: float = 60,
+    stream: Optional[dict] = None,
+) -> str:
+    """
+    Build a command that boots the desktop in the sandbox and reports every finished phase.
+
+    The program is passed inline rather than uploaded, so the boot takes a single request.
+
+    :param session_command: Command that starts the desktop session, an empty list to start the X server alone.
+    :param stream: Start the stream right after the session, with the config built by `stream_config`.
+    """
+    return _launcher(
+        {
+            "display": display,
+            "width": width,
+            "height": height,
+            "dpi": dpi,
+            "session_command": session_command,
+            "x11_timeout": x11_timeout,
+            "session_timeout": session_timeout,
+            "stream": stream,
+        }
+    )
+
+
+def session_command_for(
+    session: str, session_command: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Command that starts the desktop session, an empty list for no session.
+
+    :param session_command: Custom command that starts the session, it takes precedence over `session`.
+    :raises ValueError: If the session is unknown
+    """
+    if session not in SESSION_COMMANDS:
+        raise ValueError(
+            f"session must be one of {', '.join(SESSION_COMMANDS)}, got {session!r}"
+        )
+    if session_command is not None:
+        return session_command
+    return SESSION_COMMANDS[session]
+
+
+def session_restart_command(
+    display: str, session_command: List[str], session_timeout: float = 60
+) -> str:
+    """
+    Build a command that starts the desktop session of a running display and waits until it manages the screen.
+    """
+    return _launcher(
+        {
+            "display": display,
+            "session_command": session_command,
+            "session_timeout": session_timeout,
+        }
+    )
+
+
+def session_alive_command(pid: int) -> str:
+    """
+    Build a command that prints `alive` if the session's process is running and not a zombie.
+    """
+    return f"ps -o stat= -p {pid} | grep -qv '^Z' && echo alive; true"
+
+
+def stream_command(display: str, stream: dict) -> str:
+    """
+    Build a command that starts the stream of a running display and waits until it listens.
+    """
+    return _launcher({"display": display, "stream": stream})
+
+
+def stream_config(
+    vnc_port: int,
+    port: int,
+    flags: List[str],
+    password: Optional[str] = None,
+    window_id: Optional[str] = None,
+    timeout: float = 10,
+) -> dict:
+    """
+    Config of the stream for the `desktop_launcher.py` sandbox program.
+
+    :param flags: Options of x11vnc that tune the stream, see `x11vnc_flags`.
+    :param password: Password viewers have to enter, `None` to disable authentication.
+    :param window_id: Stream only this window instead of the whole screen.
+    :param timeout: Deadline for both servers to listen, in seconds.
+    """
+    return {
+        "vnc_port": vnc_port,
+        "port": port,
+        "flags": flags,
+        "password": password,
+        "window_id": window_id,
+        "timeout": timeout,
+    }
+
+
+def _launcher(config: dict) -> str:
+    _, source = load_script("desktop_launcher.py")
+    return f"python3 -c {quote_string(source)} {quote_string(json.dumps(config))}"
+
+
+def parse_stream_output(output: str) -> dict:
+    """
+    Fields of the `stream` phase from the output of `stream_command`.
+
+    :raises RuntimeError: If the stream is already running
+    :raises TimeoutException: If the stream couldn't be started
+    """
+    progress = BootProgress("none", stream=True)
+    progress.feed(output + "\n")
+    if progress.error == "Stream is already running":
+        raise RuntimeError(progress.error)
+    if progress.error or progress.stream is None:
+        raise TimeoutException(
+            f"Could not start the stream: {progress.error or 'launcher exited'}"
+        )
+    return progress.stream
+
+
+def validate_wait_for(wait_for: str) -> None:
+    if wait_for not in _WAIT_FOR_PHASES:
+        raise ValueError(
+            f"wait_for must be one of {', '.join(_WAIT_FOR_PHASES)}, got {wait_for!r}"
+        )
+
+
+class BootProgress:
+    """
+    Follow the output of the `desktop_launcher.py` sandbox program.
+    """
+
+    def __init__(self, wait_for: WaitFor, stream: bool = False) -> None:
+        """
+        :param stream: Whether the launcher starts the stream, which is awaited as well.
+        """
+        self._wait_for = wait_for
+        self._await_stream = stream
+        self._pending = ""
+        self.timings: Dict[str, float] = {}
+        """Time since the launcher started until each phase finished, in milliseconds."""
+        self.session_started = False
+        self.session_pid: Optional[int] = None
+        """Pid of the session's process, `None` without a session."""
+        self.stream: Optional[dict] = None
+        """Fields of the `stream` phase, the time x11vnc and the noVNC proxy took and the proxy's pid."""
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        """
+        `True` once the awaited phase finished or the boot failed.
+        """
+        if self.error is not None:
+            return True
+        if self._await_stream and self.stream is None:
+            return False
+        if self._wait_for == "none":
+            return True
+        if self._wait_for == "x11":
+            # The session is launched right after, so wait for its pid as well
+            return "x11" in self.timings and self.session_started
+        return self._wait_for in self.timings
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Process a chunk of the launcher's output.
+
+        :return: Whether the awaited phase finished or the boot failed.
+        """
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+
+        for line in lines:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if "error" in event:
+                self.error = event["error"]
+            elif event["phase"] == "session_started":
+                self.session_started = True
+                self.session_pid = event["pid"]
+            else:
+                if event["phase"] == "stream":
+                    self.stream = event
+                self.timings[event["phase"]] = event["ms"]
+        return self.done
@@ -0,0 +1,372 @@
+import base64
+import re
+from shlex import quote as quote_string
+from typing import Literal, Optional, Tuple, Union
+
+
+ImageFormat = Literal["png", "jpeg", "webp"]
+RecordingCodec = Literal["h264", "vp8"]
+VideoStreamCodec = Literal["h264", "vp8"]
+ScreenWaitMode = Literal["change", "stable"]
+
+_RECORDING_CODECS = {
+    "h264": ("mp4", "-c:v libx264 -preset ultrafast -pix_fmt yuv420p"),
+    "vp8": (
+        "webm",
+        "-c:v libvpx -deadline realtime -cpu-used 8 -b:v 2M -pix_fmt yuv420p",
+    ),
+}
+
+# Containers that state the size of every frame, so the frames can be forwarded as soon as they're written
+_VIDEO_STREAM_CODECS = {
+    "h264": (
+        "flv",
+        "-c:v libx264 -preset ultrafast -tune zerolatency -profile:v baseline "
+        "-pix_fmt yuv420p -f flv -flvflags no_duration_filesize",
+    ),
+    "vp8": (
+        "ivf",
+        "-c:v libvpx -deadline realtime -cpu-used 8 -lag-in-frames 0 "
+        "-error-resilient 1 -pix_fmt yuv420p -f ivf",
+    ),
+}
+
+
+def _encoding_flags(
+    scale: Optional[float],
+    max_size: Optional[Union[int, Tuple[int, int]]],
+    image_format: ImageFormat,
+    quality: Optional[int],
+) -> str:
+    """
+    Build the ffmpeg output flags that scale and encode the captured frames.
+
+    :raises ValueError: If the options are invalid
+    """
+    if image_format not in ("png", "jpeg", "webp"):
+        raise ValueError(f"Unsupported image format: {image_format}")
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError("quality must be between 1 and 100")
+    if scale is not None and max_size is not None:
+        raise ValueError("scale and max_size cannot be used together")
+    if scale is not None and scale <= 0:
+        raise ValueError("scale must be greater than 0")
+
+    filters = []
+    if scale is not None and scale != 1:
+        filters.append(f"scale=iw*{scale}:ih*{scale}")
+    if max_size is not None:
+        max_width, max_height = (
+            (max_size, max_size) if isinstance(max_size, int) else max_size
+        )
+        # Only ever scale down, keeping the aspect ratio
+        filters.append(
+            f"scale=min({max_width}\\,iw):min({max_height}\\,ih)"
+            ":force_original_aspect_ratio=decrease"
+        )
+    filter_flag = f"-vf {quote_string(','.join(filters))} " if filters else ""
+
+    if image_format == "jpeg":
+        # Map quality 1-100 onto the mjpeg quantizer scale 31-2
+        qscale = round(2 + (100 - (quality or 80)) * 29 / 99)
+        codec_flags = f"-c:v mjpeg -pix_fmt yuvj420p -q:v {qscale}"
+    elif image_format == "webp":
+        codec_flags = f"-c:v libwebp -quality {quality or 80}"
+    else:
+        codec_flags = "-c:v png -pix_fmt rgb24"
+
+    return f"{filter_flag}{codec_flags} -f image2pipe -"
+
+
+def _capture_flags(
+    display: str,
+    region: Optional[Tuple[int, int, int, int]],
+    include_pointer: bool,
+) -> str:
+    """
+    Build the ffmpeg input flags that grab the display, or a region of it.
+    """
+    source = display
+    size_flag = ""
+    if region:
+        x, y, width, height = region
+        if width <= 0 or height <= 0:
+            raise ValueError("Region width and height must be greater than 0")
+        size_flag = f"-video_size {width}x{height} "
+        source = f"{display}+{x},{y}"
+
+    return (
+        f"-f x11grab -draw_mouse {int(include_pointer)} "
+        f"{size_flag}-i {quote_string(source)}"
+    )
+
+
+def screenshot_command(
+    display: str,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    scale: Optional[float] = None,
+    max_size: Optional[Union[int, Tuple[int, int]]] = None,
+    image_format: ImageFormat = "png",
+    quality: Optional[int] = None,
+    include_pointer: bool = True,
+) -> str:
+    """
+    Build a shell command that captures the display and writes the image, base64 encoded, to stdout.
+
+    The image is cropped, scaled and encoded by ffmpeg inside the sandbox and piped
+    straight to the client, so the capture takes a single command without touching
+    the sandbox's disk. Command output is text, so the image is transferred base64
+    encoded, a third larger than the image itself. Writing it to a file and reading
+    that with `files.read` transfers the raw bytes, but takes three round trips with
+    removing the file instead of one, which costs more than the extra bytes unless
+    the image is large and the connection slow. `benchmarks/sdk_overhead.py`
+    compares both.
+
+    :raises ValueError: If the options are invalid
+    """
+    encoding_flags = _encoding_flags(scale, max_size, image_format, quality)
+    return (
+        "set -o pipefail; "
+        f"ffmpeg -loglevel error {_capture_flags(display, region, include_pointer)} "
+        f"-frames:v 1 {encoding_flags} | base64 -w 0"
+    )
+
+
+def frames_command(
+    display: str,
+    framer_path: str,
+    fps: float,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    scale: Optional[float] = None,
+    max_size: Optional[Union[int, Tuple[int, int]]] = None,
+    image_format: ImageFormat = "jpeg",
+    quality: Optional[int] = None,
+    include_pointer: bool = True,
+) -> str:
+    """
+    Build a shell command that continuously captures the display and writes one base64 encoded frame per line to stdout.
+
+    :param framer_path: Path of the `frame_stream.py` program in the sandbox.
+    :raises ValueError: If the options are invalid
+    """
+    if fps <= 0:
+        raise ValueError("fps must be greater than 0")
+
+    encoding_flags = _encoding_flags(scale, max_size, image_format, quality)
+    return (
+        "set -o pipefail; "
+        f"ffmpeg -loglevel error -framerate {fps} "
+        f"{_capture_flags(display, region, include_pointer)} {encoding_flags} "
+        f"| python3 {framer_path} {image_format}"
+    )
+
+
+def recording_extension(codec: RecordingCodec) -> str:
+    """
+    File extension of the recording segments for the given codec.
+    """
+    if codec not in _RECORDING_CODECS:
+        raise ValueError(f"Unsupported codec: {codec}")
+    return _RECORDING_CODECS[codec][0]
+
+
+def recording_command(
+    display: str,
+    directory: str,
+    fps: float,
+    codec: RecordingCodec,
+    segment_seconds: float,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    include_pointer: bool = True,
+) -> str:
+    """
+    Build a shell command that records the display into rolling segments in the given directory.
+
+    Every finished segment is appended to `segments.csv` in the directory as
+    `<file>,<start>,<end>`. Writing `q` to the command's stdin stops the recording
+    and finalizes the last segment.
+
+    :raises ValueError: If the options are invalid
+    """
+    if fps <= 0:
+        raise ValueError("fps must be greater than 0")
+    if segment_seconds <= 0:
+        raise ValueError("segment_seconds must be greater than 0")
+    extension = recording_extension(codec)
+
+    # The encoders need even dimensions, and a keyframe at every segment boundary
+    # makes each segment playable on its own
+    return (
+        f"mkdir -p {directory} && exec ffmpeg -loglevel error -framerate {fps} "
+        f"{_capture_flags(display, region, include_pointer)} "
+        f"-vf 'scale=trunc(iw/2)*2:trunc(ih/2)*2' {_RECORDING_CODECS[codec][1]} "
+        f"-force_key_frames 'expr:gte(t,n_forced*{segment_seconds})' "
+        f"-f segment -segment_time {segment_seconds} -reset_timestamps 1 "
+        f"-segment_list {directory}/segments.csv -segment_list_type csv "
+        f"{directory}/segment-%05d.{extension}"
+    )
+
+
+def video_stream_command(
+    display: str,
+    server_path: str,
+    port: int,
+    fps: float,
+    bitrate: int,
+    codec: VideoStreamCodec,
+    scale: Optional[float] = None,
+    include_pointer: bool = True,
+    keyframe_seconds: float = 2,
+) -> str:
+    """
+    Build a shell command that encodes the display into a video stream and serves it over a WebSocket.
+
+    :param server_path: Path of the `video_stream.py` program in the sandbox.
+    :param bitrate: Target bitrate in kbit/s, also the upper bound over each second.
+    :param keyframe_seconds: Interval between keyframes, new viewers get the frames since the last one.
+    :raises ValueError: If the options are invalid
+    """
+    if fps <= 0:
+        raise ValueError("fps must be greater than 0")
+    if bitrate <= 0:
+        raise ValueError("bitrate must be greater than 0")
+    if codec not in _VIDEO_STREAM_CODECS:
+        raise ValueError(f"Unsupported codec: {codec}")
+    if scale is not None and not 0 < scale <= 1:
+        raise ValueError("scale must be greater than 0 and at most 1")
+    container, codec_flags = _VIDEO_STREAM_CODECS[codec]
+
+    # The encoders need even dimensions
+    factor = f"*{scale}" if scale is not None and scale != 1 else ""
+    size_filter = f"scale=trunc(iw{factor}/2)*2:trunc(ih{factor}/2)*2"
+    return (
+        f"exec python3 {server_path} {port} {container} -- "
+        f"ffmpeg -loglevel error -framerate {fps} "
+        f"{_capture_flags(display, None, include_pointer)} "
+        f"-vf {quote_string(size_filter)} {codec_flags} "
+        f"-b:v {bitrate}k -maxrate {bitrate}k -bufsize {bitrate}k "
+        f"-g {max(1, round(fps * keyframe_seconds))} -flush_packets 1 -"
+    )
+
+
+class Base64StreamDecoder:
+    """
+    Incrementally decode base64 text that arrives in arbitrarily split chunks.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+
+    def feed(self, chunk: str) -> bytes:
+        data = self._pending + "".join(chunk.split())
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable])
+
+    def finish(self) -> bytes:
+        if self._pending:
+            raise ValueError("Truncated base64 stream")
+        return b""
+
+
+def screen_wait_command(
+    display: str,
+    wait_path: str,
+    mode: ScreenWaitMode,
+    timeout: float,
+    fps: float,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    quiet_ms: float = 0,
+    min_changed_pixels: int = 1,
+    since: Optional[str] = None,
+    include_pointer: bool = False,
+) -> str:
+    """
+    Build a shell command that waits until the display, or a region of it, changes ('change') or stops changing ('stable').
+
+    :param wait_path: Path of the `screen_wait.py` program in the sandbox.
+    :param since: Hash of the frame a previous wait on the region ended with, to compare with instead of the first frame.
+    :raises ValueError: If the options are invalid
+    """
+    if mode not in ("change", "stable"):
+        raise ValueError(f"Unsupported mode: {mode}")
+    if timeout <= 0:
+        raise ValueError("timeout must be greater than 0")
+    if fps <= 0:
+        raise ValueError("fps must be greater than 0")
+    if quiet_ms < 0:
+        raise ValueError("quiet_ms must not be negative")
+    if min_changed_pixels < 1:
+        raise ValueError("min_changed_pixels must be at least 1")
+    if since is not None and not re.fullmatch(r"[0-9a-f]+", since):
+        raise ValueError(f"Invalid frame hash: {since!r}")
+
+    x, y, width, height = region or (0, 0, 0, 0)
+    return (
+        f"DISPLAY={display} python3 {wait_path} {mode} {timeout} {quiet_ms} {min_changed_pixels} "
+        f"{since or '-'} {x} {y} {width} {height} -- "
+        f"ffmpeg -loglevel error -framerate {fps} "
+        f"{_capture_flags(display, region, include_pointer)} "
+        "-f rawvideo -pix_fmt rgb24 -"
+    )
+
+
+def locate_command(
+    display: str,
+    locate_path: str,
+    needle_path: str,
+    needle_size: Tuple[int, int],
+    confidence: float,
+    limit: int,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    grayscale: bool = False,
+    include_pointer: bool = False,
+) -> str:
+    """
+    Build a shell command that captures the display, or a region of it, and finds the needle in it.
+
+    :param locate_path: Path of the `locate.py` program in the sandbox.
+    :param needle_path: Path of the needle's raw RGB pixels in the sandbox.
+    :param needle_size: `(width, height)` of the needle.
+    :raises ValueError: If the options are invalid
+    """
+    if not 0 < confidence <= 1:
+        raise ValueError("confidence must be greater than 0 and at most 1")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+
+    needle_width, needle_height = needle_size
+    x, y, width, height = region or (0, 0, 0, 0)
+    return (
+        f"DISPLAY={display} python3 {locate_path} {quote_string(needle_path)} "
+        f"{needle_width} {needle_height} {confidence} {limit} {int(grayscale)} "
+        f"{x} {y} {width} {height} -- "
+        f"ffmpeg -loglevel error {_capture_flags(display, region, include_pointer)} "
+        "-frames:v 1 -f rawvideo -pix_fmt rgb24 -"
+    )
+
+
+def ocr_command(
+    display: str,
+    ocr_path: str,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    scale: int = 2,
+    language: str = "eng",
+    include_pointer: bool = False,
+) -> str:
+    """
+    Build a shell command that captures the display, or a region of it, and recognizes its text.
+
+    :param ocr_path: Path of the `ocr.py` program in the sandbox.
+    :raises ValueError: If the options are invalid
+    """
+    if scale not in (1, 2, 3, 4):
+        raise ValueError("scale must be 1, 2, 3 or 4")
+
+    x, y, width, height = region or (0, 0, 0, 0)
+    return (
+        f"DISPLAY={display} python3 {ocr_path} {scale} {quote_string(language)} "
+        f"{x} {y} {width} {height} -- "
+        f"ffmpeg -loglevel error {_capture_flags(display, region, include_pointer)} "
+        "-frames:v 1 -f rawvideo -pix_fmt rgb24 -"
+    )
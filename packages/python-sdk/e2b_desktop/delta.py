@@ -0,0 +1,137 @@
+import base64
+import io
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from PIL import Image
+
+
+@dataclass
+class ScreenshotTile:
+    """
+    A changed rectangle of the screen, encoded as PNG.
+    """
+
+    x: int
+    y: int
+    width: int
+    height: int
+    data: bytes
+    """PNG encoded pixels of the rectangle."""
+
+
+@dataclass
+class ScreenshotDelta:
+    """
+    Changes of the screen since the frame the client already has.
+    """
+
+    hash: str
+    """Hash of the captured frame. Pass it as `since` to the next `screenshot_delta()` call."""
+    width: int
+    height: int
+    not_modified: bool = False
+    """`True` if the screen didn't change since the given frame, `tiles` is empty."""
+    keyframe: bool = False
+    """`True` if `tiles` contains the whole frame, e.g. on the first call of a session."""
+    tiles: List[ScreenshotTile] = field(default_factory=list)
+    transferred_bytes: int = 0
+    """Size of the response as transferred from the sandbox."""
+
+
+def parse_delta(output: str) -> ScreenshotDelta:
+    """
+    Parse the output of the `delta_capture.py` sandbox program.
+    """
+    payload = json.loads(output)
+    return ScreenshotDelta(
+        hash=payload["hash"],
+        width=payload["width"],
+        height=payload["height"],
+        not_modified=payload["not_modified"],
+        keyframe=payload["keyframe"],
+        tiles=[
+            ScreenshotTile(
+                x=tile["x"],
+                y=tile["y"],
+                width=tile["w"],
+                height=tile["h"],
+                data=base64.b64decode(tile["data"]),
+            )
+            for tile in payload["tiles"]
+        ],
+        transferred_bytes=len(output),
+    )
+
+
+def validate_session(session: str) -> None:
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", session):
+        raise ValueError(
+            "Session must be 1-64 characters long and contain only letters, digits, '_' or '-'"
+        )
+
+
+class FrameAssembler:
+    """
+    Reassembles full frames from the deltas returned by `screenshot_delta()`.
+
+    ```python
+    frames = FrameAssembler()
+
+    delta = desktop.screenshot_delta(since=frames.hash)
+    image = frames.apply(delta)  # PIL image of the whole screen
+    ```
+    """
+
+    def __init__(self) -> None:
+        self._frame: Optional[Image.Image] = None
+        self._hash: Optional[str] = None
+
+    @property
+    def hash(self) -> Optional[str]:
+        """
+        Hash of the current frame, `None` before the first delta is applied.
+        """
+        return self._hash
+
+    @property
+    def frame(self) -> Optional[Image.Image]:
+        """
+        The current frame, `None` before the first delta is applied.
+        """
+        return self._frame
+
+    def apply(self, delta: ScreenshotDelta) -> Image.Image:
+        """
+        Apply the delta to the current frame.
+
+        :return: The updated frame.
+        :raises ValueError: If the delta doesn't apply to the current frame
+        """
+        if delta.not_modified:
+            if self._frame is None or delta.hash != self._hash:
+                raise ValueError("Delta refers to a frame the assembler doesn't have")
+            return self._frame
+
+        if delta.keyframe or self._frame is None:
+            if not delta.keyframe:
+                raise ValueError("The first applied delta must be a keyframe")
+            self._frame = Image.new("RGB", (delta.width, delta.height))
+
+        for tile in delta.tiles:
+            self._frame.paste(Image.open(io.BytesIO(tile.data)), (tile.x, tile.y))
+
+        self._hash = delta.hash
+        return self._frame
+
+    def to_bytes(self, format: str = "PNG") -> bytes:
+        """
+        Encode the current frame, e.g. to pass it on to a vision model.
+        """
+        if self._frame is None:
+            raise ValueError("No frame has been applied yet")
+        output = io.BytesIO()
+        self._frame.save(output, format=format)
+        return output.getvalue()
@@ -0,0 +1,68 @@
+import re
+from typing import Any, Iterable, Optional
+
+# Ports of the services of display :0, the services of display :N listen on the port + N
+VNC_PORT = 5900
+STREAM_PORT = 6080
+INPUT_SERVER_PORT = 6100
+VIDEO_STREAM_PORT = 6200
+
+_PORTS = sorted([VNC_PORT, STREAM_PORT, INPUT_SERVER_PORT, VIDEO_STREAM_PORT])
+# From this display number on, the ports of one service run into the next one's
+MAX_DISPLAYS = min(port - previous for previous, port in zip(_PORTS, _PORTS[1:]))
+
+
+def display_number(display: str) -> int:
+    return int(display.lstrip(":").split(".")[0])
+
+
+def validate_display(display: str) -> None:
+    """
+    :raises ValueError: If the display isn't a display name or its ports overlap with another display's
+    """
+    if not re.fullmatch(r":\d+", display):
+        raise ValueError(f"Invalid display {display!r}, e.g. ':1'")
+    if display_number(display) >= MAX_DISPLAYS:
+        raise ValueError(
+            f"Display {display} is out of range, use :0 to :{MAX_DISPLAYS - 1} "
+            "so the ports of the displays' services don't overlap"
+        )
+
+
+def next_display(displays: Iterable[str]) -> str:
+    """
+    The display after the highest one in use.
+    """
+    return f":{max(display_number(display) for display in displays) + 1}"
+
+
+def stop_display_command(display: str, session_pid: Optional[int]) -> str:
+    """
+    Build a command that stops the X server of the display and its desktop session.
+
+    Both were started in their own process groups by the `desktop_launcher.py` sandbox program.
+    """
+    lock = f"/tmp/.X{display_number(display)}-lock"
+    session = f"kill -- -{session_pid} 2>/dev/null; " if session_pid else ""
+    # Terminate the X server gracefully, so it removes its lock file
+    return f"{session}[ -f {lock} ] && kill $(cat {lock}) 2>/dev/null; true"
+
+
+class _DisplayCommands:
+    """
+    The sandbox's `commands` with `DISPLAY` set to one of its displays.
+
+    Works with both the sync and the async commands, the result of `run` is passed through.
+    """
+
+    def __init__(self, commands: Any, display: str) -> None:
+        self._commands = commands
+        self._display = display
+
+    def run(self, cmd: str, *args: Any, envs: Optional[dict] = None, **kwargs: Any):
+        return self._commands.run(
+            cmd, *args, envs={**(envs or {}), "DISPLAY": self._display}, **kwargs
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._commands, name)
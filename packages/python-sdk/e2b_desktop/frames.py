@@ -0,0 +1,223 @@
+import asyncio
+import base64
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+from e2b import AsyncCommandHandle, CommandHandle
+
+
+@dataclass
+class Frame:
+    """
+    A single captured frame of the screen.
+    """
+
+    data: bytes
+    """Encoded image."""
+    index: int
+    """Sequence number of the frame. Gaps mean frames were dropped because the consumer was too slow."""
+    timestamp: float
+    """Unix time the frame was encoded in the sandbox."""
+
+
+class _FrameParser:
+    """
+    Parse the line-based output of the `frame_stream.py` sandbox program.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+
+    def feed(self, chunk: str) -> List[Frame]:
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+
+        frames = []
+        for line in lines:
+            if not line:
+                continue
+            index, timestamp, data = line.split(" ", 2)
+            frames.append(
+                Frame(
+                    data=base64.b64decode(data),
+                    index=int(index),
+                    timestamp=float(timestamp),
+                )
+            )
+        return frames
+
+
+class _FrameBuffer:
+    """
+    Bounded buffer of frames that drops the oldest frame when it's full.
+    """
+
+    def __init__(self, buffer_size: int) -> None:
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self._frames: Deque[Frame] = deque(maxlen=buffer_size)
+        self._parser = _FrameParser()
+        self._dropped = 0
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of frames dropped because the consumer didn't keep up.
+        """
+        return self._dropped
+
+    def _push(self, chunk: str) -> bool:
+        frames = self._parser.feed(chunk)
+        for frame in frames:
+            if len(self._frames) == self._frames.maxlen:
+                self._dropped += 1
+            self._frames.append(frame)
+        return bool(frames)
+
+
+class FrameStream(_FrameBuffer):
+    """
+    Iterator over frames captured continuously by a single process in the sandbox.
+
+    Frames are read in a background thread into a bounded buffer. If the consumer
+    is slower than the capture rate, the oldest frames are dropped, so memory use
+    stays constant.
+
+    ```python
+    with desktop.frames(fps=5) as frames:
+        for frame in frames:
+            process(frame.data)
+    ```
+    """
+
+    def __init__(self, handle: CommandHandle, buffer_size: int = 2) -> None:
+        super().__init__(buffer_size)
+        self._handle = handle
+        self._condition = threading.Condition()
+        self._done = False
+        self._closed = False
+        self._error: Optional[Exception] = None
+
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self) -> None:
+        try:
+            for stdout, _, _ in self._handle:
+                if stdout:
+                    with self._condition:
+                        if self._push(stdout):
+                            self._condition.notify_all()
+            self._handle.wait()
+        except Exception as e:
+            if not self._closed:
+                self._error = e
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    def __iter__(self) -> "FrameStream":
+        return self
+
+    def __next__(self) -> Frame:
+        with self._condition:
+            while not self._frames and not self._done:
+                self._condition.wait()
+            if self._frames:
+                return self._frames.popleft()
+        if self._error:
+            raise self._error
+        raise StopIteration
+
+    def close(self) -> None:
+        """
+        Stop the capture process in the sandbox.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._handle.kill()
+        self._thread.join()
+
+    def __enter__(self) -> "FrameStream":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class AsyncFrameStream(_FrameBuffer):
+    """
+    Async iterator over frames captured continuously by a single process in the sandbox.
+
+    If the consumer is slower than the capture rate, the oldest frames are dropped,
+    so memory use stays constant.
+
+    ```python
+    async with await desktop.frames(fps=5) as frames:
+        async for frame in frames:
+            process(frame.data)
+    ```
+    """
+
+    def __init__(self, buffer_size: int = 2) -> None:
+        super().__init__(buffer_size)
+        self._handle: Optional[AsyncCommandHandle] = None
+        self._waiter: Optional[asyncio.Task] = None
+        self._available = asyncio.Event()
+        self._done = False
+        self._closed = False
+        self._error: Optional[Exception] = None
+
+    def _on_stdout(self, chunk: str) -> None:
+        if self._push(chunk):
+            self._available.set()
+
+    def _attach(self, handle: AsyncCommandHandle) -> None:
+        self._handle = handle
+        self._waiter = asyncio.create_task(self._wait())
+
+    async def _wait(self) -> None:
+        try:
+            assert self._handle is not None
+            await self._handle.wait()
+        except Exception as e:
+            if not self._closed:
+                self._error = e
+        finally:
+            self._done = True
+            self._available.set()
+
+    def __aiter__(self) -> "AsyncFrameStream":
+        return self
+
+    async def __anext__(self) -> Frame:
+        while not self._frames and not self._done:
+            self._available.clear()
+            await self._available.wait()
+        if self._frames:
+            return self._frames.popleft()
+        if self._error:
+            raise self._error
+        raise StopAsyncIteration
+
+    async def close(self) -> None:
+        """
+        Stop the capture process in the sandbox.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._handle:
+            await self._handle.kill()
+        if self._waiter:
+            await self._waiter
+
+    async def __aenter__(self) -> "AsyncFrameStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
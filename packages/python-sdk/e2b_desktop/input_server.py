@@ -0,0 +1,200 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import httpx
+from e2b import AsyncCommandHandle, CommandHandle, TimeoutException
+
+from .readiness import port_condition
+
+if TYPE_CHECKING:
+    from .async_main import AsyncSandbox
+    from .main import Sandbox
+
+
+class _InputServer:
+    """
+    Client for the persistent input server running inside the sandbox.
+
+    The server keeps one X connection open and injects input with XTest.
+    Operations are sent over a single keep-alive HTTP connection.
+    """
+
+    def __init__(self, desktop: "Sandbox", port: int = 6100) -> None:
+        self.__handle: Optional[CommandHandle] = None
+        self.__client: Optional[httpx.Client] = None
+
+        self._port = port
+        self._token = _generate_token()
+
+        self.__desktop = desktop
+
+    @property
+    def running(self) -> bool:
+        return self.__client is not None
+
+    def start(self) -> None:
+        if self.running:
+            raise RuntimeError("Input server is already running")
+
+        path = self.__desktop._upload_script("input_server.py")
+        self.__handle = self.__desktop.commands.run(
+            f"python3 {path} {self._port}",
+            envs={"E2B_INPUT_TOKEN": self._token},
+            background=True,
+            timeout=0,
+        )
+
+        ready = self.__desktop._wait_until_ready(
+            port_condition(self._port), pid=self.__handle.pid
+        )
+        if not ready.ready:
+            self.stop()
+            raise TimeoutException(
+                f"Could not start input server: {ready.error or 'timed out'}"
+            )
+
+        headers = {"X-Access-Token": self._token}
+        if self.__desktop.traffic_access_token:
+            headers["e2b-traffic-access-token"] = self.__desktop.traffic_access_token
+
+        self.__client = httpx.Client(
+            base_url=self.__desktop._service_url(self._port),
+            headers=headers,
+        )
+
+    def send(self, *ops: List[Any], timeout: Optional[float] = 60) -> List[Any]:
+        """
+        Execute the operations in order and return one result per operation.
+
+        :param ops: Operations to execute, e.g. `["move", 100, 200]`.
+        :param timeout: Timeout for the request in **seconds**.
+        """
+        payload = self.run(list(ops), timeout=timeout)
+        if "error" in payload:
+            raise RuntimeError(f"Input server error: {payload['error']}")
+        return payload["results"]
+
+    def run(
+        self, ops: List[List[Any]], timeout: Optional[float] = 60
+    ) -> Dict[str, Any]:
+        """
+        Execute the operations in order and return the raw response with results and per-operation timings.
+        """
+        if self.__client is None:
+            raise RuntimeError("Input server is not running")
+
+        response = self.__client.post("/", json=ops, timeout=timeout)
+        return _parse_response(response)
+
+    def stop(self) -> None:
+        if self.__client:
+            self.__client.close()
+            self.__client = None
+
+        if self.__handle:
+            self.__handle.kill()
+            self.__handle = None
+
+
+class _AsyncInputServer:
+    """
+    Async client for the persistent input server running inside the sandbox.
+    """
+
+    def __init__(self, desktop: "AsyncSandbox", port: int = 6100) -> None:
+        self.__handle: Optional[AsyncCommandHandle] = None
+        self.__client: Optional[httpx.AsyncClient] = None
+
+        self._port = port
+        self._token = _generate_token()
+
+        self.__desktop = desktop
+
+    @property
+    def running(self) -> bool:
+        return self.__client is not None
+
+    async def start(self) -> None:
+        if self.running:
+            raise RuntimeError("Input server is already running")
+
+        path = await self.__desktop._upload_script("input_server.py")
+        self.__handle = await self.__desktop.commands.run(
+            f"python3 {path} {self._port}",
+            envs={"E2B_INPUT_TOKEN": self._token},
+            background=True,
+            timeout=0,
+        )
+
+        ready = await self.__desktop._wait_until_ready(
+            port_condition(self._port), pid=self.__handle.pid
+        )
+        if not ready.ready:
+            await self.stop()
+            raise TimeoutException(
+                f"Could not start input server: {ready.error or 'timed out'}"
+            )
+
+        headers = {"X-Access-Token": self._token}
+        if self.__desktop.traffic_access_token:
+            headers["e2b-traffic-access-token"] = self.__desktop.traffic_access_token
+
+        self.__client = httpx.AsyncClient(
+            base_url=self.__desktop._service_url(self._port),
+            headers=headers,
+        )
+
+    async def send(self, *ops: List[Any], timeout: Optional[float] = 60) -> List[Any]:
+        """
+        Execute the operations in order and return one result per operation.
+
+        :param ops: Operations to execute, e.g. `["move", 100, 200]`.
+        :param timeout: Timeout for the request in **seconds**.
+        """
+        payload = await self.run(list(ops), timeout=timeout)
+        if "error" in payload:
+            raise RuntimeError(f"Input server error: {payload['error']}")
+        return payload["results"]
+
+    async def run(
+        self, ops: List[List[Any]], timeout: Optional[float] = 60
+    ) -> Dict[str, Any]:
+        """
+        Execute the operations in order and return the raw response with results and per-operation timings.
+        """
+        if self.__client is None:
+            raise RuntimeError("Input server is not running")
+
+        response = await self.__client.post("/", json=ops, timeout=timeout)
+        return _parse_response(response)
+
+    async def stop(self) -> None:
+        if self.__client:
+            await self.__client.aclose()
+            self.__client = None
+
+        if self.__handle:
+            await self.__handle.kill()
+            self.__handle = None
+
+
+def _parse_response(response: httpx.Response) -> Dict[str, Any]:
+    """
+    The JSON body of a response of the input server.
+
+    :raises RuntimeError: If the response doesn't come from the input server, e.g. the proxy's 502 when the server died
+    """
+    error = RuntimeError(f"Input server error: {response.status_code} {response.text}")
+    # The server answers with JSON for these, errors included
+    if response.status_code not in (200, 400, 401):
+        raise error
+    try:
+        return response.json()
+    except ValueError:
+        # E.g. a 401 of the proxy
+        raise error from None
+
+
+def _generate_token(length: int = 32) -> str:
+    import secrets
+
+    return secrets.token_urlsafe(length)
@@ -0,0 +1,399 @@
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CallHook = Callable[["CallRecord"], None]
+
+
+@dataclass
+class CallRecord:
+    """
+    Measurements of a single public method call on a sandbox.
+    """
+
+    method: str
+    """Name of the called method, e.g. `screenshot` or `stream.start`."""
+    start_time: float = 0.0
+    """Unix time the call started."""
+    wall_ms: float = 0.0
+    """Wall time of the whole call as seen by the client, in milliseconds."""
+    remote_ms: float = 0.0
+    """Time spent waiting for requests to the sandbox, in milliseconds."""
+    requests: int = 0
+    """Number of requests to the sandbox (commands, file transfers and input server requests)."""
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    error: Optional[str] = None
+    """Name of the exception the call raised, if any."""
+
+
+_current_call: ContextVar[Optional[CallRecord]] = ContextVar(
+    "e2b_desktop_call", default=None
+)
+
+
+def _emit(hook: CallHook, record: CallRecord) -> None:
+    try:
+        hook(record)
+    except Exception:
+        # A failing hook must never break the instrumented call
+        pass
+
+
+def _wrap_call(name: str, method: Callable, hook: CallHook) -> Callable:
+    """
+    Wrap a public method so it reports a `CallRecord`. Calls nested in another instrumented call are attributed to the outer one.
+    """
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            if _current_call.get() is not None:
+                return await method(*args, **kwargs)
+
+            record = CallRecord(method=name, start_time=time.time())
+            token = _current_call.set(record)
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except BaseException as e:
+                record.error = type(e).__name__
+                raise
+            finally:
+                record.wall_ms = (time.perf_counter() - start) * 1000
+                _current_call.reset(token)
+                _emit(hook, record)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _current_call.get() is not None:
+            return method(*args, **kwargs)
+
+        record = CallRecord(method=name, start_time=time.time())
+        token = _current_call.set(record)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except BaseException as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            record.wall_ms = (time.perf_counter() - start) * 1000
+            _current_call.reset(token)
+            _emit(hook, record)
+
+    return wrapper
+
+
+def _wrap_request(
+    method: Callable, measure: Callable[[tuple, dict, Any], Tuple[int, int]]
+) -> Callable:
+    """
+    Wrap a method that makes a request to the sandbox, so it's counted in the current call.
+
+    :param measure: Returns the bytes sent and received from the arguments and the result.
+    """
+
+    def add(record: CallRecord, start: float, args, kwargs, result) -> None:
+        record.requests += 1
+        record.remote_ms += (time.perf_counter() - start) * 1000
+        try:
+            sent, received = measure(args, kwargs, result)
+        except Exception:
+            sent, received = 0, 0
+        record.bytes_sent += sent
+        record.bytes_received += received
+
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            record = _current_call.get()
+            if record is None:
+                return await method(*args, **kwargs)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = await method(*args, **kwargs)
+                return result
+            finally:
+                add(record, start, args, kwargs, result)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        record = _current_call.get()
+        if record is None:
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = method(*args, **kwargs)
+            return result
+        finally:
+            add(record, start, args, kwargs, result)
+
+    return wrapper
+
+
+def _size(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    return 0
+
+
+def _measure_command(args, kwargs, result) -> Tuple[int, int]:
+    cmd = args[0] if args else kwargs.get("cmd", "")
+    received = _size(getattr(result, "stdout", None)) + _size(
+        getattr(result, "stderr", None)
+    )
+    return _size(cmd), received
+
+
+def _measure_read(args, kwargs, result) -> Tuple[int, int]:
+    return 0, _size(result)
+
+
+def _measure_write(args, kwargs, result) -> Tuple[int, int]:
+    data = args[1] if len(args) > 1 else kwargs.get("data")
+    return _size(data), 0
+
+
+def _measure_input(args, kwargs, result) -> Tuple[int, int]:
+    ops = args[0] if args else kwargs.get("ops")
+    return len(json.dumps(ops)), len(json.dumps(result)) if result else 0
+
+
+# Components of the sandbox whose public methods are reported with a prefix
+_COMPONENTS = ("stream", "video_stream", "recording", "state")
+
+# Private methods that are reported when they're called directly
+_PRIVATE_CALLS = {"_run_input_ops": "batch.run"}
+
+_REQUESTS: Dict[str, Dict[str, Callable]] = {
+    "commands": {"run": _measure_command},
+    "files": {"read": _measure_read, "write": _measure_write},
+    "_input_server": {"run": _measure_input},
+}
+
+
+def _public_methods(target: Any, base: type) -> List[str]:
+    """
+    Names of the public methods the desktop SDK defines on the target's class.
+    """
+    names = []
+    for cls in type(target).__mro__:
+        if cls is base or cls is object:
+            break
+        for name, value in vars(cls).items():
+            if name.startswith("_") or name == "instrument" or name in names:
+                continue
+            if inspect.isfunction(value):
+                names.append(name)
+    return names
+
+
+def set_instrumentation(sandbox: Any, base: type, hook: Optional[CallHook]) -> None:
+    """
+    Wrap or unwrap the public methods of the sandbox and its stream, and the requests they make.
+
+    The wrappers are installed on the instances only while a hook is set, so a sandbox
+    without instrumentation runs the original methods without any overhead.
+
+    :param base: The e2b sandbox class the desktop sandbox extends. Its methods are not instrumented.
+    """
+    calls = {name: name for name in _public_methods(sandbox, base)}
+    targets: List[Tuple[Any, Dict[str, str], Dict[str, Callable]]] = [
+        (sandbox, {**calls, **_PRIVATE_CALLS}, {})
+    ]
+    for attribute in _COMPONENTS:
+        component = getattr(sandbox, attribute)
+        targets.append(
+            (
+                component,
+                {
+                    name: f"{attribute}.{name}"
+                    for name in _public_methods(component, object)
+                },
+                {},
+            )
+        )
+    for attribute, methods in _REQUESTS.items():
+        target = getattr(sandbox, attribute, None)
+        if target is not None:
+            targets.append((target, {}, methods))
+
+    for target, target_calls, requests in targets:
+        for name in [*target_calls, *requests]:
+            # Remove a previous wrapper, so the class' method is used again
+            target.__dict__.pop(name, None)
+            if hook is None:
+                continue
+            method = getattr(target, name)
+            if name in target_calls:
+                wrapped = _wrap_call(target_calls[name], method, hook)
+            else:
+                wrapped = _wrap_request(method, requests[name])
+            setattr(target, name, wrapped)
+
+
+BUCKETS_MS: Tuple[float, ...] = (
+    1,
+    2,
+    5,
+    10,
+    20,
+    50,
+    100,
+    200,
+    500,
+    1000,
+    2000,
+    5000,
+    10000,
+    float("inf"),
+)
+"""Upper bounds of the latency histogram buckets, in milliseconds."""
+
+
+@dataclass
+class MethodStats:
+    """
+    Aggregated measurements of the calls of one method.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    wall_ms: float = 0.0
+    """Total wall time of all calls, in milliseconds."""
+    remote_ms: float = 0.0
+    """Total time spent waiting for the sandbox, in milliseconds."""
+    requests: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    wall_histogram: List[int] = field(default_factory=lambda: [0] * len(BUCKETS_MS))
+    """Number of calls per wall time bucket, see `BUCKETS_MS`."""
+    remote_histogram: List[int] = field(default_factory=lambda: [0] * len(BUCKETS_MS))
+    """Number of calls per remote time bucket, see `BUCKETS_MS`."""
+
+    @property
+    def mean_wall_ms(self) -> float:
+        return self.wall_ms / self.calls if self.calls else 0.0
+
+    @property
+    def requests_per_call(self) -> float:
+        return self.requests / self.calls if self.calls else 0.0
+
+    def percentile_wall_ms(self, percentile: float) -> float:
+        """
+        Upper bound of the bucket that contains the given percentile of the wall times.
+        """
+        target = self.calls * percentile / 100
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.wall_histogram):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0.0
+
+
+class LatencyRecorder:
+    """
+    Hook that aggregates the calls per method into latency histograms.
+
+    ```python
+    recorder = LatencyRecorder()
+    desktop.instrument(recorder)
+
+    desktop.screenshot()
+    stats = recorder.stats()["screenshot"]
+    print(stats.mean_wall_ms, stats.requests_per_call, stats.percentile_wall_ms(95))
+    ```
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: Dict[str, MethodStats] = {}
+
+    def __call__(self, record: CallRecord) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(record.method, MethodStats())
+            stats.calls += 1
+            stats.errors += record.error is not None
+            stats.wall_ms += record.wall_ms
+            stats.remote_ms += record.remote_ms
+            stats.requests += record.requests
+            stats.bytes_sent += record.bytes_sent
+            stats.bytes_received += record.bytes_received
+            stats.wall_histogram[bisect.bisect_left(BUCKETS_MS, record.wall_ms)] += 1
+            stats.remote_histogram[
+                bisect.bisect_left(BUCKETS_MS, record.remote_ms)
+            ] += 1
+
+    def stats(self) -> Dict[str, MethodStats]:
+        """
+        A snapshot of the aggregated measurements per method.
+        """
+        with self._lock:
+            return {
+                method: replace(
+                    stats,
+                    wall_histogram=list(stats.wall_histogram),
+                    remote_histogram=list(stats.remote_histogram),
+                )
+                for method, stats in self._stats.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+class OpenTelemetryHook:
+    """
+    Hook that reports every call as an OpenTelemetry span.
+
+    Requires the `opentelemetry-api` package. Spans are created with the tracer
+    of the given tracer provider, or the global one.
+    """
+
+    def __init__(self, tracer: Any = None) -> None:
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError as e:
+                raise ImportError(
+                    "OpenTelemetryHook requires the 'opentelemetry-api' package"
+                ) from e
+            tracer = trace.get_tracer("e2b_desktop")
+        self._tracer = tracer
+
+    def __call__(self, record: CallRecord) -> None:
+        start_ns = int(record.start_time * 1e9)
+        span = self._tracer.start_span(
+            f"e2b_desktop.{record.method}",
+            start_time=start_ns,
+            attributes={
+                "e2b_desktop.method": record.method,
+                "e2b_desktop.remote_ms": record.remote_ms,
+                "e2b_desktop.requests": record.requests,
+                "e2b_desktop.bytes_sent": record.bytes_sent,
+                "e2b_desktop.bytes_received": record.bytes_received,
+            },
+        )
+        if record.error:
+            span.set_attribute("error.type", record.error)
+        span.end(end_time=start_ns + int(record.wall_ms * 1e6))
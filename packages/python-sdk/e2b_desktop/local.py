@@ -0,0 +1,693 @@
+import asyncio
+import codecs
+import inspect
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from e2b import CommandExitException, CommandResult, TimeoutException
+from e2b.connection_config import ConnectionConfig
+from packaging.version import Version
+from typing_extensions import Self
+
+from .async_main import AsyncSandbox
+from .boot import Session, WaitFor, session_command_for, validate_wait_for
+from .streaming import StreamOption, stream_options
+from .displays import display_number
+from .main import Sandbox
+
+_LOCAL_HOST = "localhost"
+
+# Displays handed out but maybe not yet taken by their X server
+_claimed_displays: set = set()
+_claimed_lock = threading.Lock()
+
+
+def _free_display(start: int = 99) -> str:
+    """
+    Claim the first display from `start` on that no X server uses.
+    """
+    number = start
+    with _claimed_lock:
+        while (
+            number in _claimed_displays
+            or _x_server_pid(f":{number}") is not None
+            or os.path.exists(f"/tmp/.X11-unix/X{number}")
+        ):
+            number += 1
+        _claimed_displays.add(number)
+    return f":{number}"
+
+
+def _release_display(display: str) -> None:
+    with _claimed_lock:
+        _claimed_displays.discard(display_number(display))
+
+
+def _kill_group(pid: int, sig: int = signal.SIGKILL) -> bool:
+    try:
+        os.killpg(pid, sig)
+        return True
+    except (ProcessLookupError, PermissionError):
+        return False
+
+
+def _x_server_pid(display: str) -> Optional[int]:
+    """
+    Pid of the running X server of the display, from the lock file it creates.
+    """
+    try:
+        with open(f"/tmp/.X{display_number(display)}-lock") as f:
+            pid = int(f.read().strip())
+        # Lock files of killed servers are left behind
+        with open(f"/proc/{pid}/stat") as f:
+            state = f.read().rsplit(")", 1)[1].split()[0]
+        return None if state == "Z" else pid
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _command_env(base: Dict[str, str], envs: Optional[Dict[str, str]]) -> dict:
+    return {**os.environ, **base, **(envs or {})}
+
+
+def _check_result(result: CommandResult) -> CommandResult:
+    if result.exit_code != 0:
+        raise CommandExitException(
+            stdout=result.stdout,
+            stderr=result.stderr,
+            exit_code=result.exit_code,
+            error=result.error,
+        )
+    return result
+
+
+def _to_bytes(data: Union[str, bytes, bytearray, IO]) -> bytes:
+    if isinstance(data, str):
+        return data.encode()
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    content = data.read()
+    return content.encode() if isinstance(content, str) else content
+
+
+def _read_file(path: str, format: str) -> Any:
+    with open(os.path.expanduser(path), "rb") as f:
+        content = f.read()
+    if format == "bytes":
+        return bytearray(content)
+    if format == "stream":
+        return iter([content])
+    return content.decode()
+
+
+def _write_file(path: str, data: Union[str, bytes, bytearray, IO]) -> None:
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(_to_bytes(data))
+
+
+def _remove_path(path: str) -> None:
+    path = os.path.expanduser(path)
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+class LocalCommandHandle:
+    """
+    Handle of a command running on the local machine, with the interface of `CommandHandle`.
+    """
+
+    def __init__(self, process: subprocess.Popen) -> None:
+        self._process = process
+        self._events: "queue.Queue[Optional[Tuple[int, str]]]" = queue.Queue()
+        self._stdout: List[str] = []
+        self._stderr: List[str] = []
+        self._open_streams = 2
+        self._connected = True
+        self._result: Optional[CommandResult] = None
+
+        for index, stream in enumerate((process.stdout, process.stderr)):
+            threading.Thread(
+                target=self._read, args=(index, stream), daemon=True
+            ).start()
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def _read(self, index: int, stream: IO[bytes]) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            chunk = os.read(stream.fileno(), 65536)
+            text = decoder.decode(chunk, final=not chunk)
+            # The output is drained after disconnecting too, so the process never blocks on a full pipe
+            if text and self._connected:
+                self._events.put((index, text))
+            if not chunk:
+                break
+        stream.close()
+        self._events.put(None)
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], Optional[str], None]]:
+        while self._open_streams:
+            event = self._events.get()
+            if event is None:
+                self._open_streams -= 1
+                continue
+            index, text = event
+            (self._stdout if index == 0 else self._stderr).append(text)
+            yield (text, None, None) if index == 0 else (None, text, None)
+
+    def disconnect(self) -> None:
+        """
+        Stop receiving the command's output. The command keeps running.
+        """
+        self._connected = False
+
+    def wait(
+        self,
+        on_stdout: Optional[Callable[[str], None]] = None,
+        on_stderr: Optional[Callable[[str], None]] = None,
+    ) -> CommandResult:
+        """
+        Wait for the command to finish.
+
+        :raises CommandExitException: If the command exits with a non-zero exit code
+        """
+        if self._result is None:
+            for stdout, stderr, _ in self:
+                if stdout is not None and on_stdout:
+                    on_stdout(stdout)
+                if stderr is not None and on_stderr:
+                    on_stderr(stderr)
+            exit_code = self._process.wait()
+            self._result = CommandResult(
+                stdout="".join(self._stdout),
+                stderr="".join(self._stderr),
+                exit_code=exit_code,
+                error=None,
+            )
+        return _check_result(self._result)
+
+    def kill(self) -> bool:
+        return _kill_group(self.pid)
+
+
+class LocalCommands:
+    """
+    Runs commands on the local machine, with the interface of `Sandbox.commands`.
+
+    Every command runs in its own process group, so it can be killed with all its children.
+    The `user` option is ignored, commands run as the current user.
+    """
+
+    def __init__(self, envs: Optional[Dict[str, str]] = None) -> None:
+        self._envs = dict(envs or {})
+        self._processes: Dict[int, subprocess.Popen] = {}
+
+    def run(
+        self,
+        cmd: str,
+        background: bool = False,
+        envs: Optional[Dict[str, str]] = None,
+        user: Optional[str] = None,
+        cwd: Optional[str] = None,
+        on_stdout: Optional[Callable[[str], None]] = None,
+        on_stderr: Optional[Callable[[str], None]] = None,
+        stdin: Optional[bool] = None,
+        timeout: Optional[float] = 60,
+        request_timeout: Optional[float] = None,
+    ) -> Union[CommandResult, LocalCommandHandle]:
+        process = subprocess.Popen(
+            ["bash", "-c", cmd],
+            stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=os.path.expanduser(cwd) if cwd else None,
+            env=_command_env(self._envs, envs),
+            start_new_session=True,
+        )
+        self._processes[process.pid] = process
+        handle = LocalCommandHandle(process)
+        if background:
+            return handle
+
+        timed_out = threading.Event()
+
+        def on_timeout() -> None:
+            timed_out.set()
+            handle.kill()
+
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, on_timeout)
+            timer.start()
+        try:
+            result = handle.wait(on_stdout=on_stdout, on_stderr=on_stderr)
+        except CommandExitException:
+            if timed_out.is_set():
+                raise TimeoutException(f"Command timed out after {timeout} seconds")
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+            self._processes.pop(process.pid, None)
+        return result
+
+    def send_stdin(self, pid: int, data: str, request_timeout=None) -> None:
+        process = self._processes[pid]
+        if process.stdin is None:
+            raise RuntimeError(f"Process {pid} was started without stdin")
+        process.stdin.write(data.encode())
+        process.stdin.flush()
+
+    def kill(self, pid: int, request_timeout=None) -> bool:
+        return _kill_group(pid)
+
+    def _kill_all(self) -> None:
+        for pid, process in self._processes.items():
+            if process.poll() is None:
+                _kill_group(pid)
+        self._processes.clear()
+
+
+class LocalFilesystem:
+    """
+    Accesses files on the local machine, with the parts of the `Sandbox.files` interface the desktop uses.
+    """
+
+    def read(self, path: str, format: str = "text", **opts) -> Any:
+        return _read_file(path, format)
+
+    def write(self, path: str, data: Union[str, bytes, bytearray, IO], **opts) -> None:
+        _write_file(path, data)
+
+    def remove(self, path: str, **opts) -> None:
+        _remove_path(path)
+
+    def exists(self, path: str, **opts) -> bool:
+        return os.path.exists(os.path.expanduser(path))
+
+
+def _local_connection_config() -> ConnectionConfig:
+    return ConnectionConfig(api_key="e2b_local", domain=_LOCAL_HOST)
+
+
+def _local_display(display: Optional[str], envs: Optional[Dict[str, str]]) -> dict:
+    return {**(envs or {}), "DISPLAY": display or _free_display()}
+
+
+class LocalSandbox(Sandbox):
+    """
+    Desktop running on the local machine instead of in an E2B sandbox.
+
+    It has the same API as `Sandbox`, but boots Xvfb and the desktop session on this machine and
+    runs every action as a local process, so there is no network round trip. The machine needs the
+    programs the desktop template ships, e.g. `Xvfb`, `xdotool`, `ffmpeg`, `xprop` and a window manager.
+    """
+
+    @classmethod
+    def create(
+        cls,
+        resolution: Optional[Tuple[int, int]] = None,
+        dpi: Optional[int] = None,
+        display: Optional[str] = None,
+        envs: Optional[Dict[str, str]] = None,
+        input_server: bool = False,
+        wait_for: WaitFor = "x11",
+        session: Session = "xfce",
+        session_command: Optional[List[str]] = None,
+        stream: StreamOption = False,
+        **opts,
+    ) -> Self:
+        """
+        Start a new desktop on the local machine.
+
+        Options that only apply to E2B sandboxes, like `template` or `timeout`, are ignored.
+
+        :param resolution: Startup the desktop with custom screen resolution. Defaults to (1024, 768)
+        :param dpi: Startup the desktop with custom DPI. Defaults to 96
+        :param display: Startup the desktop with custom display. Defaults to the first free display from ":99" on
+        :param envs: Custom environment variables for the commands
+        :param input_server: Start a persistent input server. Defaults to `False`
+        :param wait_for: Return once the X server is ready ('x11'), once the desktop session manages the screen ('session'), or right after starting the boot ('none'). Defaults to 'x11'
+        :param session: Desktop session to start: the full xfce4 desktop ('xfce'), a bare window manager ('openbox'), or the X server alone ('none'). Defaults to 'xfce'
+        :param session_command: Custom command that starts the desktop session, it takes precedence over `session`
+        :param stream: Start the stream as part of the boot. `True` for the default settings, a profile name, or a dict of `stream.start` options. Needs x11vnc and noVNC in `/opt/noVNC`. Defaults to `False`
+
+        :return: A LocalSandbox instance for the new desktop
+        """
+        validate_wait_for(wait_for)
+        session_command = session_command_for(session, session_command)
+        stream_start = stream_options(stream)
+        envs = _local_display(display, envs)
+
+        start = time.perf_counter()
+        sbx = cls(
+            sandbox_id="local",
+            envd_version=Version("0.0.0"),
+            envd_access_token=None,
+            sandbox_domain=_LOCAL_HOST,
+            connection_config=_local_connection_config(),
+        )
+        sbx._commands = LocalCommands(envs)
+        sbx._filesystem = LocalFilesystem()
+        sandbox_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            sbx._init_desktop(
+                envs["DISPLAY"],
+                resolution,
+                dpi,
+                wait_for,
+                input_server,
+                start,
+                sandbox_ms,
+                session_command=session_command,
+                stream=stream_start,
+            )
+        except BaseException:
+            sbx.kill()
+            raise
+        return sbx
+
+    def get_host(self, port: int) -> str:
+        return f"{_LOCAL_HOST}:{port}"
+
+    def _service_url(self, port: int) -> str:
+        return f"http://{self.get_host(port)}"
+
+    def is_running(self, request_timeout: Optional[float] = None) -> bool:
+        return _x_server_pid(self._display) is not None
+
+    def _next_display(self) -> str:
+        return _free_display()
+
+    def _validate_display(self, display: str) -> None:
+        # Local displays are numbered from :99 on, only a few run on a machine at once
+        display_number(display)
+
+    def stop_display(self) -> None:
+        super().stop_display()
+        _release_display(self._display)
+
+    def kill(self, request_timeout: Optional[float] = None) -> bool:
+        """
+        Stop the desktop with its X server, session and every command it started,
+        together with the displays added to it.
+        """
+        if self._parent is not None:
+            return self._parent.kill(request_timeout)
+        for handle in list(self._displays.values()):
+            if handle is not self:
+                handle.stop_display()
+        if self._input_server:
+            self._input_server.stop()
+            self._input_server = None
+        if self.stream._novnc_pid:
+            # x11vnc and the noVNC proxy run in their own process groups
+            self.stream.stop()
+        self._commands._kill_all()
+        if self._session_pid is not None:
+            _kill_group(int(self._session_pid))
+        pid = _x_server_pid(self._display)
+        _release_display(self._display)
+        # Terminate the X server gracefully, so it removes its lock file
+        return pid is not None and _kill_group(pid, signal.SIGTERM)
+
+
+class AsyncLocalCommandHandle:
+    """
+    Handle of a command running on the local machine, with the interface of `AsyncCommandHandle`.
+    """
+
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        on_stdout: Optional[Callable[[str], Any]] = None,
+        on_stderr: Optional[Callable[[str], Any]] = None,
+    ) -> None:
+        self._process = process
+        self._stdout: List[str] = []
+        self._stderr: List[str] = []
+        self._connected = True
+        self._readers = [
+            asyncio.create_task(self._read(process.stdout, self._stdout, on_stdout)),
+            asyncio.create_task(self._read(process.stderr, self._stderr, on_stderr)),
+        ]
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    async def _read(
+        self,
+        stream: asyncio.StreamReader,
+        output: List[str],
+        callback: Optional[Callable[[str], Any]],
+    ) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            chunk = await stream.read(65536)
+            text = decoder.decode(chunk, final=not chunk)
+            if text and self._connected:
+                output.append(text)
+                if callback:
+                    result = callback(text)
+                    if inspect.isawaitable(result):
+                        await result
+            if not chunk:
+                break
+
+    async def disconnect(self) -> None:
+        """
+        Stop receiving the command's output. The command keeps running.
+        """
+        self._connected = False
+
+    async def wait(self) -> CommandResult:
+        """
+        Wait for the command to finish.
+
+        :raises CommandExitException: If the command exits with a non-zero exit code
+        """
+        await asyncio.gather(*self._readers)
+        exit_code = await self._process.wait()
+        return _check_result(
+            CommandResult(
+                stdout="".join(self._stdout),
+                stderr="".join(self._stderr),
+                exit_code=exit_code,
+                error=None,
+            )
+        )
+
+    async def kill(self) -> bool:
+        return _kill_group(self.pid)
+
+
+class AsyncLocalCommands:
+    """
+    Runs commands on the local machine, with the interface of `AsyncSandbox.commands`.
+    """
+
+    def __init__(self, envs: Optional[Dict[str, str]] = None) -> None:
+        self._envs = dict(envs or {})
+        self._processes: Dict[int, asyncio.subprocess.Process] = {}
+
+    async def run(
+        self,
+        cmd: str,
+        background: bool = False,
+        envs: Optional[Dict[str, str]] = None,
+        user: Optional[str] = None,
+        cwd: Optional[str] = None,
+        on_stdout: Optional[Callable[[str], Any]] = None,
+        on_stderr: Optional[Callable[[str], Any]] = None,
+        stdin: Optional[bool] = None,
+        timeout: Optional[float] = 60,
+        request_timeout: Optional[float] = None,
+    ) -> Union[CommandResult, AsyncLocalCommandHandle]:
+        process = await asyncio.create_subprocess_exec(
+            "bash",
+            "-c",
+            cmd,
+            stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=os.path.expanduser(cwd) if cwd else None,
+            env=_command_env(self._envs, envs),
+            start_new_session=True,
+        )
+        self._processes[process.pid] = process
+        handle = AsyncLocalCommandHandle(process, on_stdout, on_stderr)
+        if background:
+            return handle
+
+        try:
+            return await asyncio.wait_for(handle.wait(), timeout or None)
+        except asyncio.TimeoutError:
+            await handle.kill()
+            raise TimeoutException(f"Command timed out after {timeout} seconds")
+        finally:
+            self._processes.pop(process.pid, None)
+
+    async def send_stdin(self, pid: int, data: str, request_timeout=None) -> None:
+        process = self._processes[pid]
+        if process.stdin is None:
+            raise RuntimeError(f"Process {pid} was started without stdin")
+        process.stdin.write(data.encode())
+        await process.stdin.drain()
+
+    async def kill(self, pid: int, request_timeout=None) -> bool:
+        return _kill_group(pid)
+
+    def _kill_all(self) -> None:
+        for pid, process in self._processes.items():
+            if process.returncode is None:
+                _kill_group(pid)
+        self._processes.clear()
+
+
+class AsyncLocalFilesystem:
+    """
+    Accesses files on the local machine, with the parts of the `AsyncSandbox.files` interface the desktop uses.
+    """
+
+    async def read(self, path: str, format: str = "text", **opts) -> Any:
+        return _read_file(path, format)
+
+    async def write(
+        self, path: str, data: Union[str, bytes, bytearray, IO], **opts
+    ) -> None:
+        _write_file(path, data)
+
+    async def remove(self, path: str, **opts) -> None:
+        _remove_path(path)
+
+    async def exists(self, path: str, **opts) -> bool:
+        return os.path.exists(os.path.expanduser(path))
+
+
+class AsyncLocalSandbox(AsyncSandbox):
+    """
+    Desktop running on the local machine instead of in an E2B sandbox, with the API of `AsyncSandbox`.
+    """
+
+    @classmethod
+    async def create(
+        cls,
+        resolution: Optional[Tuple[int, int]] = None,
+        dpi: Optional[int] = None,
+        display: Optional[str] = None,
+        envs: Optional[Dict[str, str]] = None,
+        input_server: bool = False,
+        wait_for: WaitFor = "x11",
+        session: Session = "xfce",
+        session_command: Optional[List[str]] = None,
+        stream: StreamOption = False,
+        **opts,
+    ) -> Self:
+        """
+        Start a new desktop on the local machine.
+
+        Options that only apply to E2B sandboxes, like `template` or `timeout`, are ignored.
+
+        :param resolution: Startup the desktop with custom screen resolution. Defaults to (1024, 768)
+        :param dpi: Startup the desktop with custom DPI. Defaults to 96
+        :param display: Startup the desktop with custom display. Defaults to the first free display from ":99" on
+        :param envs: Custom environment variables for the commands
+        :param input_server: Start a persistent input server. Defaults to `False`
+        :param wait_for: Return once the X server is ready ('x11'), once the desktop session manages the screen ('session'), or right after starting the boot ('none'). Defaults to 'x11'
+        :param session: Desktop session to start: the full xfce4 desktop ('xfce'), a bare window manager ('openbox'), or the X server alone ('none'). Defaults to 'xfce'
+        :param session_command: Custom command that starts the desktop session, it takes precedence over `session`
+        :param stream: Start the stream as part of the boot. `True` for the default settings, a profile name, or a dict of `stream.start` options. Needs x11vnc and noVNC in `/opt/noVNC`. Defaults to `False`
+
+        :return: An AsyncLocalSandbox instance for the new desktop
+        """
+        validate_wait_for(wait_for)
+        session_command = session_command_for(session, session_command)
+        stream_start = stream_options(stream)
+        envs = _local_display(display, envs)
+
+        start = time.perf_counter()
+        sbx = cls(
+            sandbox_id="local",
+            envd_version=Version("0.0.0"),
+            envd_access_token=None,
+            sandbox_domain=_LOCAL_HOST,
+            connection_config=_local_connection_config(),
+        )
+        sbx._commands = AsyncLocalCommands(envs)
+        sbx._filesystem = AsyncLocalFilesystem()
+        sandbox_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            await sbx._init_desktop(
+                envs["DISPLAY"],
+                resolution,
+                dpi,
+                wait_for,
+                input_server,
+                start,
+                sandbox_ms,
+                session_command=session_command,
+                stream=stream_start,
+            )
+        except BaseException:
+            await sbx.kill()
+            raise
+        return sbx
+
+    def get_host(self, port: int) -> str:
+        return f"{_LOCAL_HOST}:{port}"
+
+    def _service_url(self, port: int) -> str:
+        return f"http://{self.get_host(port)}"
+
+    async def is_running(self, request_timeout: Optional[float] = None) -> bool:
+        return _x_server_pid(self._display) is not None
+
+    def _next_display(self) -> str:
+        return _free_display()
+
+    def _validate_display(self, display: str) -> None:
+        # Local displays are numbered from :99 on, only a few run on a machine at once
+        display_number(display)
+
+    async def stop_display(self) -> None:
+        await super().stop_display()
+        _release_display(self._display)
+
+    async def kill(self, request_timeout: Optional[float] = None) -> bool:
+        """
+        Stop the desktop with its X server, session and every command it started,
+        together with the displays added to it.
+        """
+        if self._parent is not None:
+            return await self._parent.kill(request_timeout)
+        for handle in list(self._displays.values()):
+            if handle is not self:
+                await handle.stop_display()
+        if self._input_server:
+            await self._input_server.stop()
+            self._input_server = None
+        if self.stream._novnc_pid:
+            # x11vnc and the noVNC proxy run in their own process groups
+            await self.stream.stop()
+        self._commands._kill_all()
+        if self._session_pid is not None:
+            _kill_group(int(self._session_pid))
+        pid = _x_server_pid(self._display)
+        _release_display(self._display)
+        # Terminate the X server gracefully, so it removes its lock file
+        return pid is not None and _kill_group(pid, signal.SIGTERM)
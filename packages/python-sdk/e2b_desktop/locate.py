@@ -0,0 +1,57 @@
+import io
+import json
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import List, Tuple
+
+from PIL import Image
+
+from .scripts import REMOTE_SCRIPTS_DIR
+
+
+@dataclass
+class ScreenMatch:
+    """
+    Where a needle image was found on the screen.
+    """
+
+    x: int
+    y: int
+    width: int
+    height: int
+    score: float
+    """Normalized cross-correlation with the needle from -1 to 1, 1 is an exact match up to brightness and contrast."""
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        """Center of the match, e.g. to click on it."""
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+def needle_path(needle_png: bytes) -> str:
+    """
+    Path the needle image is uploaded to, by its hash so each image is uploaded only once.
+    """
+    return f"{REMOTE_SCRIPTS_DIR}/needle-{blake2b(needle_png, digest_size=16).hexdigest()}.rgb"
+
+
+def decode_needle(needle_png: bytes) -> Tuple[bytes, int, int]:
+    """
+    Decode a needle image to the raw RGB pixels the `locate.py` sandbox program reads.
+
+    :return: A tuple with the pixels, the width and the height of the image.
+    """
+    image = Image.open(io.BytesIO(needle_png)).convert("RGB")
+    return image.tobytes(), image.width, image.height
+
+
+def parse_matches(output: str) -> List[ScreenMatch]:
+    """
+    Parse the output of the `locate.py` sandbox program.
+
+    :raises RuntimeError: If the screen couldn't be captured
+    """
+    payload = json.loads(output)
+    if "error" in payload:
+        raise RuntimeError(f"Could not search the screen: {payload['error']}")
+    return [ScreenMatch(**match) for match in payload["matches"]]
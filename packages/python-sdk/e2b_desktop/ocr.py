@@ -0,0 +1,122 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+
+@dataclass
+class TextBox:
+    """
+    Text recognized on the screen and where it is.
+    """
+
+    text: str
+    x: int
+    y: int
+    width: int
+    height: int
+    confidence: float
+    """Confidence of the recognition from 0 to 1."""
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        """Center of the text, e.g. to click on it."""
+        return self.x + self.width // 2, self.y + self.height // 2
+
+
+@dataclass
+class TextLine(TextBox):
+    """
+    A line of text recognized on the screen, with the words it consists of.
+    """
+
+    words: List[TextBox] = field(default_factory=list)
+
+
+@dataclass
+class ScreenText:
+    """
+    Text recognized on the screen.
+    """
+
+    lines: List[TextLine]
+    hash: str
+    """Hash of the captured frame. The text of a frame that was recognized before is read from a cache."""
+    cached: bool
+    """`True` if the screen didn't change since it was recognized and the text was read from the cache."""
+
+    @property
+    def text(self) -> str:
+        """The recognized text, one line per line."""
+        return "\n".join(line.text for line in self.lines)
+
+    def find(self, query: str, case_sensitive: bool = False) -> List[TextBox]:
+        """
+        Find the occurrences of the query in the recognized lines.
+
+        :param query: Text to find, it may span words but not lines.
+        :param case_sensitive: Compare the case of the letters. Defaults to `False`.
+        :return: One box per occurrence, around the words it spans, from top to bottom.
+        :raises ValueError: If the query is empty
+        """
+        if not query.strip():
+            raise ValueError("query must not be empty")
+        flags = 0 if case_sensitive else re.IGNORECASE
+        # Whitespace in the query matches any whitespace between the recognized words
+        pattern = re.compile(r"\s+".join(map(re.escape, query.split())), flags)
+        found = []
+        for line in sorted(self.lines, key=lambda line: (line.y, line.x)):
+            # Offsets of the words in the text of the line
+            starts, position = [], 0
+            for word in line.words:
+                starts.append(position)
+                position += len(word.text) + 1
+
+            for match in pattern.finditer(line.text):
+                words = [
+                    word
+                    for word, start in zip(line.words, starts)
+                    if start < match.end() and start + len(word.text) > match.start()
+                ]
+                x = min(word.x for word in words)
+                y = min(word.y for word in words)
+                found.append(
+                    TextBox(
+                        text=match.group(),
+                        x=x,
+                        y=y,
+                        width=max(word.x + word.width for word in words) - x,
+                        height=max(word.y + word.height for word in words) - y,
+                        confidence=min(word.confidence for word in words),
+                    )
+                )
+        return found
+
+
+def validate_language(language: str) -> None:
+    if not re.fullmatch(r"[A-Za-z_]+(\+[A-Za-z_]+)*", language):
+        raise ValueError(
+            f"Invalid language {language!r}, use tesseract language codes, e.g. 'eng' or 'eng+deu'"
+        )
+
+
+def parse_screen_text(output: str) -> ScreenText:
+    """
+    Parse the output of the `ocr.py` sandbox program.
+
+    :raises RuntimeError: If the screen couldn't be captured or recognized
+    """
+    payload = json.loads(output)
+    if "error" in payload:
+        raise RuntimeError(f"Could not read the screen: {payload['error']}")
+    return ScreenText(
+        lines=[
+            TextLine(
+                **{key: value for key, value in line.items() if key != "words"},
+                words=[TextBox(**word) for word in line["words"]],
+            )
+            for line in payload["lines"]
+        ],
+        hash=payload["hash"],
+        cached=payload["cached"],
+    )
@@ -0,0 +1,557 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field, replace
+from typing import (
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+from .async_main import AsyncSandbox
+from .main import Sandbox
+
+
+@dataclass
+class PoolStats:
+    """
+    Usage statistics of a desktop pool.
+    """
+
+    hits: int = 0
+    """Number of acquires served by an already booted desktop."""
+    misses: int = 0
+    """Number of acquires that had to boot a new desktop."""
+    created: int = 0
+    """Number of desktops booted in the background."""
+    recycled: int = 0
+    """Number of released desktops returned to the pool."""
+    killed: int = 0
+    """Number of desktops killed, after use or because they idled too long."""
+    errors: int = 0
+    """Number of background boots that failed."""
+    ready: int = 0
+    """Number of desktops ready to be acquired."""
+    booting: int = 0
+    """Number of desktops booting in the background."""
+    acquire_ms: List[float] = field(default_factory=list)
+    """Time each of the recent acquires took, in milliseconds."""
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def mean_acquire_ms(self) -> float:
+        return sum(self.acquire_ms) / len(self.acquire_ms) if self.acquire_ms else 0.0
+
+    @property
+    def p95_acquire_ms(self) -> float:
+        if not self.acquire_ms:
+            return 0.0
+        ordered = sorted(self.acquire_ms)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class _PoolState:
+    """
+    Bookkeeping shared by the sync and async pools.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        timeout: int,
+        max_idle: Optional[float],
+        recycle: bool,
+        create_opts: Dict[str, Any],
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if max_idle is not None and max_idle <= 0:
+            raise ValueError("max_idle must be greater than 0")
+
+        self._size = size
+        self._recycle = recycle
+        # Desktops are replaced well before the sandbox times out
+        self._max_idle = max_idle if max_idle is not None else timeout * 0.8
+        self._create_opts = {"timeout": timeout, **create_opts}
+
+        self._ready: Deque[Any] = deque()
+        # When each ready desktop was booted or released, it's idle from then on
+        self._ready_since: Dict[int, float] = {}
+        self._booting = 0
+        self._closed = False
+        self._stats = PoolStats()
+        self._acquire_ms: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def stats(self) -> PoolStats:
+        """
+        A snapshot of the pool's usage statistics.
+        """
+        return replace(
+            self._stats,
+            ready=len(self._ready),
+            booting=self._booting,
+            acquire_ms=list(self._acquire_ms),
+        )
+
+    def _missing(self) -> int:
+        if self._closed:
+            return 0
+        return max(0, self._size - len(self._ready) - self._booting)
+
+    def _add_ready(self, sandbox: Any) -> None:
+        self._ready_since[id(sandbox)] = time.monotonic()
+        self._ready.append(sandbox)
+
+    def _evict_stale(self) -> List[Any]:
+        now = time.monotonic()
+        stale = [
+            sandbox
+            for sandbox in self._ready
+            if now - self._ready_since[id(sandbox)] > self._max_idle
+        ]
+        for sandbox in stale:
+            self._ready.remove(sandbox)
+            del self._ready_since[id(sandbox)]
+        return stale
+
+    def _take(self) -> Optional[Any]:
+        if not self._ready:
+            return None
+        sandbox = self._ready.popleft()
+        del self._ready_since[id(sandbox)]
+        return sandbox
+
+    def _should_recycle(self, recycle: Optional[bool]) -> bool:
+        recycle = self._recycle if recycle is None else recycle
+        return recycle and not self._closed and len(self._ready) < self._size
+
+    def _record_acquire(self, hit: bool, start: float) -> None:
+        if hit:
+            self._stats.hits += 1
+        else:
+            self._stats.misses += 1
+        self._acquire_ms.append((time.perf_counter() - start) * 1000)
+
+
+class DesktopPool(_PoolState):
+    """
+    Keeps desktops booted and ready, so acquiring one doesn't wait for a cold start.
+
+    The pool boots `size` desktops in the background and refills itself whenever
+    one is acquired. Desktops that idle for too long are replaced before their
+    sandbox times out.
+
+    ```python
+    with DesktopPool(size=2, resolution=(1280, 800)) as pool:
+        with pool.desktop() as desktop:
+            desktop.left_click(100, 200)
+
+        print(pool.stats.hit_rate, pool.stats.mean_acquire_ms)
+    ```
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        *,
+        template: Optional[str] = None,
+        resolution: Optional[Tuple[int, int]] = None,
+        dpi: Optional[int] = None,
+        timeout: int = 300,
+        max_idle: Optional[float] = None,
+        recycle: bool = False,
+        sandbox_class: Type[Sandbox] = Sandbox,
+        **create_opts: Any,
+    ) -> None:
+        """
+        Create the pool and start booting its desktops in the background.
+
+        :param size: Number of desktops kept ready.
+        :param template: Sandbox template name or ID.
+        :param resolution: Screen resolution of the desktops.
+        :param dpi: DPI of the desktops.
+        :param timeout: Timeout of the sandboxes in **seconds**.
+        :param max_idle: Replace desktops that waited in the pool for this many seconds since they were booted or released. Defaults to 80% of `timeout`.
+        :param recycle: Return released desktops to the pool instead of killing them. The timeout of a recycled desktop restarts when it's released.
+        :param sandbox_class: Class whose `create()` boots the desktops.
+        :param create_opts: Other options passed to `Sandbox.create()`.
+        """
+        super().__init__(
+            size,
+            timeout,
+            max_idle,
+            recycle,
+            {"template": template, "resolution": resolution, "dpi": dpi, **create_opts},
+        )
+        self._sandbox_class = sandbox_class
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=size + 2, thread_name_prefix="e2b-desktop-pool"
+        )
+        self._keeper = threading.Thread(target=self._keep, daemon=True)
+
+        with self._condition:
+            self._refill()
+        self._keeper.start()
+
+    def _refill(self) -> None:
+        for _ in range(self._missing()):
+            self._booting += 1
+            self._executor.submit(self._boot)
+
+    def _boot(self) -> None:
+        try:
+            sandbox = self._sandbox_class.create(**self._create_opts)
+        except Exception:
+            with self._condition:
+                self._booting -= 1
+                self._stats.errors += 1
+            return
+
+        with self._condition:
+            self._booting -= 1
+            if not self._closed:
+                self._stats.created += 1
+                self._add_ready(sandbox)
+                self._condition.notify_all()
+                return
+        self._kill(sandbox)
+
+    def _keep(self) -> None:
+        interval = min(self._max_idle / 4, 30)
+        with self._condition:
+            while not self._closed:
+                self._condition.wait(timeout=interval)
+                if self._closed:
+                    return
+                for sandbox in self._evict_stale():
+                    self._executor.submit(self._kill, sandbox)
+                self._refill()
+
+    def _reset_timeout(self, sandbox: Sandbox) -> bool:
+        """
+        Restart the sandbox's timeout, so a recycled desktop lasts as long as a new one.
+        """
+        try:
+            sandbox.set_timeout(self._create_opts["timeout"])
+        except Exception:
+            return False
+        return True
+
+    def _kill(self, sandbox: Sandbox) -> None:
+        with self._condition:
+            self._ready_since.pop(id(sandbox), None)
+            self._stats.killed += 1
+        try:
+            sandbox.kill()
+        except Exception:
+            pass
+
+    def acquire(self) -> Sandbox:
+        """
+        Take a desktop from the pool.
+
+        If no desktop is ready, a new one is booted for the caller, which counts as a miss.
+
+        :return: A booted desktop. Hand it back with `release()`.
+        :raises RuntimeError: If the pool is closed
+        """
+        start = time.perf_counter()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Pool is closed")
+            for sandbox in self._evict_stale():
+                self._executor.submit(self._kill, sandbox)
+            sandbox = self._take()
+            self._refill()
+
+        hit = sandbox is not None
+        if sandbox is None:
+            sandbox = self._sandbox_class.create(**self._create_opts)
+
+        with self._condition:
+            self._record_acquire(hit, start)
+        return sandbox
+
+    def release(self, sandbox: Sandbox, *, recycle: Optional[bool] = None) -> None:
+        """
+        Hand a desktop back to the pool.
+
+        :param sandbox: A desktop returned by `acquire()`.
+        :param recycle: Return the desktop to the pool instead of killing it. Defaults to the pool's `recycle` setting.
+        """
+        with self._condition:
+            recycle = self._should_recycle(recycle)
+        if recycle and self._reset_timeout(sandbox):
+            with self._condition:
+                # Check again, the pool may have filled up while the timeout was reset
+                if self._should_recycle(True):
+                    self._stats.recycled += 1
+                    self._add_ready(sandbox)
+                    self._condition.notify_all()
+                    return
+        with self._condition:
+            if not self._closed:
+                self._executor.submit(self._kill, sandbox)
+                return
+        self._kill(sandbox)
+
+    @contextmanager
+    def desktop(self) -> Iterator[Sandbox]:
+        """
+        Acquire a desktop for the duration of the `with` block.
+
+        The desktop is not recycled if the block raises an exception.
+        """
+        sandbox = self.acquire()
+        try:
+            yield sandbox
+        except BaseException:
+            self.release(sandbox, recycle=False)
+            raise
+        self.release(sandbox)
+
+    def close(self) -> None:
+        """
+        Kill all desktops of the pool, including the ones still booting.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            ready = list(self._ready)
+            self._ready.clear()
+            self._condition.notify_all()
+
+        for sandbox in ready:
+            self._executor.submit(self._kill, sandbox)
+        self._executor.shutdown(wait=True)
+        self._keeper.join()
+
+    def __enter__(self) -> "DesktopPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class AsyncDesktopPool(_PoolState):
+    """
+    Keeps desktops booted and ready, so acquiring one doesn't wait for a cold start.
+
+    The pool boots `size` desktops in the background and refills itself whenever
+    one is acquired. Desktops that idle for too long are replaced before their
+    sandbox times out.
+
+    ```python
+    async with AsyncDesktopPool(size=2, resolution=(1280, 800)) as pool:
+        async with pool.desktop() as desktop:
+            await desktop.left_click(100, 200)
+
+        print(pool.stats.hit_rate, pool.stats.mean_acquire_ms)
+    ```
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        *,
+        template: Optional[str] = None,
+        resolution: Optional[Tuple[int, int]] = None,
+        dpi: Optional[int] = None,
+        timeout: int = 300,
+        max_idle: Optional[float] = None,
+        recycle: bool = False,
+        sandbox_class: Type[AsyncSandbox] = AsyncSandbox,
+        **create_opts: Any,
+    ) -> None:
+        """
+        Create the pool. The desktops start booting on `start()`, the first `acquire()` or when entering `async with`.
+
+        :param size: Number of desktops kept ready.
+        :param template: Sandbox template name or ID.
+        :param resolution: Screen resolution of the desktops.
+        :param dpi: DPI of the desktops.
+        :param timeout: Timeout of the sandboxes in **seconds**.
+        :param max_idle: Replace desktops that waited in the pool for this many seconds since they were booted or released. Defaults to 80% of `timeout`.
+        :param recycle: Return released desktops to the pool instead of killing them. The timeout of a recycled desktop restarts when it's released.
+        :param sandbox_class: Class whose `create()` boots the desktops.
+        :param create_opts: Other options passed to `AsyncSandbox.create()`.
+        """
+        super().__init__(
+            size,
+            timeout,
+            max_idle,
+            recycle,
+            {"template": template, "resolution": resolution, "dpi": dpi, **create_opts},
+        )
+        self._sandbox_class = sandbox_class
+        self._tasks: Set[asyncio.Task] = set()
+        self._keeper: Optional[asyncio.Task] = None
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self) -> "AsyncDesktopPool":
+        """
+        Start booting the desktops in the background.
+        """
+        if self._keeper is None and not self._closed:
+            self._refill()
+            self._keeper = asyncio.create_task(self._keep())
+        return self
+
+    def _refill(self) -> None:
+        for _ in range(self._missing()):
+            self._booting += 1
+            self._spawn(self._boot())
+
+    async def _boot(self) -> None:
+        try:
+            sandbox = await self._sandbox_class.create(**self._create_opts)
+        except Exception:
+            self._booting -= 1
+            self._stats.errors += 1
+            return
+
+        self._booting -= 1
+        if self._closed:
+            await self._kill(sandbox)
+            return
+        self._stats.created += 1
+        self._add_ready(sandbox)
+
+    async def _keep(self) -> None:
+        interval = min(self._max_idle / 4, 30)
+        while not self._closed:
+            await asyncio.sleep(interval)
+            for sandbox in self._evict_stale():
+                self._spawn(self._kill(sandbox))
+            self._refill()
+
+    async def _reset_timeout(self, sandbox: AsyncSandbox) -> bool:
+        """
+        Restart the sandbox's timeout, so a recycled desktop lasts as long as a new one.
+        """
+        try:
+            await sandbox.set_timeout(self._create_opts["timeout"])
+        except Exception:
+            return False
+        return True
+
+    async def _kill(self, sandbox: AsyncSandbox) -> None:
+        self._ready_since.pop(id(sandbox), None)
+        self._stats.killed += 1
+        try:
+            await sandbox.kill()
+        except Exception:
+            pass
+
+    async def acquire(self) -> AsyncSandbox:
+        """
+        Take a desktop from the pool.
+
+        If no desktop is ready, a new one is booted for the caller, which counts as a miss.
+
+        :return: A booted desktop. Hand it back with `release()`.
+        :raises RuntimeError: If the pool is closed
+        """
+        start = time.perf_counter()
+        if self._closed:
+            raise RuntimeError("Pool is closed")
+        await self.start()
+
+        for sandbox in self._evict_stale():
+            self._spawn(self._kill(sandbox))
+        sandbox = self._take()
+        self._refill()
+
+        hit = sandbox is not None
+        if sandbox is None:
+            sandbox = await self._sandbox_class.create(**self._create_opts)
+
+        self._record_acquire(hit, start)
+        return sandbox
+
+    async def release(
+        self, sandbox: AsyncSandbox, *, recycle: Optional[bool] = None
+    ) -> None:
+        """
+        Hand a desktop back to the pool.
+
+        :param sandbox: A desktop returned by `acquire()`.
+        :param recycle: Return the desktop to the pool instead of killing it. Defaults to the pool's `recycle` setting.
+        """
+        # Check again, the pool may have filled up while the timeout was reset
+        if (
+            self._should_recycle(recycle)
+            and await self._reset_timeout(sandbox)
+            and self._should_recycle(True)
+        ):
+            self._stats.recycled += 1
+            self._add_ready(sandbox)
+        elif not self._closed:
+            self._spawn(self._kill(sandbox))
+        else:
+            await self._kill(sandbox)
+
+    @asynccontextmanager
+    async def desktop(self) -> AsyncIterator[AsyncSandbox]:
+        """
+        Acquire a desktop for the duration of the `async with` block.
+
+        The desktop is not recycled if the block raises an exception.
+        """
+        sandbox = await self.acquire()
+        try:
+            yield sandbox
+        except BaseException:
+            await self.release(sandbox, recycle=False)
+            raise
+        await self.release(sandbox)
+
+    async def close(self) -> None:
+        """
+        Kill all desktops of the pool, including the ones still booting.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._keeper:
+            self._keeper.cancel()
+
+        ready = list(self._ready)
+        self._ready.clear()
+        await asyncio.gather(*(self._kill(sandbox) for sandbox in ready))
+        await asyncio.gather(
+            *self._tasks,
+            *([self._keeper] if self._keeper else []),
+            return_exceptions=True,
+        )
+
+    async def __aenter__(self) -> "AsyncDesktopPool":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
@@ -0,0 +1,57 @@
+import json
+from dataclasses import dataclass, field
+from shlex import quote as quote_string
+from typing import Dict, Optional, Sequence
+
+from .scripts import load_script
+
+
+@dataclass
+class ReadinessResult:
+    """
+    Result of waiting for services in the sandbox to become ready.
+    """
+
+    ready: bool
+    """`True` if all conditions held before the deadline."""
+    elapsed_ms: float
+    """Time spent waiting inside the sandbox, in milliseconds."""
+    conditions: Dict[str, Optional[float]] = field(default_factory=dict)
+    """Time until each condition held in milliseconds, `None` if it didn't."""
+    error: Optional[str] = None
+    """Why the wait ended early, e.g. because the awaited process exited."""
+
+
+def port_condition(port: int) -> str:
+    return f"port:{port}"
+
+
+def readiness_command(
+    conditions: Sequence[str], timeout: float, pid: Optional[int] = None
+) -> str:
+    """
+    Build a command that blocks inside the sandbox until all conditions hold or the timeout expires.
+
+    The program is passed inline rather than uploaded, so waiting takes exactly one round trip,
+    even during startup.
+
+    :param pid: Give up as soon as the process with this pid exits.
+    """
+    _, source = load_script("wait_ready.py")
+    pid_flag = f"--pid {pid} " if pid else ""
+    return f"python3 -c {quote_string(source)} {timeout} {pid_flag}" + " ".join(
+        quote_string(condition) for condition in conditions
+    )
+
+
+def parse_readiness(output: str) -> ReadinessResult:
+    """
+    Parse the output of the `wait_ready.py` sandbox program.
+    """
+    payload = json.loads(output)
+    return ReadinessResult(
+        ready=payload["ready"],
+        elapsed_ms=payload["elapsed_ms"],
+        conditions=payload["conditions"],
+        error=payload.get("error"),
+    )
@@ -0,0 +1,419 @@
+import asyncio
+import inspect
+import queue
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from e2b import AsyncCommandHandle, CommandExitException, CommandHandle
+
+from .capture import RecordingCodec, recording_command
+from .scripts import REMOTE_SCRIPTS_DIR
+
+if TYPE_CHECKING:
+    from .async_main import AsyncSandbox
+    from .main import Sandbox
+
+
+@dataclass
+class RecordingSegment:
+    """
+    A finished segment of a screen recording.
+    """
+
+    index: int
+    """Sequence number of the segment, starting at 0."""
+    name: str
+    """File name of the segment, e.g. `segment-00000.mp4`."""
+    start: float
+    """Start of the segment in seconds since the recording started."""
+    end: float
+    """End of the segment in seconds since the recording started."""
+    data: bytes
+    """The segment's video, playable on its own."""
+
+
+class _SegmentListParser:
+    """
+    Parse the lines ffmpeg appends to the segment list of a recording.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+
+    def feed(self, chunk: str) -> List[Tuple[str, float, float]]:
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+
+        entries = []
+        for line in lines:
+            if not line.strip():
+                continue
+            name, start, end = line.strip().rsplit(",", 2)
+            entries.append((name, float(start), float(end)))
+        return entries
+
+
+def _segment_index(name: str) -> int:
+    return int(name.split("-", 1)[1].split(".", 1)[0])
+
+
+def _recording_directory() -> str:
+    return f"{REMOTE_SCRIPTS_DIR}/recording-{secrets.token_hex(4)}"
+
+
+def _watch_command(directory: str, pid: int) -> str:
+    # `tail` exits once the recording process exits and the whole list has been printed
+    return f"tail -n +1 -F --pid={pid} {directory}/segments.csv 2>/dev/null"
+
+
+class _Recording:
+    """
+    Records the screen into rolling segments that are downloaded while the recording continues.
+
+    Each finished segment is downloaded and deleted from the sandbox, so the sandbox's
+    disk usage stays bounded by a couple of segments, however long the recording runs.
+    """
+
+    def __init__(self, desktop: "Sandbox") -> None:
+        self.__desktop = desktop
+        self._handle: Optional[CommandHandle] = None
+        self._directory: Optional[str] = None
+        self._segments: Optional["queue.Queue[Optional[RecordingSegment]]"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
+
+    @property
+    def is_recording(self) -> bool:
+        return self._handle is not None
+
+    def start(
+        self,
+        fps: float = 10,
+        codec: RecordingCodec = "h264",
+        segment_seconds: float = 10,
+        *,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        include_pointer: bool = True,
+        on_segment: Optional[Callable[[RecordingSegment], None]] = None,
+    ) -> None:
+        """
+        Start recording the screen.
+
+        :param fps: Number of frames recorded per second.
+        :param codec: The video codec. Can be 'h264' (MP4 segments) or 'vp8' (WebM segments).
+        :param segment_seconds: Length of the segments in seconds.
+        :param region: Record only the `(x, y, width, height)` region of the screen.
+        :param include_pointer: Draw the mouse pointer into the recording. Defaults to `True`.
+        :param on_segment: Called in a background thread with every finished segment. If not set, use `segments()` to consume them.
+        :raises RuntimeError: If a recording is already running
+        :raises ValueError: If the options are invalid
+        """
+        if self._handle is not None:
+            raise RuntimeError("Recording is already running")
+
+        directory = _recording_directory()
+        command = recording_command(
+            self.__desktop._display,
+            directory,
+            fps=fps,
+            codec=codec,
+            segment_seconds=segment_seconds,
+            region=region,
+            include_pointer=include_pointer,
+        )
+
+        self._directory = directory
+        self._segments = queue.Queue()
+        self._error = None
+        self._handle = self.__desktop.commands.run(
+            command, background=True, stdin=True, timeout=0
+        )
+        watcher = self.__desktop.commands.run(
+            _watch_command(directory, self._handle.pid), background=True, timeout=0
+        )
+        self._thread = threading.Thread(
+            target=self._watch, args=(watcher, directory, on_segment), daemon=True
+        )
+        self._thread.start()
+
+    def _watch(
+        self,
+        watcher: CommandHandle,
+        directory: str,
+        on_segment: Optional[Callable[[RecordingSegment], None]],
+    ) -> None:
+        assert self._segments is not None
+        parser = _SegmentListParser()
+        try:
+            for stdout, _, _ in watcher:
+                for name, start, end in parser.feed(stdout or ""):
+                    segment = self._download(directory, name, start, end)
+                    if on_segment:
+                        on_segment(segment)
+                    else:
+                        self._segments.put(segment)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._segments.put(None)
+
+    def _download(
+        self, directory: str, name: str, start: float, end: float
+    ) -> RecordingSegment:
+        path = f"{directory}/{name}"
+        data = self.__desktop.files.read(path, format="bytes")
+        self.__desktop.files.remove(path)
+        return RecordingSegment(
+            index=_segment_index(name),
+            name=name,
+            start=start,
+            end=end,
+            data=bytes(data),
+        )
+
+    def segments(self) -> Iterator[RecordingSegment]:
+        """
+        Iterate over the finished segments as they're downloaded.
+
+        The iteration ends after the recording is stopped and the last segment was returned.
+
+        :raises RuntimeError: If no recording was started
+        """
+        if self._segments is None:
+            raise RuntimeError("Recording was not started")
+
+        while True:
+            segment = self._segments.get()
+            if segment is None:
+                # Keep the end marker for other consumers
+                self._segments.put(None)
+                return
+            yield segment
+
+    def stop(self) -> List[RecordingSegment]:
+        """
+        Stop the recording, finalizing the last segment.
+
+        :return: The segments that were downloaded but not consumed by `segments()` yet.
+        :raises RuntimeError: If no recording is running
+        """
+        if self._handle is None:
+            raise RuntimeError("Recording is not running")
+        handle, self._handle = self._handle, None
+
+        try:
+            self.__desktop.commands.send_stdin(handle.pid, "q")
+            handle.wait()
+        finally:
+            if self._thread:
+                self._thread.join()
+            self.__desktop.commands.run(f"rm -rf {self._directory}")
+
+        if self._error:
+            raise self._error
+
+        assert self._segments is not None
+        remaining = []
+        while True:
+            segment = self._segments.get()
+            if segment is None:
+                self._segments.put(None)
+                return remaining
+            remaining.append(segment)
+
+
+class _AsyncRecording:
+    """
+    Records the screen into rolling segments that are downloaded while the recording continues.
+
+    Each finished segment is downloaded and deleted from the sandbox, so the sandbox's
+    disk usage stays bounded by a couple of segments, however long the recording runs.
+    """
+
+    def __init__(self, desktop: "AsyncSandbox") -> None:
+        self.__desktop = desktop
+        self._handle: Optional[AsyncCommandHandle] = None
+        self._directory: Optional[str] = None
+        self._segments: Optional["asyncio.Queue[Optional[RecordingSegment]]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[Exception] = None
+
+    @property
+    def is_recording(self) -> bool:
+        return self._handle is not None
+
+    async def start(
+        self,
+        fps: float = 10,
+        codec: RecordingCodec = "h264",
+        segment_seconds: float = 10,
+        *,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        include_pointer: bool = True,
+        on_segment: Optional[
+            Callable[[RecordingSegment], Union[None, Awaitable[None]]]
+        ] = None,
+    ) -> None:
+        """
+        Start recording the screen.
+
+        :param fps: Number of frames recorded per second.
+        :param codec: The video codec. Can be 'h264' (MP4 segments) or 'vp8' (WebM segments).
+        :param segment_seconds: Length of the segments in seconds.
+        :param region: Record only the `(x, y, width, height)` region of the screen.
+        :param include_pointer: Draw the mouse pointer into the recording. Defaults to `True`.
+        :param on_segment: Called with every finished segment, may be a coroutine function. If not set, use `segments()` to consume them.
+        :raises RuntimeError: If a recording is already running
+        :raises ValueError: If the options are invalid
+        """
+        if self._handle is not None:
+            raise RuntimeError("Recording is already running")
+
+        directory = _recording_directory()
+        command = recording_command(
+            self.__desktop._display,
+            directory,
+            fps=fps,
+            codec=codec,
+            segment_seconds=segment_seconds,
+            region=region,
+            include_pointer=include_pointer,
+        )
+
+        self._directory = directory
+        self._segments = asyncio.Queue()
+        self._error = None
+
+        entries: "asyncio.Queue[Optional[Tuple[str, float, float]]]" = asyncio.Queue()
+        parser = _SegmentListParser()
+
+        def on_stdout(chunk: str) -> None:
+            for entry in parser.feed(chunk):
+                entries.put_nowait(entry)
+
+        self._handle = await self.__desktop.commands.run(
+            command, background=True, stdin=True, timeout=0
+        )
+        watcher = await self.__desktop.commands.run(
+            _watch_command(directory, self._handle.pid),
+            background=True,
+            timeout=0,
+            on_stdout=on_stdout,
+        )
+        self._task = asyncio.create_task(
+            self._watch(watcher, entries, directory, on_segment)
+        )
+
+    async def _watch(
+        self,
+        watcher: AsyncCommandHandle,
+        entries: "asyncio.Queue[Optional[Tuple[str, float, float]]]",
+        directory: str,
+        on_segment: Optional[
+            Callable[[RecordingSegment], Union[None, Awaitable[None]]]
+        ],
+    ) -> None:
+        assert self._segments is not None
+
+        async def wait_for_watcher() -> None:
+            try:
+                await watcher.wait()
+            except CommandExitException:
+                pass
+            finally:
+                entries.put_nowait(None)
+
+        waiter = asyncio.create_task(wait_for_watcher())
+        try:
+            while True:
+                entry = await entries.get()
+                if entry is None:
+                    break
+                segment = await self._download(directory, *entry)
+                if on_segment:
+                    result = on_segment(segment)
+                    if inspect.isawaitable(result):
+                        await result
+                else:
+                    self._segments.put_nowait(segment)
+        except Exception as e:
+            self._error = e
+        finally:
+            await waiter
+            self._segments.put_nowait(None)
+
+    async def _download(
+        self, directory: str, name: str, start: float, end: float
+    ) -> RecordingSegment:
+        path = f"{directory}/{name}"
+        data = await self.__desktop.files.read(path, format="bytes")
+        await self.__desktop.files.remove(path)
+        return RecordingSegment(
+            index=_segment_index(name),
+            name=name,
+            start=start,
+            end=end,
+            data=bytes(data),
+        )
+
+    async def segments(self) -> AsyncIterator[RecordingSegment]:
+        """
+        Iterate over the finished segments as they're downloaded.
+
+        The iteration ends after the recording is stopped and the last segment was returned.
+
+        :raises RuntimeError: If no recording was started
+        """
+        if self._segments is None:
+            raise RuntimeError("Recording was not started")
+
+        while True:
+            segment = await self._segments.get()
+            if segment is None:
+                # Keep the end marker for other consumers
+                self._segments.put_nowait(None)
+                return
+            yield segment
+
+    async def stop(self) -> List[RecordingSegment]:
+        """
+        Stop the recording, finalizing the last segment.
+
+        :return: The segments that were downloaded but not consumed by `segments()` yet.
+        :raises RuntimeError: If no recording is running
+        """
+        if self._handle is None:
+            raise RuntimeError("Recording is not running")
+        handle, self._handle = self._handle, None
+
+        try:
+            await self.__desktop.commands.send_stdin(handle.pid, "q")
+            await handle.wait()
+        finally:
+            if self._task:
+                await self._task
+            await self.__desktop.commands.run(f"rm -rf {self._directory}")
+
+        if self._error:
+            raise self._error
+
+        assert self._segments is not None
+        remaining = []
+        while True:
+            segment = await self._segments.get()
+            if segment is None:
+                self._segments.put_nowait(None)
+                return remaining
+            remaining.append(segment)
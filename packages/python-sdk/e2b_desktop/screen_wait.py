@@ -0,0 +1,40 @@
+import json
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass
+class ScreenChange:
+    """
+    Result of waiting for the screen to change or to become stable.
+    """
+
+    done: bool
+    """`True` if the screen changed, or became stable, before the timeout."""
+    box: Optional[Tuple[int, int, int, int]]
+    """Bounding box `(x, y, width, height)` of everything that changed during the wait, in screen coordinates. `None` if nothing changed."""
+    elapsed_ms: float
+    """Time spent waiting inside the sandbox, in milliseconds."""
+    hash: str
+    """Hash of the last captured frame. Pass it as `since` to the next `wait_for_screen_change()` on the same region."""
+
+    @property
+    def changed(self) -> bool:
+        return self.box is not None
+
+
+def parse_screen_change(output: str) -> ScreenChange:
+    """
+    Parse the output of the `screen_wait.py` sandbox program.
+
+    :raises RuntimeError: If the screen couldn't be captured
+    """
+    payload = json.loads(output)
+    if "error" in payload:
+        raise RuntimeError(f"Could not watch the screen: {payload['error']}")
+    return ScreenChange(
+        done=payload["done"],
+        box=tuple(payload["box"]) if payload["box"] else None,
+        elapsed_ms=payload["elapsed_ms"],
+        hash=payload["hash"],
+    )
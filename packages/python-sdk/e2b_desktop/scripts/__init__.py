@@ -0,0 +1,28 @@
+"""
+Helper programs that the SDK uploads to and runs inside the desktop sandbox.
+
+The programs only rely on what the desktop template already provides
+(python3, numpy, X11 libraries and command line tools), so they work with
+existing templates without a rebuild. The exception is `ocr.py`, it needs
+tesseract, which only templates built since OCR support was added have.
+"""
+
+from functools import lru_cache
+from hashlib import sha256
+from pathlib import Path
+from typing import Tuple
+
+REMOTE_SCRIPTS_DIR = "/tmp/.e2b_desktop"
+
+
+@lru_cache(maxsize=None)
+def load_script(name: str) -> Tuple[str, str]:
+    """
+    Load a bundled sandbox program.
+
+    :param name: File name of the program in this directory.
+    :return: A tuple with the path the program should be uploaded to and its source.
+    """
+    source = (Path(__file__).parent / name).read_text()
+    digest = sha256(source.encode()).hexdigest()[:12]
+    return f"{REMOTE_SCRIPTS_DIR}/{digest}-{name}", source
@@ -0,0 +1,187 @@
+"""
+Incremental screen capture that runs inside the desktop sandbox.
+
+Every invocation captures the display and compares it with the previous frame
+captured for the same session. Only the tiles that changed are encoded and
+returned, or a "not modified" marker when the screen is the same.
+
+Usage: python3 delta_capture.py <session> <since-hash> <tile-size> <draw-mouse>
+
+The previous frame of each session on each display is kept in shared memory,
+so nothing is written to the sandbox's disk. The result is printed as JSON.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import zlib
+
+import numpy as np
+
+CACHE_DIR = "/dev/shm/e2b_desktop" if os.path.isdir("/dev/shm") else "/tmp/e2b_desktop"
+
+
+def screen_size(display: str) -> tuple:
+    output = subprocess.run(
+        ["xdpyinfo", "-display", display], capture_output=True, text=True, check=True
+    ).stdout
+    for line in output.splitlines():
+        if "dimensions:" in line:
+            width, height = line.split()[1].split("x")
+            return int(width), int(height)
+    raise RuntimeError("Could not determine the screen size")
+
+
+def capture(display: str, draw_mouse: bool) -> np.ndarray:
+    width, height = screen_size(display)
+    raw = subprocess.run(
+        [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-f",
+            "x11grab",
+            "-draw_mouse",
+            str(int(draw_mouse)),
+            "-video_size",
+            f"{width}x{height}",
+            "-i",
+            display,
+            "-frames:v",
+            "1",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-",
+        ],
+        capture_output=True,
+        check=True,
+    ).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3)
+
+
+def display_number(display: str) -> str:
+    return display.split(":", 1)[1].split(".", 1)[0]
+
+
+def write_atomic(path: str, write) -> None:
+    # Other displays' captures may read the file at the same time
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        write(f)
+    os.replace(temp_path, path)
+
+
+def cached_frame(cache_path: str, since: str):
+    """
+    The previous frame of the session, if it has the given hash.
+    """
+    try:
+        with open(cache_path + ".hash") as f:
+            if f.read().strip() != since:
+                return None
+        previous = np.load(cache_path)
+    except (OSError, ValueError):
+        return None
+    # The frame is replaced after the hash, so it may already be a newer one
+    if hashlib.blake2b(previous.tobytes(), digest_size=16).hexdigest() != since:
+        return None
+    return previous
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    height, width, _ = pixels.shape
+    # Filter type 0 (None) for every scanline
+    rows = np.hstack(
+        [np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)]
+    )
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def changed_rects(previous: np.ndarray, current: np.ndarray, tile: int) -> list:
+    height, width, _ = current.shape
+    rows, cols = -(-height // tile), -(-width // tile)
+
+    changed = np.zeros((rows * tile, cols * tile), dtype=bool)
+    changed[:height, :width] = np.any(previous != current, axis=2)
+    dirty = changed.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+    # Merge horizontal runs of dirty tiles into one rectangle each
+    rects = []
+    for row in range(rows):
+        col = 0
+        while col < cols:
+            if not dirty[row, col]:
+                col += 1
+                continue
+            start = col
+            while col < cols and dirty[row, col]:
+                col += 1
+            x, y = start * tile, row * tile
+            rects.append((x, y, min(col * tile, width) - x, min(tile, height - y)))
+    return rects
+
+
+def main() -> None:
+    session, since, tile, draw_mouse = sys.argv[1:5]
+    tile = int(tile)
+    display = os.environ.get("DISPLAY", ":0")
+
+    current = capture(display, draw_mouse == "1")
+    frame_hash = hashlib.blake2b(current.tobytes(), digest_size=16).hexdigest()
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(
+        CACHE_DIR, f"delta-{display_number(display)}-{session}.npy"
+    )
+    previous = cached_frame(cache_path, since)
+
+    height, width, _ = current.shape
+    result = {
+        "hash": frame_hash,
+        "width": width,
+        "height": height,
+        "not_modified": False,
+        "keyframe": False,
+        "tiles": [],
+    }
+
+    if previous is not None and previous.shape == current.shape:
+        if frame_hash == since:
+            result["not_modified"] = True
+        else:
+            rects = changed_rects(previous, current, tile)
+    else:
+        result["keyframe"] = True
+        rects = [(0, 0, width, height)]
+
+    if not result["not_modified"]:
+        for x, y, w, h in rects:
+            png = encode_png(np.ascontiguousarray(current[y : y + h, x : x + w]))
+            result["tiles"].append(
+                {"x": x, "y": y, "w": w, "h": h, "data": base64.b64encode(png).decode()}
+            )
+
+        write_atomic(cache_path, lambda f: np.save(f, current))
+        write_atomic(cache_path + ".hash", lambda f: f.write(frame_hash.encode()))
+
+    print(json.dumps(result, separators=(",", ":")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Boot the desktop inside the sandbox in a single command.
+
+Usage: python3 desktop_launcher.py <json-config>
+
+Starts Xvfb and, as soon as the X server accepts connections, the desktop
+session. Every finished phase is printed as a JSON line with the time since the
+launcher started, so the client can continue as soon as the phase it waits for
+is done while the rest of the boot carries on in the background.
+
+Phases: `x11` (the X server is ready), `session_started` (the session was
+launched, with its pid), `stream` (x11vnc and the noVNC proxy listen, with the
+time each took and the proxy's pid) and `session` (a window manager manages
+the screen). With an empty `session_command` no session is started, its pid is
+`null` and `session` follows right away.
+
+Without the screen size in the config the display is expected to be running
+already: only the session is started if `session_command` is set, e.g. to
+restart it, and the stream if it's configured.
+"""
+
+import json
+import os
+import select
+import subprocess
+import sys
+import time
+
+START = time.monotonic()
+
+
+def elapsed_ms() -> float:
+    return (time.monotonic() - START) * 1000
+
+
+def report(phase: str, **fields) -> None:
+    print(json.dumps({"phase": phase, "ms": elapsed_ms(), **fields}), flush=True)
+
+
+def fail(message: str) -> None:
+    print(json.dumps({"error": message, "ms": elapsed_ms()}), flush=True)
+    sys.exit(1)
+
+
+def start_xvfb(config: dict) -> subprocess.Popen:
+    # Xvfb writes the display number to the pipe once it accepts connections,
+    # so there is nothing to poll
+    read_fd, write_fd = os.pipe()
+    xvfb = subprocess.Popen(
+        [
+            "Xvfb",
+            config["display"],
+            "-ac",
+            "-screen",
+            "0",
+            f"{config['width']}x{config['height']}x24",
+            "-retro",
+            "-dpi",
+            str(config["dpi"]),
+            "-nolisten",
+            "tcp",
+            "-nolisten",
+            "unix",
+            "-displayfd",
+            str(write_fd),
+        ],
+        pass_fds=(write_fd,),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    os.close(write_fd)
+
+    readable, _, _ = select.select([read_fd], [], [], config["x11_timeout"])
+    if not readable:
+        fail("Timed out waiting for Xvfb")
+    if not os.read(read_fd, 64):
+        fail("Xvfb exited")
+    os.close(read_fd)
+    return xvfb
+
+
+def start_session(config: dict) -> int:
+    process = subprocess.Popen(
+        config["session_command"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return process.pid
+
+
+def session_ready() -> bool:
+    # Set by every EWMH compliant window manager once it manages the screen
+    result = subprocess.run(
+        ["xprop", "-root", "_NET_SUPPORTING_WM_CHECK"],
+        capture_output=True,
+        text=True,
+    )
+    return "window id" in result.stdout
+
+
+def port_ready(port: int) -> bool:
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            # State 0A is LISTEN
+            if fields[3] == "0A" and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                return True
+    return False
+
+
+def vnc_running(display: str) -> bool:
+    # The same pattern the client stops the stream with
+    pattern = f"x11vnc -display {display} ".encode()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ")
+        except OSError:
+            continue
+        if pattern in cmdline:
+            return True
+    return False
+
+
+def start_stream(display: str, stream: dict) -> dict:
+    """
+    Start x11vnc and the noVNC proxy and wait until both listen.
+
+    :return: The fields of the `stream` phase.
+    """
+    if vnc_running(display):
+        fail("Stream is already running")
+
+    start = time.monotonic()
+    auth = ["-nopw"]
+    if stream["password"]:
+        passwd = os.path.expanduser("~/.vnc/passwd")
+        os.makedirs(os.path.dirname(passwd), exist_ok=True)
+        subprocess.run(
+            ["x11vnc", "-storepasswd", stream["password"], passwd],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        auth = ["-usepw"]
+    window = ["-id", stream["window_id"]] if stream["window_id"] else []
+
+    # One log per display, booting another display doesn't truncate this one's
+    number = display.split(":", 1)[1].split(".", 1)[0]
+    # Both run in their own process groups, so they outlive the launcher
+    with open(f"/tmp/x11vnc_stderr_{number}.log", "wb") as log:
+        vnc = subprocess.Popen(
+            ["x11vnc", "-display", display, "-forever", *stream["flags"], "-shared"]
+            + ["-rfbport", str(stream["vnc_port"]), *auth, *window],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+            start_new_session=True,
+        )
+    with open(f"/tmp/novnc_{number}.log", "wb") as log:
+        novnc = subprocess.Popen(
+            ["./novnc_proxy", "--vnc", f"localhost:{stream['vnc_port']}"]
+            + ["--listen", str(stream["port"]), "--web", "/opt/noVNC"],
+            cwd="/opt/noVNC/utils",
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    # Both start at the same time, the proxy only connects to x11vnc once a viewer connects
+    ready = {}
+    pending = {"vnc_ms": (vnc, stream["vnc_port"]), "novnc_ms": (novnc, stream["port"])}
+    deadline = start + stream["timeout"]
+    while pending:
+        for name, (process, port) in list(pending.items()):
+            if port_ready(port):
+                ready[name] = (time.monotonic() - start) * 1000
+                del pending[name]
+            elif process.poll() is not None:
+                fail(f"{process.args[0]} exited with code {process.returncode}")
+        if pending and time.monotonic() >= deadline:
+            fail("Timed out waiting for the stream")
+        time.sleep(0.01)
+    return {**ready, "novnc_pid": novnc.pid}
+
+
+def main() -> None:
+    config = json.loads(sys.argv[1])
+    os.environ["DISPLAY"] = config["display"]
+
+    xvfb = None
+    if "width" in config:
+        xvfb = start_xvfb(config)
+        report("x11")
+
+    session = "session_command" in config
+    if session:
+        if xvfb is None:
+            # A window manager that exited leaves its check window's id behind
+            subprocess.run(
+                ["xprop", "-root", "-remove", "_NET_SUPPORTING_WM_CHECK"],
+                capture_output=True,
+            )
+        pid = start_session(config) if config["session_command"] else None
+        report("session_started", pid=pid)
+
+    if config.get("stream"):
+        report("stream", **start_stream(config["display"], config["stream"]))
+
+    if not session:
+        return
+    deadline = time.monotonic() + config["session_timeout"]
+    while pid is not None and not session_ready():
+        if time.monotonic() >= deadline:
+            fail("Timed out waiting for the desktop session")
+        if xvfb is not None and xvfb.poll() is not None:
+            # The display was stopped before the session was ready
+            fail("Xvfb exited")
+        time.sleep(0.05)
+    report("session")
+
+
+if __name__ == "__main__":
+    main()
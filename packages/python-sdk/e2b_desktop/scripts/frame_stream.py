@@ -0,0 +1,64 @@
+"""
+Split a stream of encoded images from ffmpeg's image2pipe muxer into frames.
+
+Usage: ffmpeg ... -f image2pipe - | python3 frame_stream.py <png|jpeg|webp>
+
+Every frame is printed on its own line as `<index> <unix time> <base64 data>`,
+so the SDK can read the frames from the command's text output.
+"""
+
+import base64
+import struct
+import sys
+import time
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_END = b"\xff\xd9"
+
+
+def frame_end(image_format: str, buffer: bytearray) -> int:
+    """
+    Return the length of the first complete frame in the buffer, or 0 if it's incomplete.
+    """
+    if image_format == "png":
+        offset = len(PNG_SIGNATURE)
+        while offset + 8 <= len(buffer):
+            length, kind = struct.unpack(">I4s", buffer[offset : offset + 8])
+            offset += 12 + length
+            if kind == b"IEND":
+                return offset if offset <= len(buffer) else 0
+        return 0
+
+    if image_format == "webp":
+        if len(buffer) < 8:
+            return 0
+        size = 8 + struct.unpack("<I", buffer[4:8])[0]
+        return size if size <= len(buffer) else 0
+
+    # JPEG data escapes 0xFF bytes, so the end marker can't appear inside a frame
+    end = buffer.find(JPEG_END, 2)
+    return end + 2 if end != -1 else 0
+
+
+def main() -> None:
+    image_format = sys.argv[1]
+    source = sys.stdin.buffer
+    buffer = bytearray()
+    index = 0
+
+    while True:
+        chunk = source.read1(65536)
+        if not chunk:
+            break
+        buffer += chunk
+
+        while (end := frame_end(image_format, buffer)) > 0:
+            data = base64.b64encode(bytes(buffer[:end])).decode()
+            sys.stdout.write(f"{index} {time.time():.3f} {data}\n")
+            sys.stdout.flush()
+            del buffer[:end]
+            index += 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,654 @@
+"""
+Persistent input server that runs inside the desktop sandbox.
+
+The server holds a single connection to the X display and injects input
+through the XTest extension, so every action costs one HTTP request on an
+already open connection instead of spawning a new xdotool process.
+
+Requests are JSON arrays of operations, e.g. `[["move", 10, 20], ["click", 1, 1, 100]]`,
+and the response is a JSON object with one result and one duration per operation.
+
+Long text is delivered with the `paste` operation: the server takes ownership of
+the CLIPBOARD selection, serves the text to whichever application asks for it
+and presses the paste key, so the text arrives verbatim in one step. The paste
+is done once the application with the keyboard focus received the text, not
+when e.g. a clipboard manager copied it.
+
+Run with `--batch <operations>` to execute a single batch of operations and
+print the response instead of starting the server. Large batches are passed
+as `--batch @<file>`, the file is removed after it's read.
+
+This file is uploaded to the sandbox by the SDK and only depends on the
+Python standard library and libX11/libXtst, which the desktop template ships.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SHIFT_KEYSYM = 0xFFE1
+NO_SYMBOL = 0
+
+Window = ctypes.c_ulong
+Atom = ctypes.c_ulong
+
+SELECTION_CLEAR = 29
+SELECTION_REQUEST = 30
+SELECTION_NOTIFY = 31
+XA_ATOM = 4
+PROP_MODE_REPLACE = 0
+
+# How long a paste waits for the application to ask for the clipboard, in seconds
+PASTE_TIMEOUT = 2.0
+
+SPECIAL_CHAR_KEYSYMS = {
+    "\n": 0xFF0D,  # Return
+    "\r": 0xFF0D,  # Return
+    "\t": 0xFF09,  # Tab
+    "\b": 0xFF08,  # BackSpace
+}
+
+
+class XSelectionRequestEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("owner", Window),
+        ("requestor", Window),
+        ("selection", Atom),
+        ("target", Atom),
+        ("property", Atom),
+        ("time", ctypes.c_ulong),
+    ]
+
+
+class XSelectionEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("requestor", Window),
+        ("selection", Atom),
+        ("target", Atom),
+        ("property", Atom),
+        ("time", ctypes.c_ulong),
+    ]
+
+
+class XDisplay(ctypes.Structure):
+    # The leading fields of Xlib's public Display struct, up to the resource id mask
+    _fields_ = [
+        ("ext_data", ctypes.c_void_p),
+        ("private1", ctypes.c_void_p),
+        ("fd", ctypes.c_int),
+        ("private2", ctypes.c_int),
+        ("proto_major_version", ctypes.c_int),
+        ("proto_minor_version", ctypes.c_int),
+        ("vendor", ctypes.c_char_p),
+        ("resource_base", ctypes.c_ulong),
+        ("resource_mask", ctypes.c_ulong),
+    ]
+
+
+class XEvent(ctypes.Union):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("xselectionrequest", XSelectionRequestEvent),
+        ("xselection", XSelectionEvent),
+        ("pad", ctypes.c_long * 24),
+    ]
+
+
+class Clipboard(threading.Thread):
+    """
+    Owner of the CLIPBOARD selection.
+
+    Runs on its own connection to the display, so serving the text never
+    blocks the input operations, and keeps serving the last offered text
+    until another application takes the clipboard over.
+    """
+
+    def __init__(self, x11, display: str) -> None:
+        super().__init__(daemon=True)
+        self._x11 = x11
+        x11.XCreateSimpleWindow.restype = Window
+        x11.XCreateSimpleWindow.argtypes = [ctypes.c_void_p, Window] + [
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_uint,
+            ctypes.c_uint,
+            ctypes.c_uint,
+            ctypes.c_ulong,
+            ctypes.c_ulong,
+        ]
+        x11.XInternAtom.restype = Atom
+        x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        x11.XSetSelectionOwner.argtypes = [
+            ctypes.c_void_p,
+            Atom,
+            Window,
+            ctypes.c_ulong,
+        ]
+        x11.XGetSelectionOwner.restype = Window
+        x11.XGetSelectionOwner.argtypes = [ctypes.c_void_p, Atom]
+        x11.XChangeProperty.argtypes = [
+            ctypes.c_void_p,
+            Window,
+            Atom,
+            Atom,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_void_p,
+            ctypes.c_int,
+        ]
+        x11.XSendEvent.argtypes = [
+            ctypes.c_void_p,
+            Window,
+            ctypes.c_int,
+            ctypes.c_long,
+            ctypes.POINTER(XEvent),
+        ]
+        x11.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        x11.XPending.argtypes = [ctypes.c_void_p]
+        x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(XEvent)]
+        x11.XFlush.argtypes = [ctypes.c_void_p]
+        x11.XMaxRequestSize.restype = ctypes.c_long
+        x11.XMaxRequestSize.argtypes = [ctypes.c_void_p]
+        x11.XExtendedMaxRequestSize.restype = ctypes.c_long
+        x11.XExtendedMaxRequestSize.argtypes = [ctypes.c_void_p]
+
+        self._display = x11.XOpenDisplay(display.encode())
+        if not self._display:
+            raise RuntimeError(f"Could not open display {display}")
+        root = x11.XDefaultRootWindow(self._display)
+        self._window = x11.XCreateSimpleWindow(self._display, root, 0, 0, 1, 1, 0, 0, 0)
+        self._atoms = {
+            name: x11.XInternAtom(self._display, name.encode(), 0)
+            for name in (
+                "CLIPBOARD",
+                "TARGETS",
+                "UTF8_STRING",
+                "STRING",
+                "TEXT",
+                "text/plain",
+                "text/plain;charset=utf-8",
+            )
+        }
+        # Property changes are sent in a single request, leave room for its header
+        max_request = x11.XExtendedMaxRequestSize(self._display) or x11.XMaxRequestSize(
+            self._display
+        )
+        self.max_size = max_request * 4 - 1024
+        # The server assigns ids outside of the mask to each client, so ids with the
+        # same bits outside of it belong to the windows of the same application
+        self._resource_mask = XDisplay.from_address(self._display).resource_mask
+
+        self._text = b""
+        self._client = None
+        self._offers: "queue.Queue[tuple]" = queue.Queue()
+        self._served = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+        self.start()
+
+    def offer(self, text: bytes, window: int) -> threading.Event:
+        """
+        Take ownership of the clipboard with the text.
+
+        :param window: Window of the application the text is meant for, 0 if it's not known.
+        :return: An event that is set once the application received the text, or any application
+            if the window isn't known.
+        """
+        if len(text) > self.max_size:
+            raise ValueError(
+                f"Text of {len(text)} bytes is larger than the clipboard limit of {self.max_size} bytes"
+            )
+        client = window & ~self._resource_mask if window else None
+        owned, served = threading.Event(), threading.Event()
+        self._offers.put((text, client, owned, served))
+        os.write(self._wake_write, b"x")
+        if not owned.wait(PASTE_TIMEOUT):
+            raise RuntimeError("Could not take ownership of the clipboard")
+        return served
+
+    def run(self) -> None:
+        fd = self._x11.XConnectionNumber(self._display)
+        event = XEvent()
+        while True:
+            if not self._x11.XPending(self._display):
+                readable, _, _ = select.select([fd, self._wake_read], [], [])
+                if self._wake_read in readable:
+                    os.read(self._wake_read, 64)
+            while not self._offers.empty():
+                self._text, self._client, owned, self._served = self._offers.get()
+                clipboard = self._atoms["CLIPBOARD"]
+                self._x11.XSetSelectionOwner(self._display, clipboard, self._window, 0)
+                if (
+                    self._x11.XGetSelectionOwner(self._display, clipboard)
+                    == self._window
+                ):
+                    owned.set()
+            while self._x11.XPending(self._display):
+                self._x11.XNextEvent(self._display, ctypes.byref(event))
+                if event.type == SELECTION_REQUEST:
+                    self._reply(event.xselectionrequest)
+            self._x11.XFlush(self._display)
+
+    def _reply(self, request: XSelectionRequestEvent) -> None:
+        atoms = self._atoms
+        # Obsolete clients don't name a property, the target is used instead
+        prop = request.property or request.target
+        if request.target == atoms["TARGETS"]:
+            targets = [
+                atoms[name]
+                for name in (
+                    "TARGETS",
+                    "UTF8_STRING",
+                    "text/plain;charset=utf-8",
+                    "STRING",
+                    "TEXT",
+                )
+            ]
+            data = (Atom * len(targets))(*targets)
+            self._x11.XChangeProperty(
+                self._display,
+                request.requestor,
+                prop,
+                XA_ATOM,
+                32,
+                PROP_MODE_REPLACE,
+                data,
+                len(targets),
+            )
+        elif request.target in (
+            atoms["UTF8_STRING"],
+            atoms["text/plain;charset=utf-8"],
+            atoms["STRING"],
+            atoms["TEXT"],
+            atoms["text/plain"],
+        ):
+            target = (
+                atoms["UTF8_STRING"]
+                if request.target == atoms["TEXT"]
+                else request.target
+            )
+            text = self._text
+            if target in (atoms["STRING"], atoms["text/plain"]):
+                # Latin-1 targets, characters outside of it can't be represented
+                text = text.decode().encode("latin-1", "replace")
+            self._x11.XChangeProperty(
+                self._display,
+                request.requestor,
+                prop,
+                target,
+                8,
+                PROP_MODE_REPLACE,
+                text,
+                len(text),
+            )
+        else:
+            prop = 0
+
+        reply = XEvent()
+        reply.xselection.type = SELECTION_NOTIFY
+        reply.xselection.requestor = request.requestor
+        reply.xselection.selection = request.selection
+        reply.xselection.target = request.target
+        reply.xselection.property = prop
+        reply.xselection.time = request.time
+        self._x11.XSendEvent(
+            self._display, request.requestor, 0, 0, ctypes.byref(reply)
+        )
+        if prop and request.target != atoms["TARGETS"]:
+            # Only once the reply is out, the process may exit after a paste
+            self._x11.XFlush(self._display)
+            if (
+                self._client is None
+                or request.requestor & ~self._resource_mask == self._client
+            ):
+                self._served.set()
+
+
+class X11Input:
+    def __init__(self, display: str) -> None:
+        self._x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+        self._xtst = ctypes.CDLL(ctypes.util.find_library("Xtst") or "libXtst.so.6")
+
+        self._x11.XOpenDisplay.restype = ctypes.c_void_p
+        self._x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._x11.XStringToKeysym.restype = ctypes.c_ulong
+        self._x11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        self._x11.XKeysymToKeycode.restype = ctypes.c_ubyte
+        self._x11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        self._x11.XGetKeyboardMapping.restype = ctypes.POINTER(ctypes.c_ulong)
+        self._x11.XGetKeyboardMapping.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ubyte,
+            ctypes.c_int,
+            ctypes.POINTER(ctypes.c_int),
+        ]
+        self._x11.XChangeKeyboardMapping.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.POINTER(ctypes.c_ulong),
+            ctypes.c_int,
+        ]
+        self._x11.XDisplayKeycodes.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+        ]
+        self._x11.XFree.argtypes = [ctypes.c_void_p]
+        self._x11.XGetInputFocus.argtypes = [
+            ctypes.c_void_p,
+            ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_int),
+        ]
+        self._x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._x11.XQueryPointer.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ulong,
+            ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_uint),
+        ]
+        self._xtst.XTestFakeMotionEvent.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+        self._xtst.XTestFakeButtonEvent.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_uint,
+            ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+        self._xtst.XTestFakeKeyEvent.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_uint,
+            ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+
+        self._display_name = display
+        self._display = self._x11.XOpenDisplay(display.encode())
+        if not self._display:
+            raise RuntimeError(f"Could not open display {display}")
+        self._clipboard = None
+        self._root = self._x11.XDefaultRootWindow(self._display)
+
+        min_keycode, max_keycode = ctypes.c_int(), ctypes.c_int()
+        self._x11.XDisplayKeycodes(
+            self._display, ctypes.byref(min_keycode), ctypes.byref(max_keycode)
+        )
+        self._scratch_keycode = self._find_scratch_keycode(
+            min_keycode.value, max_keycode.value
+        )
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        self._x11.XSync(self._display, 0)
+
+    def _keysyms_for_keycode(self, keycode: int) -> list:
+        per_keycode = ctypes.c_int()
+        keysyms = self._x11.XGetKeyboardMapping(
+            self._display, keycode, 1, ctypes.byref(per_keycode)
+        )
+        if not keysyms:
+            return []
+        try:
+            return [keysyms[i] for i in range(per_keycode.value)]
+        finally:
+            self._x11.XFree(keysyms)
+
+    def _find_scratch_keycode(self, min_keycode: int, max_keycode: int) -> int:
+        # Use an unmapped keycode for symbols that are not on the keyboard,
+        # the same way xdotool does.
+        for keycode in range(max_keycode, min_keycode - 1, -1):
+            if all(k == NO_SYMBOL for k in self._keysyms_for_keycode(keycode)):
+                return keycode
+        return max_keycode
+
+    def _remap_scratch(self, keysym: int) -> None:
+        keysyms = (ctypes.c_ulong * 2)(keysym, keysym)
+        self._x11.XChangeKeyboardMapping(
+            self._display, self._scratch_keycode, 2, keysyms, 1
+        )
+        self._sync()
+
+    def _press_keysym(self, keysym: int, delay: float = 0) -> None:
+        keycode = self._x11.XKeysymToKeycode(self._display, keysym)
+        remapped = keycode == 0
+        if remapped:
+            keycode = self._scratch_keycode
+            self._remap_scratch(keysym)
+
+        keysyms = self._keysyms_for_keycode(keycode)
+        needs_shift = (
+            not remapped
+            and len(keysyms) > 1
+            and keysyms[0] != keysym
+            and keysyms[1] == keysym
+        )
+        shift_keycode = self._x11.XKeysymToKeycode(self._display, SHIFT_KEYSYM)
+
+        if needs_shift:
+            self._xtst.XTestFakeKeyEvent(self._display, shift_keycode, 1, 0)
+        self._xtst.XTestFakeKeyEvent(self._display, keycode, 1, 0)
+        self._xtst.XTestFakeKeyEvent(self._display, keycode, 0, 0)
+        if needs_shift:
+            self._xtst.XTestFakeKeyEvent(self._display, shift_keycode, 0, 0)
+        self._sync()
+
+        if remapped:
+            # Give clients a moment to pick up the mapping before it changes again
+            time.sleep(max(delay, 0.01))
+            self._remap_scratch(NO_SYMBOL)
+
+    @staticmethod
+    def _char_keysym(char: str) -> int:
+        if char in SPECIAL_CHAR_KEYSYMS:
+            return SPECIAL_CHAR_KEYSYMS[char]
+        codepoint = ord(char)
+        if 0x20 <= codepoint <= 0x7E or 0xA0 <= codepoint <= 0xFF:
+            return codepoint
+        return 0x01000000 | codepoint
+
+    def move(self, x: int, y: int) -> None:
+        self._xtst.XTestFakeMotionEvent(self._display, -1, int(x), int(y), 0)
+        self._sync()
+
+    def button(self, button: int, pressed: bool) -> None:
+        self._xtst.XTestFakeButtonEvent(self._display, int(button), int(pressed), 0)
+        self._sync()
+
+    def click(self, button: int, repeat: int = 1, delay_in_ms: int = 100) -> None:
+        for i in range(int(repeat)):
+            if i:
+                time.sleep(delay_in_ms / 1000)
+            self.button(button, True)
+            self.button(button, False)
+
+    def key(self, combination: str) -> None:
+        keycodes = []
+        for name in combination.split("+"):
+            keysym = self._x11.XStringToKeysym(name.encode())
+            if keysym == NO_SYMBOL and len(name) == 1:
+                keysym = self._char_keysym(name)
+            if keysym == NO_SYMBOL:
+                raise ValueError(f"Unknown key: {name}")
+            keycode = self._x11.XKeysymToKeycode(self._display, keysym)
+            if keycode == 0:
+                if len(keycodes) == 0 and "+" not in combination:
+                    self._press_keysym(keysym)
+                    return
+                raise ValueError(f"Key is not mapped on the keyboard: {name}")
+            keycodes.append(keycode)
+
+        for keycode in keycodes:
+            self._xtst.XTestFakeKeyEvent(self._display, keycode, 1, 0)
+        for keycode in reversed(keycodes):
+            self._xtst.XTestFakeKeyEvent(self._display, keycode, 0, 0)
+        self._sync()
+
+    def type(self, text: str, delay_in_ms: int = 12) -> None:
+        delay = delay_in_ms / 1000
+        for char in text:
+            self._press_keysym(self._char_keysym(char), delay)
+            if delay:
+                time.sleep(delay)
+
+    def paste(self, text: str, key: str = "ctrl+v") -> None:
+        if self._clipboard is None:
+            self._clipboard = Clipboard(self._x11, self._display_name)
+        served = self._clipboard.offer(text.encode(), self._focused_window())
+        self.key(key)
+        # The application asks for the text after it handled the key press,
+        # wait for it so the next operations happen after the paste
+        if not served.wait(PASTE_TIMEOUT):
+            raise RuntimeError(f"No application asked for the clipboard after {key}")
+
+    def _focused_window(self) -> int:
+        """
+        The window with the keyboard focus, 0 if no application has it.
+        """
+        focus, revert_to = ctypes.c_ulong(), ctypes.c_int()
+        self._x11.XGetInputFocus(
+            self._display, ctypes.byref(focus), ctypes.byref(revert_to)
+        )
+        # None and PointerRoot aren't windows, the root window belongs to no application
+        if focus.value in (0, 1) or focus.value == self._root:
+            return 0
+        return focus.value
+
+    def location(self) -> list:
+        root, child = ctypes.c_ulong(), ctypes.c_ulong()
+        root_x, root_y = ctypes.c_int(), ctypes.c_int()
+        win_x, win_y = ctypes.c_int(), ctypes.c_int()
+        mask = ctypes.c_uint()
+        self._x11.XQueryPointer(
+            self._display,
+            self._root,
+            ctypes.byref(root),
+            ctypes.byref(child),
+            ctypes.byref(root_x),
+            ctypes.byref(root_y),
+            ctypes.byref(win_x),
+            ctypes.byref(win_y),
+            ctypes.byref(mask),
+        )
+        return [root_x.value, root_y.value]
+
+    def execute(self, op: list):
+        name, args = op[0], op[1:]
+        with self._lock:
+            if name == "move":
+                return self.move(*args)
+            if name == "down":
+                return self.button(args[0], True)
+            if name == "up":
+                return self.button(args[0], False)
+            if name == "click":
+                return self.click(*args)
+            if name == "key":
+                return self.key(*args)
+            if name == "type":
+                return self.type(*args)
+            if name == "paste":
+                return self.paste(*args)
+            if name == "location":
+                return self.location()
+        if name == "sleep":
+            return time.sleep(args[0] / 1000)
+        raise ValueError(f"Unknown operation: {name}")
+
+
+def run_ops(x11: X11Input, ops: list) -> dict:
+    results, timings = [], []
+    try:
+        for op in ops:
+            start = time.perf_counter()
+            results.append(x11.execute(op))
+            timings.append((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        return {
+            "error": f"{type(e).__name__}: {e}",
+            "results": results,
+            "timings": timings,
+        }
+    return {"results": results, "timings": timings}
+
+
+def make_handler(x11: X11Input, token: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._reply(200, {"ok": True})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if self.headers.get("X-Access-Token") != token:
+                self._reply(
+                    401, {"error": "Unauthorized", "results": [], "timings": []}
+                )
+                return
+
+            payload = run_ops(x11, json.loads(body))
+            self._reply(400 if "error" in payload else 200, payload)
+
+    return Handler
+
+
+def main() -> None:
+    x11 = X11Input(os.environ.get("DISPLAY", ":0"))
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--batch":
+        batch = sys.argv[2]
+        if batch.startswith("@"):
+            with open(batch[1:]) as f:
+                batch = f.read()
+            os.remove(f.name)
+        print(json.dumps(run_ops(x11, json.loads(batch)), separators=(",", ":")))
+        return
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6100
+    server = ThreadingHTTPServer(
+        ("0.0.0.0", port), make_handler(x11, os.environ["E2B_INPUT_TOKEN"])
+    )
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Find a needle image on the screen inside the desktop sandbox.
+
+Usage: python3 locate.py <needle-path> <needle-width> <needle-height> <confidence> <limit> <grayscale> <x> <y> <width> <height> -- <ffmpeg command>
+
+The needle is raw RGB, uploaded once per sandbox. The ffmpeg command captures a
+single raw RGB frame of the display, or of the region of it at x, y. A width
+and height of 0 stand for the whole screen.
+
+Every position of the frame is scored by the normalized cross-correlation with
+the needle, from -1 to 1, computed with FFTs so a search takes one pass over
+the frame whatever the needle's size. The best positions with at least the
+given confidence are printed as JSON, in screen coordinates. Positions that
+overlap a better match are left out.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Weights of the RGB channels in the luminance of a pixel
+LUMINANCE = np.array([0.299, 0.587, 0.114])
+
+
+def screen_size(display: str) -> tuple:
+    output = subprocess.run(
+        ["xdpyinfo", "-display", display], capture_output=True, text=True, check=True
+    ).stdout
+    for line in output.splitlines():
+        if "dimensions:" in line:
+            width, height = line.split()[1].split("x")
+            return int(width), int(height)
+    raise RuntimeError("Could not determine the screen size")
+
+
+def prepare(image: np.ndarray, grayscale: bool) -> np.ndarray:
+    if grayscale:
+        return (image @ LUMINANCE)[..., np.newaxis]
+    return image.astype(np.float64)
+
+
+def window_sums(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """
+    Sum of every `height` x `width` window of the image, over all channels.
+    """
+    sums = np.pad(image.sum(axis=2).cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    return (
+        sums[height:, width:]
+        - sums[:-height, width:]
+        - sums[height:, :-width]
+        + sums[:-height, :-width]
+    )
+
+
+def match_scores(haystack: np.ndarray, needle: np.ndarray) -> np.ndarray:
+    """
+    Normalized cross-correlation of the needle at every position of the haystack.
+
+    :return: Scores from -1 to 1 with one row per y and one column per x the needle fits at.
+    """
+    rows, cols, _ = haystack.shape
+    height, width, _ = needle.shape
+    if height > rows or width > cols:
+        return np.empty((0, 0))
+    count = needle.size
+
+    centered = needle - needle.mean()
+    # The needle's sum being 0 cancels the window's mean. The channels are summed
+    # up before the inverse transform, which is linear, so it runs only once.
+    spectrum = (
+        np.fft.rfft2(haystack, axes=(0, 1))
+        * np.conj(np.fft.rfft2(centered, s=(rows, cols), axes=(0, 1)))
+    ).sum(axis=2)
+    correlation = np.fft.irfft2(spectrum, s=(rows, cols))[
+        : rows - height + 1, : cols - width + 1
+    ]
+
+    sums = window_sums(haystack, height, width)
+    deviations = window_sums(haystack * haystack, height, width) - sums * sums / count
+    # Windows whose pixels vary by less than a tenth of a level count as flat
+    flat = deviations < count * 0.01
+    needle_deviation = (centered * centered).sum()
+    if needle_deviation < count * 0.01:
+        # A flat needle only matches flat windows of the same color
+        return np.where(flat & (np.abs(sums / count - needle.mean()) < 1), 1.0, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = correlation / np.sqrt(deviations * needle_deviation)
+    return np.clip(np.where(flat, 0.0, scores), -1, 1)
+
+
+def best_matches(
+    scores: np.ndarray, width: int, height: int, confidence: float, limit: int
+) -> list:
+    """
+    The best positions with at least the given score, leaving out those that overlap a better one.
+    """
+    scores = scores.copy()
+    matches = []
+    while scores.size and len(matches) < limit:
+        y, x = np.unravel_index(np.argmax(scores), scores.shape)
+        score = scores[y, x]
+        if score < confidence:
+            break
+        matches.append((int(x), int(y), float(score)))
+        scores[
+            max(y - height + 1, 0) : y + height, max(x - width + 1, 0) : x + width
+        ] = -np.inf
+    return matches
+
+
+def main() -> None:
+    separator = sys.argv.index("--")
+    (
+        needle_path,
+        needle_width,
+        needle_height,
+        confidence,
+        limit,
+        grayscale,
+        x,
+        y,
+        width,
+        height,
+    ) = sys.argv[1:separator]
+    command = sys.argv[separator + 1 :]
+    needle_width, needle_height = int(needle_width), int(needle_height)
+    x, y, width, height = int(x), int(y), int(width), int(height)
+    if not width or not height:
+        width, height = screen_size(os.environ.get("DISPLAY", ":0"))
+
+    start = time.monotonic()
+    data = subprocess.run(command, stdout=subprocess.PIPE).stdout
+    if len(data) < width * height * 3:
+        print(json.dumps({"error": "The screen capture failed"}))
+        sys.exit(1)
+    captured = time.monotonic()
+
+    frame = np.frombuffer(data[: width * height * 3], dtype=np.uint8)
+    needle = np.fromfile(needle_path, dtype=np.uint8)
+    scores = match_scores(
+        prepare(frame.reshape(height, width, 3), grayscale == "1"),
+        prepare(needle.reshape(needle_height, needle_width, 3), grayscale == "1"),
+    )
+    matches = best_matches(
+        scores, needle_width, needle_height, float(confidence), int(limit)
+    )
+
+    print(
+        json.dumps(
+            {
+                "matches": [
+                    {
+                        "x": match_x + x,
+                        "y": match_y + y,
+                        "width": needle_width,
+                        "height": needle_height,
+                        "score": score,
+                    }
+                    for match_x, match_y, score in matches
+                ],
+                "capture_ms": (captured - start) * 1000,
+                "match_ms": (time.monotonic() - captured) * 1000,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Read the text on the screen inside the desktop sandbox with tesseract.
+
+Usage: python3 ocr.py <scale> <language> <x> <y> <width> <height> -- <ffmpeg command>
+
+The ffmpeg command captures a single raw RGB frame of the display, or of the
+region of it at x, y. A width and height of 0 stand for the whole screen. The
+frame is enlarged by `scale` before it's recognized, screen fonts are too
+small for tesseract otherwise.
+
+The recognized lines and words are cached in shared memory by the hash of the
+frame, so an unchanged screen is only captured, not recognized again. The
+result is printed as JSON, with the boxes in screen coordinates.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+CACHE_DIR = "/dev/shm/e2b_desktop" if os.path.isdir("/dev/shm") else "/tmp/e2b_desktop"
+# Number of recognized frames kept in the cache
+CACHE_SIZE = 64
+
+
+def screen_size(display: str) -> tuple:
+    output = subprocess.run(
+        ["xdpyinfo", "-display", display], capture_output=True, text=True, check=True
+    ).stdout
+    for line in output.splitlines():
+        if "dimensions:" in line:
+            width, height = line.split()[1].split("x")
+            return int(width), int(height)
+    raise RuntimeError("Could not determine the screen size")
+
+
+def parse_tsv(tsv: str, scale: int) -> list:
+    """
+    Group the words of tesseract's TSV output into lines, with boxes in frame coordinates.
+    """
+    lines = {}
+    for row in tsv.splitlines()[1:]:
+        fields = row.split("\t")
+        # Only words (level 5) that were recognized
+        if len(fields) < 12 or fields[0] != "5" or not fields[11].strip():
+            continue
+        if float(fields[10]) < 0:
+            continue
+        left, top, width, height = (int(value) for value in fields[6:10])
+        word = {
+            "text": fields[11].strip(),
+            "x": round(left / scale),
+            "y": round(top / scale),
+            "width": round(width / scale),
+            "height": round(height / scale),
+            "confidence": float(fields[10]) / 100,
+        }
+        # Words with the same page, block, paragraph and line number
+        lines.setdefault(tuple(fields[1:5]), []).append(word)
+
+    result = []
+    for words in lines.values():
+        x = min(word["x"] for word in words)
+        y = min(word["y"] for word in words)
+        result.append(
+            {
+                "text": " ".join(word["text"] for word in words),
+                "x": x,
+                "y": y,
+                "width": max(word["x"] + word["width"] for word in words) - x,
+                "height": max(word["y"] + word["height"] for word in words) - y,
+                "confidence": sum(word["confidence"] for word in words) / len(words),
+                "words": words,
+            }
+        )
+    return result
+
+
+def recognize(frame: np.ndarray, scale: int, language: str) -> list:
+    if scale > 1:
+        frame = frame.repeat(scale, axis=0).repeat(scale, axis=1)
+    height, width, _ = frame.shape
+    # Tesseract reads binary PPM from stdin, so the frame doesn't need to be encoded
+    image = f"P6\n{width} {height}\n255\n".encode() + frame.tobytes()
+    tsv = subprocess.run(
+        # Sparse text: find as much text as possible, in no particular layout
+        ["tesseract", "stdin", "stdout", "-l", language, "--psm", "11", "tsv"],
+        input=image,
+        capture_output=True,
+        check=True,
+    ).stdout.decode()
+    return parse_tsv(tsv, scale)
+
+
+def prune_cache() -> None:
+    entries = sorted(
+        (entry for entry in os.scandir(CACHE_DIR) if entry.name.startswith("ocr-")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in entries[:-CACHE_SIZE]:
+        os.remove(entry.path)
+
+
+def offset(box: dict, x: int, y: int) -> dict:
+    return {**box, "x": box["x"] + x, "y": box["y"] + y}
+
+
+def main() -> None:
+    separator = sys.argv.index("--")
+    scale, language, x, y, width, height = sys.argv[1:separator]
+    command = sys.argv[separator + 1 :]
+    scale, x, y = int(scale), int(x), int(y)
+    width, height = int(width), int(height)
+    if not width or not height:
+        width, height = screen_size(os.environ.get("DISPLAY", ":0"))
+
+    start = time.monotonic()
+    data = subprocess.run(command, stdout=subprocess.PIPE).stdout
+    if len(data) < width * height * 3:
+        print(json.dumps({"error": "The screen capture failed"}))
+        sys.exit(1)
+    data = data[: width * height * 3]
+
+    digest = hashlib.blake2b(
+        f"{width}x{height} {scale} {language}\n".encode() + data, digest_size=16
+    ).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"ocr-{digest}.json")
+    cached = os.path.exists(cache_path)
+    if cached:
+        with open(cache_path) as f:
+            lines = json.load(f)
+    else:
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+        try:
+            lines = recognize(frame, scale, language)
+        except FileNotFoundError:
+            print(json.dumps({"error": "tesseract is not installed in the template"}))
+            sys.exit(1)
+        except subprocess.CalledProcessError as e:
+            print(json.dumps({"error": e.stderr.decode().strip()}))
+            sys.exit(1)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(lines, f)
+        prune_cache()
+
+    # The cache is in frame coordinates, the same pixels may be at another position next time
+    print(
+        json.dumps(
+            {
+                "lines": [
+                    {
+                        **offset(line, x, y),
+                        "words": [offset(word, x, y) for word in line["words"]],
+                    }
+                    for line in lines
+                ],
+                "hash": digest,
+                "cached": cached,
+                "elapsed_ms": (time.monotonic() - start) * 1000,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Wait inside the desktop sandbox until the screen changes or stops changing.
+
+Usage: python3 screen_wait.py <change|stable> <timeout> <quiet-ms> <min-pixels> <since-hash> <x> <y> <width> <height> -- <ffmpeg command>
+
+The ffmpeg command captures the display, or the region of it at x, y, as raw
+RGB frames at a fixed rate. A width and height of 0 stand for the whole
+screen. Every frame is compared with the previous one, and a change counts
+once at least `min-pixels` pixels differ.
+
+- `change` returns as soon as a frame differs from the first one, or from the
+  frame with `since-hash` if it's still cached.
+- `stable` returns once no frame changed for `quiet-ms` milliseconds.
+
+The last frame of each region of each display is kept in shared memory, so the
+next wait on the region can start from it with its hash and doesn't miss
+changes that happen before its first frame.
+The result is printed as JSON, with the bounding box of all changes in screen
+coordinates.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+CACHE_DIR = "/dev/shm/e2b_desktop" if os.path.isdir("/dev/shm") else "/tmp/e2b_desktop"
+
+
+def screen_size(display: str) -> tuple:
+    output = subprocess.run(
+        ["xdpyinfo", "-display", display], capture_output=True, text=True, check=True
+    ).stdout
+    for line in output.splitlines():
+        if "dimensions:" in line:
+            width, height = line.split()[1].split("x")
+            return int(width), int(height)
+    raise RuntimeError("Could not determine the screen size")
+
+
+def display_number(display: str) -> str:
+    return display.split(":", 1)[1].split(".", 1)[0]
+
+
+def frame_hash(frame: np.ndarray) -> str:
+    return hashlib.blake2b(frame.tobytes(), digest_size=16).hexdigest()
+
+
+def cached_frame(cache_path: str, since: str):
+    """
+    The frame the previous wait on the same region ended with, if it has the given hash.
+    """
+    if since == "-":
+        return None
+    try:
+        with open(cache_path + ".hash") as f:
+            if f.read().strip() != since:
+                return None
+        frame = np.load(cache_path)
+    except (OSError, ValueError):
+        return None
+    # The frame is replaced after the hash, so it may already be a newer one
+    return frame if frame_hash(frame) == since else None
+
+
+def write_atomic(path: str, write) -> None:
+    # Another wait on the same region may read the file at the same time
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        write(f)
+    os.replace(temp_path, path)
+
+
+def cache_frame(cache_path: str, frame: np.ndarray, digest: str) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    write_atomic(cache_path, lambda f: np.save(f, frame))
+    write_atomic(cache_path + ".hash", lambda f: f.write(digest.encode()))
+
+
+def changed_box(previous: np.ndarray, current: np.ndarray, min_pixels: int):
+    """
+    Bounding box `(x0, y0, x1, y1)` of the pixels that differ, `None` if fewer than `min_pixels` differ.
+    """
+    changed = np.any(previous != current, axis=2)
+    if np.count_nonzero(changed) < min_pixels:
+        return None
+    rows = np.flatnonzero(changed.any(axis=1))
+    cols = np.flatnonzero(changed.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def union(box, other):
+    if box is None:
+        return other
+    return (
+        min(box[0], other[0]),
+        min(box[1], other[1]),
+        max(box[2], other[2]),
+        max(box[3], other[3]),
+    )
+
+
+def main() -> None:
+    separator = sys.argv.index("--")
+    mode, timeout, quiet_ms, min_pixels, since, x, y, width, height = sys.argv[
+        1:separator
+    ]
+    command = sys.argv[separator + 1 :]
+    timeout, quiet = float(timeout), float(quiet_ms) / 1000
+    min_pixels, x, y = max(int(min_pixels), 1), int(x), int(y)
+    width, height = int(width), int(height)
+    display = os.environ.get("DISPLAY", ":0")
+    if not width or not height:
+        width, height = screen_size(display)
+    shape = (height, width, 3)
+    cache_path = os.path.join(
+        CACHE_DIR, f"wait-{display_number(display)}-{x}-{y}-{width}x{height}.npy"
+    )
+
+    start = time.monotonic()
+    ffmpeg = subprocess.Popen(command, stdout=subprocess.PIPE)
+    done, box, frame = False, None, None
+    try:
+        previous = cached_frame(cache_path, since)
+        last_change = start
+        while True:
+            data = ffmpeg.stdout.read(width * height * 3)
+            if len(data) < width * height * 3:
+                print(json.dumps({"error": "The screen capture exited"}))
+                sys.exit(1)
+            now = time.monotonic()
+            frame = np.frombuffer(data, dtype=np.uint8).reshape(shape)
+
+            if previous is None:
+                # Without a cached frame, changes count from the first one
+                previous = frame
+            elif (changed := changed_box(previous, frame, min_pixels)) is not None:
+                box = union(box, changed)
+                last_change = now
+                if mode == "change":
+                    done = True
+                else:
+                    previous = frame
+            elif mode == "stable" and now - last_change >= quiet:
+                done = True
+
+            if done or now - start >= timeout:
+                break
+    finally:
+        ffmpeg.kill()
+        ffmpeg.wait()
+
+    digest = frame_hash(frame)
+    cache_frame(cache_path, frame, digest)
+    print(
+        json.dumps(
+            {
+                "done": done,
+                "box": [box[0] + x, box[1] + y, box[2] - box[0], box[3] - box[1]]
+                if box
+                else None,
+                "elapsed_ms": (time.monotonic() - start) * 1000,
+                "hash": digest,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
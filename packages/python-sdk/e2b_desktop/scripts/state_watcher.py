@@ -0,0 +1,382 @@
+"""
+Stream changes of the desktop state to the client.
+
+Usage: python3 state_watcher.py <tick-ms> <heartbeat-ms>
+
+Holds a single connection to the X display and prints a JSON line whenever the
+state changes: `screen` ([width, height]), `pointer` ([x, y]), `focus` (the
+input focus window) and `windows` ([id, instance, class, title, visible] of
+every window with a class or title, in stacking order). The first line holds
+the whole state, later lines only the changed fields. An empty object is
+printed as a heartbeat if nothing changed for `heartbeat-ms`.
+
+Window changes (map, unmap, create, destroy, reparent, title and class changes)
+and screen changes (RandR resizes of the root window) are received as X events.
+The pointer and the input focus don't have events without extensions, so they
+are sampled every `tick-ms`, which costs two requests on the local connection.
+
+This file is uploaded to the sandbox by the SDK and only depends on the
+Python standard library and libX11, which the desktop template ships.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import sys
+import time
+
+Window = ctypes.c_ulong
+Atom = ctypes.c_ulong
+
+CREATE_NOTIFY = 16
+DESTROY_NOTIFY = 17
+UNMAP_NOTIFY = 18
+MAP_NOTIFY = 19
+REPARENT_NOTIFY = 21
+CONFIGURE_NOTIFY = 22
+PROPERTY_NOTIFY = 28
+
+STRUCTURE_NOTIFY_MASK = 1 << 17
+SUBSTRUCTURE_NOTIFY_MASK = 1 << 19
+PROPERTY_CHANGE_MASK = 1 << 22
+
+IS_VIEWABLE = 2
+
+
+class XAnyEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("window", Window),
+    ]
+
+
+class XConfigureEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("event", Window),
+        ("window", Window),
+    ]
+
+
+class XPropertyEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("window", Window),
+        ("atom", Atom),
+    ]
+
+
+class XEvent(ctypes.Union):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("xany", XAnyEvent),
+        ("xconfigure", XConfigureEvent),
+        ("xproperty", XPropertyEvent),
+        ("pad", ctypes.c_long * 24),
+    ]
+
+
+class XWindowAttributes(ctypes.Structure):
+    _fields_ = [
+        ("x", ctypes.c_int),
+        ("y", ctypes.c_int),
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("border_width", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("visual", ctypes.c_void_p),
+        ("root", Window),
+        ("class", ctypes.c_int),
+        ("bit_gravity", ctypes.c_int),
+        ("win_gravity", ctypes.c_int),
+        ("backing_store", ctypes.c_int),
+        ("backing_planes", ctypes.c_ulong),
+        ("backing_pixel", ctypes.c_ulong),
+        ("save_under", ctypes.c_int),
+        ("colormap", ctypes.c_ulong),
+        ("map_installed", ctypes.c_int),
+        ("map_state", ctypes.c_int),
+        ("all_event_masks", ctypes.c_long),
+        ("your_event_mask", ctypes.c_long),
+        ("do_not_propagate_mask", ctypes.c_long),
+        ("override_redirect", ctypes.c_int),
+        ("screen", ctypes.c_void_p),
+    ]
+
+
+class XClassHint(ctypes.Structure):
+    _fields_ = [("res_name", ctypes.c_void_p), ("res_class", ctypes.c_void_p)]
+
+
+ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+class X11State:
+    def __init__(self) -> None:
+        xlib = ctypes.cdll.LoadLibrary(ctypes.util.find_library("X11") or "libX11.so.6")
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = Window
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XInternAtom.restype = Atom
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XSelectInput.argtypes = [ctypes.c_void_p, Window, ctypes.c_long]
+        xlib.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        xlib.XPending.argtypes = [ctypes.c_void_p]
+        xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(XEvent)]
+        xlib.XQueryPointer.argtypes = [ctypes.c_void_p, Window] + [ctypes.c_void_p] * 7
+        xlib.XGetInputFocus.argtypes = [ctypes.c_void_p] + [ctypes.c_void_p] * 2
+        xlib.XQueryTree.argtypes = [ctypes.c_void_p, Window] + [ctypes.c_void_p] * 4
+        xlib.XGetWindowAttributes.argtypes = [
+            ctypes.c_void_p,
+            Window,
+            ctypes.POINTER(XWindowAttributes),
+        ]
+        xlib.XGetClassHint.argtypes = [
+            ctypes.c_void_p,
+            Window,
+            ctypes.POINTER(XClassHint),
+        ]
+        xlib.XGetWindowProperty.argtypes = [
+            ctypes.c_void_p,
+            Window,
+            Atom,
+            ctypes.c_long,
+            ctypes.c_long,
+            ctypes.c_int,
+            Atom,
+        ] + [ctypes.c_void_p] * 5
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xlib.XSetErrorHandler.argtypes = [ERROR_HANDLER]
+
+        # Windows can disappear at any time, so errors about them are expected
+        self._error_handler = ERROR_HANDLER(lambda display, event: 0)
+        xlib.XSetErrorHandler(self._error_handler)
+
+        self._xlib = xlib
+        self._display = xlib.XOpenDisplay(None)
+        if not self._display:
+            raise RuntimeError(f"Cannot open display {os.environ.get('DISPLAY')}")
+        self.root = xlib.XDefaultRootWindow(self._display)
+        self.fd = xlib.XConnectionNumber(self._display)
+
+        self._net_wm_name = xlib.XInternAtom(self._display, b"_NET_WM_NAME", 0)
+        self._wm_name = xlib.XInternAtom(self._display, b"WM_NAME", 0)
+        # Properties whose changes are reported in the window list
+        self._window_atoms = {
+            self._net_wm_name,
+            self._wm_name,
+            xlib.XInternAtom(self._display, b"WM_CLASS", 0),
+        }
+        self._selected = set()
+        self._select(self.root, STRUCTURE_NOTIFY_MASK)
+
+    def _select(self, window: int, extra_mask: int = 0) -> None:
+        self._xlib.XSelectInput(
+            self._display,
+            window,
+            SUBSTRUCTURE_NOTIFY_MASK | PROPERTY_CHANGE_MASK | extra_mask,
+        )
+        self._selected.add(window)
+
+    def pending_events(self):
+        """
+        Read the queued events and tell which parts of the state they change.
+
+        :return: A tuple with whether the windows and whether the screen changed.
+        """
+        windows, screen = False, False
+        event = XEvent()
+        while self._xlib.XPending(self._display):
+            self._xlib.XNextEvent(self._display, ctypes.byref(event))
+            if event.type == CONFIGURE_NOTIFY:
+                # Only the root window's size matters, windows' moves are frequent during drags
+                screen = screen or event.xconfigure.window == self.root
+            elif event.type == PROPERTY_NOTIFY:
+                windows = windows or event.xproperty.atom in self._window_atoms
+            elif event.type in (
+                CREATE_NOTIFY,
+                DESTROY_NOTIFY,
+                UNMAP_NOTIFY,
+                MAP_NOTIFY,
+                REPARENT_NOTIFY,
+            ):
+                windows = True
+        return windows, screen
+
+    def pointer(self):
+        root, child = Window(), Window()
+        x, y, win_x, win_y = (ctypes.c_int() for _ in range(4))
+        mask = ctypes.c_uint()
+        self._xlib.XQueryPointer(
+            self._display,
+            self.root,
+            ctypes.byref(root),
+            ctypes.byref(child),
+            ctypes.byref(x),
+            ctypes.byref(y),
+            ctypes.byref(win_x),
+            ctypes.byref(win_y),
+            ctypes.byref(mask),
+        )
+        return [x.value, y.value]
+
+    def focus(self) -> int:
+        window, revert_to = Window(), ctypes.c_int()
+        self._xlib.XGetInputFocus(
+            self._display, ctypes.byref(window), ctypes.byref(revert_to)
+        )
+        return window.value
+
+    def screen(self):
+        attributes = XWindowAttributes()
+        self._xlib.XGetWindowAttributes(
+            self._display, self.root, ctypes.byref(attributes)
+        )
+        return [attributes.width, attributes.height]
+
+    def _children(self, window: int):
+        root, parent = Window(), Window()
+        children = ctypes.POINTER(Window)()
+        count = ctypes.c_uint()
+        if not self._xlib.XQueryTree(
+            self._display,
+            window,
+            ctypes.byref(root),
+            ctypes.byref(parent),
+            ctypes.byref(children),
+            ctypes.byref(count),
+        ):
+            return []
+        result = [children[i] for i in range(count.value)]
+        if children:
+            self._xlib.XFree(children)
+        return result
+
+    def _class(self, window: int):
+        hint = XClassHint()
+        if not self._xlib.XGetClassHint(self._display, window, ctypes.byref(hint)):
+            return None, None
+        names = []
+        for pointer in (hint.res_name, hint.res_class):
+            names.append(
+                ctypes.string_at(pointer).decode(errors="replace") if pointer else ""
+            )
+            if pointer:
+                self._xlib.XFree(pointer)
+        return names[0], names[1]
+
+    def _property(self, window: int, atom: int):
+        actual_type, actual_format = Atom(), ctypes.c_int()
+        items, remaining = ctypes.c_ulong(), ctypes.c_ulong()
+        data = ctypes.POINTER(ctypes.c_ubyte)()
+        status = self._xlib.XGetWindowProperty(
+            self._display,
+            window,
+            atom,
+            0,
+            4096,
+            0,
+            0,
+            ctypes.byref(actual_type),
+            ctypes.byref(actual_format),
+            ctypes.byref(items),
+            ctypes.byref(remaining),
+            ctypes.byref(data),
+        )
+        if status != 0 or not data:
+            return None
+        value = None
+        if actual_format.value == 8:
+            value = ctypes.string_at(data, items.value).decode(errors="replace")
+        self._xlib.XFree(data)
+        return value
+
+    def _title(self, window: int):
+        title = self._property(window, self._net_wm_name)
+        if title is None:
+            title = self._property(window, self._wm_name)
+        return title
+
+    def windows(self):
+        """
+        Walk the window tree in the order `xdotool search` does and watch every new window.
+        """
+        result = []
+        seen = set()
+        attributes = XWindowAttributes()
+        stack = list(reversed(self._children(self.root)))
+        while stack:
+            window = stack.pop()
+            seen.add(window)
+            if window not in self._selected:
+                self._select(window)
+
+            instance, cls = self._class(window)
+            title = self._title(window)
+            if instance is not None or title is not None:
+                visible = bool(
+                    self._xlib.XGetWindowAttributes(
+                        self._display, window, ctypes.byref(attributes)
+                    )
+                ) and (attributes.map_state == IS_VIEWABLE)
+                result.append([window, instance, cls, title, visible])
+            stack.extend(reversed(self._children(window)))
+
+        self._selected &= seen | {self.root}
+        return result
+
+
+def emit(update: dict) -> None:
+    sys.stdout.write(json.dumps(update, separators=(",", ":")) + "\n")
+    sys.stdout.flush()
+
+
+def main() -> None:
+    tick = int(sys.argv[1]) / 1000
+    heartbeat = int(sys.argv[2]) / 1000
+
+    x11 = X11State()
+    state = {
+        "screen": x11.screen(),
+        "pointer": x11.pointer(),
+        "focus": x11.focus(),
+        "windows": x11.windows(),
+    }
+    emit(state)
+    last_emit = time.monotonic()
+
+    while True:
+        select.select([x11.fd], [], [], tick)
+        windows_changed, screen_changed = x11.pending_events()
+
+        current = {"pointer": x11.pointer(), "focus": x11.focus()}
+        if screen_changed:
+            current["screen"] = x11.screen()
+        if windows_changed:
+            current["windows"] = x11.windows()
+
+        update = {key: value for key, value in current.items() if state[key] != value}
+        now = time.monotonic()
+        if update or now - last_emit >= heartbeat:
+            state.update(update)
+            emit(update)
+            last_emit = now
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
@@ -0,0 +1,389 @@
+"""
+Serve a live video stream of the display over a WebSocket.
+
+Usage: python3 video_stream.py <port> <flv|ivf> -- <ffmpeg command>
+
+Runs the ffmpeg command, which encodes the display into H.264 in FLV or VP8 in
+IVF on stdout. Both containers state the size of every frame, so each frame is
+sent to the viewers as one WebSocket message the moment ffmpeg wrote it.
+
+`GET /` serves a viewer page that decodes the frames with WebCodecs and draws
+them on a canvas, `GET /ws` is the WebSocket. A viewer first gets a text
+message with the decoder config, `{"codec": ..., "description": <base64 or
+null>}`, then one binary message per frame: 1 byte flags (1 for keyframes),
+the timestamp in microseconds as 8 bytes big endian, and the encoded frame.
+
+A new viewer gets every frame since the last keyframe, so it shows the screen
+right away. A viewer that falls behind skips to the next keyframe instead of
+lagging further. With `E2B_STREAM_TOKEN` set, both paths require the token in
+the `token` query parameter.
+"""
+
+import asyncio
+import base64
+import ctypes
+import hashlib
+import json
+import os
+import signal
+import struct
+import sys
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Seconds a frame waits for a viewer before the viewer skips to the next keyframe
+MAX_DELAY = 0.5
+
+KEYFRAME = 1
+
+OnConfig = Callable[[dict], None]
+OnFrame = Callable[[bool, int, bytes], None]
+
+VIEWER = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Desktop</title>
+<style>
+html, body { margin: 0; height: 100%; background: #000; overflow: hidden; }
+canvas { display: block; width: 100%; height: 100%; object-fit: contain; }
+#status { position: fixed; top: 8px; left: 8px; color: #ccc; font: 13px sans-serif; }
+</style>
+</head>
+<body>
+<canvas></canvas>
+<div id="status">Connecting...</div>
+<script>
+const canvas = document.querySelector("canvas");
+const context = canvas.getContext("2d");
+const status = document.getElementById("status");
+let decoder = null;
+
+function show(message) {
+  status.textContent = message;
+  status.hidden = false;
+}
+
+function configure(config) {
+  if (decoder && decoder.state !== "closed") decoder.close();
+  decoder = new VideoDecoder({
+    output(frame) {
+      if (canvas.width !== frame.displayWidth || canvas.height !== frame.displayHeight) {
+        canvas.width = frame.displayWidth;
+        canvas.height = frame.displayHeight;
+      }
+      context.drawImage(frame, 0, 0);
+      frame.close();
+      status.hidden = true;
+    },
+    error(error) {
+      show(`Decoding failed: ${error.message}`);
+    },
+  });
+  const description = config.description
+    ? Uint8Array.from(atob(config.description), (c) => c.charCodeAt(0))
+    : undefined;
+  decoder.configure({ codec: config.codec, description, optimizeForLatency: true });
+}
+
+function connect() {
+  const scheme = location.protocol === "https:" ? "wss" : "ws";
+  const socket = new WebSocket(`${scheme}://${location.host}/ws${location.search}`);
+  socket.binaryType = "arraybuffer";
+  socket.onmessage = (event) => {
+    if (typeof event.data === "string") {
+      configure(JSON.parse(event.data));
+      return;
+    }
+    if (!decoder || decoder.state !== "configured") return;
+    const view = new DataView(event.data);
+    decoder.decode(new EncodedVideoChunk({
+      type: view.getUint8(0) & 1 ? "key" : "delta",
+      timestamp: Number(view.getBigUint64(1)),
+      data: new Uint8Array(event.data, 9),
+    }));
+  };
+  socket.onclose = () => {
+    show("Disconnected, reconnecting...");
+    setTimeout(connect, 1000);
+  };
+}
+
+if ("VideoDecoder" in window) {
+  connect();
+} else {
+  show("This browser can't decode the stream, it needs WebCodecs support");
+}
+</script>
+</body>
+</html>
+"""
+
+
+async def read_flv(
+    reader: asyncio.StreamReader, on_config: OnConfig, on_frame: OnFrame
+) -> None:
+    """
+    Split H.264 in FLV into the decoder config and frames in the AVCC format.
+    """
+    header = await reader.readexactly(9)
+    if header[:3] != b"FLV":
+        raise ValueError("Not an FLV stream")
+    # The header is followed by the size of the (non-existent) previous tag
+    await reader.readexactly(struct.unpack(">I", header[5:9])[0] - 9 + 4)
+
+    while True:
+        tag = await reader.readexactly(11)
+        size = int.from_bytes(tag[1:4], "big")
+        timestamp = int.from_bytes(tag[4:7], "big") | tag[7] << 24
+        data = await reader.readexactly(size)
+        await reader.readexactly(4)
+
+        # Only video tags with AVC, audio and metadata are skipped
+        if tag[0] != 9 or size < 5 or data[0] & 0x0F != 7:
+            continue
+        if data[1] == 0:
+            # The AVCDecoderConfigurationRecord names the profile and level
+            record = data[5:]
+            on_config(
+                {
+                    "codec": "avc1." + record[1:4].hex(),
+                    "description": base64.b64encode(record).decode(),
+                }
+            )
+        elif data[1] == 1:
+            # Composition time offset, signed 24 bits
+            offset = int.from_bytes(data[2:5], "big", signed=True)
+            on_frame(data[0] >> 4 == 1, (timestamp + offset) * 1000, data[5:])
+
+
+async def read_ivf(
+    reader: asyncio.StreamReader, on_config: OnConfig, on_frame: OnFrame
+) -> None:
+    """
+    Split VP8 in IVF into frames.
+    """
+    header = await reader.readexactly(32)
+    if header[:4] != b"DKIF":
+        raise ValueError("Not an IVF stream")
+    length = struct.unpack("<H", header[6:8])[0]
+    rate, scale = struct.unpack("<II", header[16:24])
+    await reader.readexactly(length - 32)
+    on_config({"codec": "vp8", "description": None})
+
+    while True:
+        size, pts = struct.unpack("<IQ", await reader.readexactly(12))
+        frame = await reader.readexactly(size)
+        # The lowest bit of the frame tag is 0 for keyframes
+        on_frame(frame[0] & 1 == 0, pts * scale * 1_000_000 // rate, frame)
+
+
+READERS = {"flv": read_flv, "ivf": read_ivf}
+
+
+def websocket_frame(opcode: int, payload: bytes) -> bytes:
+    if len(payload) < 126:
+        header = struct.pack(">BB", 0x80 | opcode, len(payload))
+    elif len(payload) < 1 << 16:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, len(payload))
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, len(payload))
+    return header + payload
+
+
+class Viewer:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.pending: Deque[Tuple[float, bytes]] = deque()
+        self.ready = asyncio.Event()
+        self.waiting_for_keyframe = True
+
+    def configure(self, config: bytes) -> None:
+        # Frames for the previous config can't be decoded with the new one
+        self.pending.clear()
+        self.writer.write(config)
+        self.waiting_for_keyframe = True
+
+    def push(self, message: bytes, keyframe: bool) -> None:
+        if self.pending and time.monotonic() - self.pending[0][0] > MAX_DELAY:
+            # The frames depend on each other, so only a keyframe can follow the dropped ones
+            self.pending.clear()
+            self.waiting_for_keyframe = True
+        if keyframe:
+            self.waiting_for_keyframe = False
+        if not self.waiting_for_keyframe:
+            self.pending.append((time.monotonic(), message))
+            self.ready.set()
+
+    async def send(self) -> None:
+        while True:
+            await self.ready.wait()
+            while self.pending:
+                self.writer.write(self.pending.popleft()[1])
+                await self.writer.drain()
+            self.ready.clear()
+
+
+class Broadcaster:
+    def __init__(self) -> None:
+        self.config: Optional[bytes] = None
+        self.frames: List[Tuple[bytes, bool]] = []
+        """Messages since the last keyframe, for new viewers."""
+        self.viewers: Set[Viewer] = set()
+
+    def on_config(self, config: dict) -> None:
+        self.config = websocket_frame(0x1, json.dumps(config).encode())
+        self.frames = []
+        for viewer in self.viewers:
+            viewer.configure(self.config)
+
+    def on_frame(self, keyframe: bool, timestamp: int, data: bytes) -> None:
+        message = websocket_frame(
+            0x2, struct.pack(">BQ", KEYFRAME if keyframe else 0, timestamp) + data
+        )
+        if keyframe:
+            self.frames = []
+        if keyframe or self.frames:
+            self.frames.append((message, keyframe))
+        for viewer in self.viewers:
+            viewer.push(message, keyframe)
+
+    def add(self, viewer: Viewer) -> None:
+        if self.config is not None:
+            viewer.configure(self.config)
+        for message, keyframe in self.frames:
+            viewer.push(message, keyframe)
+        self.viewers.add(viewer)
+
+
+async def read_client(reader: asyncio.StreamReader) -> None:
+    """
+    Read the viewer's frames until it closes the connection, they carry no data.
+    """
+    while True:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", await reader.readexactly(8))[0]
+        await reader.readexactly((4 if second & 0x80 else 0) + length)
+        if first & 0x0F == 0x8:
+            return
+
+
+async def quietly(coroutine: Awaitable[None]) -> None:
+    try:
+        await coroutine
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+
+
+def respond(
+    writer: asyncio.StreamWriter, status: str, body: bytes = b"", **headers
+) -> None:
+    lines = [f"HTTP/1.1 {status}", f"Content-Length: {len(body)}"]
+    lines += [f"{name.replace('_', '-')}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+
+
+def handler(
+    broadcaster: Broadcaster, token: Optional[str]
+) -> Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]:
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+            request, *lines = head.split("\r\n")
+            target = urlsplit(request.split(" ")[1])
+            headers = {
+                name.strip().lower(): value.strip()
+                for name, _, value in (line.partition(":") for line in lines if line)
+            }
+
+            if token and parse_qs(target.query).get("token") != [token]:
+                respond(writer, "403 Forbidden")
+            elif target.path == "/ws" and "sec-websocket-key" in headers:
+                accept = hashlib.sha1(
+                    (headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()
+                ).digest()
+                writer.write(
+                    b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                    b"Connection: Upgrade\r\nSec-WebSocket-Accept: "
+                    + base64.b64encode(accept)
+                    + b"\r\n\r\n"
+                )
+                viewer = Viewer(writer)
+                broadcaster.add(viewer)
+                tasks = [
+                    asyncio.ensure_future(quietly(viewer.send())),
+                    asyncio.ensure_future(quietly(read_client(reader))),
+                ]
+                try:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    broadcaster.viewers.discard(viewer)
+                    for task in tasks:
+                        task.cancel()
+            elif target.path in ("/", "/index.html"):
+                respond(
+                    writer,
+                    "200 OK",
+                    VIEWER.encode(),
+                    Content_Type="text/html; charset=utf-8",
+                    Cache_Control="no-store",
+                )
+            else:
+                respond(writer, "404 Not Found")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+def stop_with_parent() -> None:
+    # PR_SET_PDEATHSIG, so ffmpeg stops with a killed server instead of on its next write
+    ctypes.CDLL(None).prctl(1, signal.SIGTERM)
+
+
+async def main() -> int:
+    port, container, separator, *command = sys.argv[1:]
+    if separator != "--" or container not in READERS:
+        print(__doc__.strip().split("\n\n")[1], file=sys.stderr)
+        return 2
+
+    broadcaster = Broadcaster()
+    server = await asyncio.start_server(
+        handler(broadcaster, os.environ.get("E2B_STREAM_TOKEN")), port=int(port)
+    )
+    ffmpeg = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        preexec_fn=stop_with_parent,
+    )
+    assert ffmpeg.stdout is not None
+    try:
+        await READERS[container](
+            ffmpeg.stdout, broadcaster.on_config, broadcaster.on_frame
+        )
+    except asyncio.IncompleteReadError:
+        pass
+    finally:
+        server.close()
+        if ffmpeg.returncode is None:
+            ffmpeg.terminate()
+    # The stream only ends when ffmpeg does
+    return await ffmpeg.wait() or 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,87 @@
+"""
+Wait inside the desktop sandbox until all given conditions hold.
+
+Usage: python3 wait_ready.py <timeout-seconds> [--pid <pid>] <condition>...
+
+Conditions:
+    port:<port>      a process listens on the TCP port
+
+With `--pid`, the wait fails as soon as the given process exits, e.g. when the
+server that is waited for crashes on startup.
+
+The conditions are checked locally every few milliseconds, so the client waits
+with a single command instead of polling over the network. The result is
+printed as JSON with the time it took until each condition held.
+"""
+
+import json
+import sys
+import time
+
+INTERVAL = 0.01
+
+
+def port_ready(port: str) -> bool:
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            # State 0A is LISTEN
+            if fields[3] == "0A" and int(fields[1].rsplit(":", 1)[1], 16) == int(port):
+                return True
+    return False
+
+
+def process_state(pid: str) -> str:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0]
+    except (OSError, IndexError):
+        return ""
+
+
+CHECKS = {"port": port_ready}
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    deadline = time.monotonic() + float(args.pop(0))
+    pid = None
+    if args and args[0] == "--pid":
+        pid = args[1]
+        args = args[2:]
+
+    start = time.monotonic()
+    pending = {}
+    for condition in args:
+        kind, value = condition.split(":", 1)
+        pending[condition] = (CHECKS[kind], value)
+
+    result = {"ready": False, "elapsed_ms": 0.0, "conditions": {c: None for c in args}}
+    while True:
+        now = time.monotonic()
+        for condition, (check, value) in list(pending.items()):
+            if check(value):
+                result["conditions"][condition] = (now - start) * 1000
+                del pending[condition]
+
+        if not pending:
+            result["ready"] = True
+            break
+        if pid and process_state(pid) in ("", "Z"):
+            result["error"] = f"Process {pid} exited"
+            break
+        if now >= deadline:
+            break
+        time.sleep(INTERVAL)
+
+    result["elapsed_ms"] = (time.monotonic() - start) * 1000
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from e2b import AsyncCommandHandle, CommandHandle, TimeoutException
+
+if TYPE_CHECKING:
+    from .async_main import AsyncSandbox
+    from .main import Sandbox
+
+# Input operations that don't change the focus or the windows
+_PASSIVE_OPS = {"move", "location", "sleep"}
+
+
+class _StateCache:
+    """
+    Mirror of the desktop state reported by the `state_watcher.py` sandbox program.
+
+    A field is only answered while the watcher was heard from within `max_staleness` seconds,
+    and not between an input action of the client and the next report of the watcher.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = ""
+        self._values: Dict[str, Any] = {}
+        self._dirty: Set[str] = set()
+        self._last_report: Optional[float] = None
+        self.max_staleness = 1.0
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Process a chunk of the watcher's output.
+
+        :return: Whether the chunk contained a report.
+        """
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+
+        reports = [json.loads(line) for line in lines if line.strip()]
+        if not reports:
+            return False
+        with self._lock:
+            for report in reports:
+                self._values.update(report)
+            self._dirty.clear()
+            self._last_report = time.monotonic()
+        return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending = ""
+            self._values.clear()
+            self._dirty.clear()
+            self._last_report = None
+
+    def applied(self, ops: List[List[Any]]) -> None:
+        """
+        Account for input operations the client executed.
+
+        The pointer position after a move is known, other operations may change
+        the focus and the windows, so those are queried until the watcher reports again.
+        """
+        with self._lock:
+            for op in ops:
+                if op[0] == "move":
+                    self._values["pointer"] = [op[1], op[2]]
+                elif op[0] not in _PASSIVE_OPS:
+                    self._dirty.update(("focus", "windows"))
+
+    def _get(self, field: str) -> Any:
+        with self._lock:
+            if (
+                self._last_report is None
+                or field in self._dirty
+                or time.monotonic() - self._last_report > self.max_staleness
+            ):
+                return None
+            return self._values.get(field)
+
+    def pointer(self) -> Optional[Tuple[int, int]]:
+        pointer = self._get("pointer")
+        return (pointer[0], pointer[1]) if pointer else None
+
+    def screen(self) -> Optional[Tuple[int, int]]:
+        screen = self._get("screen")
+        return (screen[0], screen[1]) if screen else None
+
+    def focus(self) -> Optional[str]:
+        focus = self._get("focus")
+        return None if focus is None else str(focus)
+
+    def application_windows(self, application: str) -> Optional[List[str]]:
+        """
+        Visible windows whose class matches the pattern, like `xdotool search --onlyvisible --class`.
+
+        :return: The window IDs, `None` if the state is stale or no window matches.
+        """
+        windows = self._get("windows")
+        if windows is None:
+            return None
+        pattern = re.compile(application, re.IGNORECASE)
+        matches = [
+            str(window)
+            for window, _, cls, _, visible in windows
+            if visible and cls is not None and pattern.search(cls)
+        ]
+        # No match may also mean the window appeared after the last report
+        return matches or None
+
+    def window_title(self, window_id: str) -> Optional[str]:
+        windows = self._get("windows")
+        if windows is None or not window_id.isdigit():
+            return None
+        for window, _, _, title, _ in windows:
+            if window == int(window_id):
+                return title or ""
+        return None
+
+
+def _watcher_command(path: str, tick_ms: int, max_staleness: float) -> str:
+    # Report at least twice per staleness bound, so an idle desktop stays fresh
+    heartbeat_ms = max(tick_ms, int(max_staleness * 1000 / 2))
+    return f"python3 {path} {tick_ms} {heartbeat_ms}"
+
+
+def _validate(tick_ms: int, max_staleness: float) -> None:
+    if tick_ms <= 0:
+        raise ValueError("tick_ms must be greater than 0")
+    if max_staleness * 1000 < 2 * tick_ms:
+        raise ValueError("max_staleness must be at least two ticks")
+
+
+class _DesktopState:
+    """
+    Live mirror of the desktop state on the client.
+
+    While it's running, `get_cursor_position`, `get_screen_size`, `get_current_window_id`,
+    `get_application_windows` and `get_window_title` are answered from the mirror without a request.
+    """
+
+    def __init__(self, desktop: "Sandbox") -> None:
+        self.__desktop = desktop
+        self._cache = _StateCache()
+        self._handle: Optional[CommandHandle] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._handle is not None
+
+    def start(
+        self, tick_ms: int = 20, max_staleness: float = 1.0, timeout: float = 10
+    ) -> None:
+        """
+        Start a watcher in the sandbox that streams every change of the desktop state.
+
+        :param tick_ms: How often the pointer position and the input focus are sampled in the sandbox, in milliseconds.
+        :param max_staleness: Query the sandbox instead of the mirror if the watcher wasn't heard from for this many seconds.
+        :param timeout: How long to wait for the first report of the watcher, in seconds.
+        :raises RuntimeError: If the mirror is already running
+        :raises TimeoutException: If the watcher didn't report in time
+        """
+        if self._handle is not None:
+            raise RuntimeError("State mirror is already running")
+        _validate(tick_ms, max_staleness)
+
+        path = self.__desktop._upload_script("state_watcher.py")
+        self._cache.reset()
+        self._cache.max_staleness = max_staleness
+        self._handle = self.__desktop.commands.run(
+            _watcher_command(path, tick_ms, max_staleness), background=True, timeout=0
+        )
+
+        reported = threading.Event()
+        self._thread = threading.Thread(
+            target=self._read, args=(self._handle, reported), daemon=True
+        )
+        self._thread.start()
+        if not reported.wait(timeout) or self._cache._last_report is None:
+            self.stop()
+            raise TimeoutException("Could not start the state watcher")
+
+    def _read(self, handle: CommandHandle, reported: threading.Event) -> None:
+        try:
+            for stdout, _, _ in handle:
+                if stdout and self._cache.feed(stdout):
+                    reported.set()
+        except Exception:
+            # The watcher was stopped or the connection was lost, the getters query the sandbox again
+            pass
+        finally:
+            self._cache.reset()
+            reported.set()
+
+    def stop(self) -> None:
+        """
+        Stop the watcher. The getters query the sandbox again.
+        """
+        if self._handle is None:
+            return
+        handle, self._handle = self._handle, None
+        handle.kill()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._cache.reset()
+
+
+class _AsyncDesktopState:
+    """
+    Live mirror of the desktop state on the client.
+
+    While it's running, `get_cursor_position`, `get_screen_size`, `get_current_window_id`,
+    `get_application_windows` and `get_window_title` are answered from the mirror without a request.
+    """
+
+    def __init__(self, desktop: "AsyncSandbox") -> None:
+        self.__desktop = desktop
+        self._cache = _StateCache()
+        self._handle: Optional[AsyncCommandHandle] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._handle is not None
+
+    async def start(
+        self, tick_ms: int = 20, max_staleness: float = 1.0, timeout: float = 10
+    ) -> None:
+        """
+        Start a watcher in the sandbox that streams every change of the desktop state.
+
+        :param tick_ms: How often the pointer position and the input focus are sampled in the sandbox, in milliseconds.
+        :param max_staleness: Query the sandbox instead of the mirror if the watcher wasn't heard from for this many seconds.
+        :param timeout: How long to wait for the first report of the watcher, in seconds.
+        :raises RuntimeError: If the mirror is already running
+        :raises TimeoutException: If the watcher didn't report in time
+        """
+        if self._handle is not None:
+            raise RuntimeError("State mirror is already running")
+        _validate(tick_ms, max_staleness)
+
+        path = await self.__desktop._upload_script("state_watcher.py")
+        self._cache.reset()
+        self._cache.max_staleness = max_staleness
+        reported = asyncio.Event()
+
+        def on_stdout(chunk: str) -> None:
+            if self._cache.feed(chunk):
+                reported.set()
+
+        self._handle = await self.__desktop.commands.run(
+            _watcher_command(path, tick_ms, max_staleness),
+            background=True,
+            timeout=0,
+            on_stdout=on_stdout,
+        )
+        self._task = asyncio.create_task(self._wait(self._handle, reported))
+
+        try:
+            await asyncio.wait_for(reported.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        if self._cache._last_report is None:
+            await self.stop()
+            raise TimeoutException("Could not start the state watcher")
+
+    async def _wait(self, handle: AsyncCommandHandle, reported: asyncio.Event) -> None:
+        try:
+            await handle.wait()
+        except Exception:
+            # The watcher was stopped or the connection was lost, the getters query the sandbox again
+            pass
+        finally:
+            self._cache.reset()
+            reported.set()
+
+    async def stop(self) -> None:
+        """
+        Stop the watcher. The getters query the sandbox again.
+        """
+        if self._handle is None:
+            return
+        handle, self._handle = self._handle, None
+        await handle.kill()
+        if self._task:
+            await self._task
+            self._task = None
+        self._cache.reset()
@@ -0,0 +1,141 @@
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, List, Literal, Optional, Union
+
+StreamProfile = Literal["low_latency", "low_bandwidth", "quality"]
+
+StreamOption = Union[bool, StreamProfile, Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class StreamSettings:
+    """
+    Trade-offs of the VNC stream between latency, bandwidth and image quality.
+
+    `None` keeps the default of x11vnc or of the viewer.
+    """
+
+    wait_ms: int = 50
+    """How often x11vnc polls the screen for changes, in milliseconds."""
+    max_fps: Optional[float] = None
+    """Upper bound of updates per second sent to each viewer. Changes in between are collected into one update."""
+    quality: Optional[int] = None
+    """JPEG quality the viewer asks for, from 0 (smallest) to 9 (best). Enables lossy encoding of photo-like regions."""
+    compression: Optional[int] = None
+    """zlib compression level the viewer asks for, from 0 (fastest) to 9 (smallest)."""
+    scale: Optional[float] = None
+    """Scale the screen down by this factor before it's sent, e.g. `0.5` for half the width and height."""
+    client_cache: Optional[int] = None
+    """Number of screens of pixels the viewer caches, so moved and restored windows are redrawn from its memory. Only for viewers that support the x11vnc client-side caching, noVNC shows the cache area below the screen."""
+
+
+STREAM_PROFILES: Dict[str, StreamSettings] = {
+    # Send every change right away and spend bandwidth on it
+    "low_latency": StreamSettings(wait_ms=10, max_fps=60, quality=6, compression=1),
+    # Few, small updates for many viewers or slow networks
+    "low_bandwidth": StreamSettings(
+        wait_ms=100, max_fps=5, quality=2, compression=9, scale=0.75
+    ),
+    # Lossless looking image at a moderate rate
+    "quality": StreamSettings(wait_ms=30, max_fps=30, quality=9, compression=6),
+}
+
+
+def stream_settings(
+    profile: Optional[StreamProfile] = None,
+    *,
+    wait_ms: Optional[int] = None,
+    max_fps: Optional[float] = None,
+    quality: Optional[int] = None,
+    compression: Optional[int] = None,
+    scale: Optional[float] = None,
+    client_cache: Optional[int] = None,
+) -> StreamSettings:
+    """
+    Settings of the profile, with the given options taking precedence.
+
+    :raises ValueError: If the profile is unknown or an option is out of range
+    """
+    if profile is not None and profile not in STREAM_PROFILES:
+        raise ValueError(
+            f"profile must be one of {', '.join(STREAM_PROFILES)}, got {profile!r}"
+        )
+    settings = STREAM_PROFILES[profile] if profile else StreamSettings()
+    overrides = {
+        "wait_ms": wait_ms,
+        "max_fps": max_fps,
+        "quality": quality,
+        "compression": compression,
+        "scale": scale,
+        "client_cache": client_cache,
+    }
+    settings = replace(
+        settings,
+        **{name: value for name, value in overrides.items() if value is not None},
+    )
+
+    if settings.wait_ms <= 0:
+        raise ValueError("wait_ms must be greater than 0")
+    if settings.max_fps is not None and settings.max_fps <= 0:
+        raise ValueError("max_fps must be greater than 0")
+    for name in ("quality", "compression"):
+        value = getattr(settings, name)
+        if value is not None and not 0 <= value <= 9:
+            raise ValueError(f"{name} must be between 0 and 9")
+    if settings.scale is not None and not 0 < settings.scale <= 1:
+        raise ValueError("scale must be greater than 0 and at most 1")
+    if settings.client_cache is not None and settings.client_cache < 0:
+        raise ValueError("client_cache must not be negative")
+    return settings
+
+
+def x11vnc_flags(settings: StreamSettings) -> List[str]:
+    flags = ["-wait", str(settings.wait_ms)]
+    if settings.max_fps is not None:
+        flags += ["-defer", str(max(1, round(1000 / settings.max_fps)))]
+    if settings.scale is not None and settings.scale != 1:
+        flags += ["-scale", f"{settings.scale:g}"]
+    if settings.client_cache:
+        flags += ["-ncache", str(settings.client_cache)]
+    return flags
+
+
+def viewer_params(settings: StreamSettings) -> List[str]:
+    """
+    Parameters of the noVNC page that make the viewer ask for the encoding settings.
+    """
+    params = []
+    if settings.quality is not None:
+        params.append(f"quality={settings.quality}")
+    if settings.compression is not None:
+        params.append(f"compression={settings.compression}")
+    return params
+
+
+_START_OPTIONS = ("vnc_port", "port", "require_auth", "window_id", "profile")
+
+
+def stream_options(stream: Optional[StreamOption]) -> Optional[Dict[str, Any]]:
+    """
+    Keyword arguments of `stream.start` for the `stream` option of `create`, `None` if it's disabled.
+
+    :param stream: `True` for the default settings, a profile name, or the keyword arguments themselves.
+    :raises ValueError: If an option is unknown or out of range
+    """
+    if stream is None or stream is False:
+        return None
+    if stream is True:
+        stream = {}
+    elif isinstance(stream, str):
+        stream = {"profile": stream}
+
+    options = dict(stream)
+    names = [field.name for field in fields(StreamSettings)]
+    unknown = set(options) - set(names) - set(_START_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown stream options: {', '.join(sorted(unknown))}")
+    # Fail before the sandbox is created rather than during the boot
+    stream_settings(
+        options.get("profile"),
+        **{name: options[name] for name in names if name in options},
+    )
+    return options
@@ -0,0 +1,35 @@
+from re import search as re_search
+from typing import Tuple
+
+
+def parse_cursor_position(output: str) -> Tuple[int, int]:
+    """
+    Parse the output of `xdotool getmouselocation`.
+
+    :raises RuntimeError: If the cursor position cannot be determined
+    """
+    groups = re_search(r"x:(\d+)\s+y:(\d+)", output)
+    if not groups:
+        raise RuntimeError(f"Failed to parse cursor position from output: {output}")
+
+    x, y = groups.group(1), groups.group(2)
+    if not x or not y:
+        raise RuntimeError(f"Invalid cursor position values: x={x}, y={y}")
+
+    return int(x), int(y)
+
+
+def parse_screen_size(output: str) -> Tuple[int, int]:
+    """
+    Parse the output of `xrandr`.
+
+    :raises RuntimeError: If the screen size cannot be determined
+    """
+    _match = re_search(r"(\d+x\d+)", output)
+    if not _match:
+        raise RuntimeError(f"Failed to parse screen size from output: {output}")
+
+    try:
+        return tuple(map(int, _match.group(1).split("x")))  # type: ignore
+    except (ValueError, IndexError) as e:
+        raise RuntimeError(f"Invalid screen size format: {_match.group(1)}") from e
@@ -0,0 +1,212 @@
+import secrets
+from typing import TYPE_CHECKING, Optional
+
+from e2b import AsyncCommandHandle, CommandHandle, TimeoutException
+
+from .capture import VideoStreamCodec, video_stream_command
+from .displays import VIDEO_STREAM_PORT, display_number
+from .readiness import port_condition
+
+if TYPE_CHECKING:
+    from .async_main import AsyncSandbox
+    from .main import Sandbox
+
+
+class _VideoStream:
+    """
+    Streams the display as encoded video over a WebSocket, an alternative to the VNC stream.
+
+    ffmpeg encodes the screen with H.264 or VP8 at a fixed bitrate, which takes a fraction of the
+    bandwidth of VNC for moving content, e.g. when many agents are watched at once. The stream is
+    view-only and the viewer page decodes it with WebCodecs, so it needs a recent browser.
+    """
+
+    def __init__(self, desktop: "Sandbox") -> None:
+        self.__handle: Optional[CommandHandle] = None
+        self._port = VIDEO_STREAM_PORT + display_number(desktop._display)
+        self._token: Optional[str] = None
+
+        self.__desktop = desktop
+
+    @property
+    def is_running(self) -> bool:
+        return self.__handle is not None
+
+    def start(
+        self,
+        fps: float = 30,
+        bitrate: int = 1000,
+        codec: VideoStreamCodec = "h264",
+        *,
+        scale: Optional[float] = None,
+        include_pointer: bool = True,
+        require_auth: bool = False,
+        port: Optional[int] = None,
+    ) -> None:
+        """
+        Start streaming the display as video, viewable in the browser at `get_url()`.
+
+        :param fps: Number of frames encoded per second.
+        :param bitrate: Target bitrate in kbit/s. Static screens take far less.
+        :param codec: The video codec. Can be 'h264' or 'vp8'.
+        :param scale: Scale the screen down by this factor before it's encoded, e.g. `0.5`.
+        :param include_pointer: Draw the mouse pointer into the stream. Defaults to `True`.
+        :param require_auth: Require the key from `get_auth_key()` to watch the stream.
+        :param port: Port of the stream. Defaults to 6200 plus the display number.
+        :raises RuntimeError: If the stream is already running
+        :raises ValueError: If the options are invalid
+        """
+        if self.__handle is not None:
+            raise RuntimeError("Video stream is already running")
+
+        port = port or self._port
+        path = self.__desktop._upload_script("video_stream.py")
+        command = video_stream_command(
+            self.__desktop._display,
+            path,
+            port,
+            fps=fps,
+            bitrate=bitrate,
+            codec=codec,
+            scale=scale,
+            include_pointer=include_pointer,
+        )
+        token = secrets.token_urlsafe(16) if require_auth else None
+
+        handle = self.__desktop.commands.run(
+            command,
+            envs={"E2B_STREAM_TOKEN": token} if token else None,
+            background=True,
+            timeout=0,
+        )
+        ready = self.__desktop._wait_until_ready(port_condition(port), pid=handle.pid)
+        if not ready.ready:
+            handle.kill()
+            raise TimeoutException(
+                f"Could not start video stream: {ready.error or 'timed out'}"
+            )
+
+        self.__handle = handle
+        self._port = port
+        self._token = token
+
+    def get_url(self, auth_key: Optional[str] = None) -> str:
+        """
+        URL of the viewer page of the stream.
+
+        :param auth_key: The key from `get_auth_key()`, if the stream requires it.
+        """
+        url = f"{self.__desktop._service_url(self._port)}/"
+        return f"{url}?token={auth_key}" if auth_key else url
+
+    def get_auth_key(self) -> str:
+        if not self._token:
+            raise RuntimeError(
+                "Unable to retrieve video stream auth key, check if require_auth is enabled"
+            )
+        return self._token
+
+    def stop(self) -> None:
+        if self.__handle:
+            self.__handle.kill()
+            self.__handle = None
+        self._token = None
+
+
+class _AsyncVideoStream:
+    """
+    Streams the display as encoded video over a WebSocket, an alternative to the VNC stream.
+    """
+
+    def __init__(self, desktop: "AsyncSandbox") -> None:
+        self.__handle: Optional[AsyncCommandHandle] = None
+        self._port = VIDEO_STREAM_PORT + display_number(desktop._display)
+        self._token: Optional[str] = None
+
+        self.__desktop = desktop
+
+    @property
+    def is_running(self) -> bool:
+        return self.__handle is not None
+
+    async def start(
+        self,
+        fps: float = 30,
+        bitrate: int = 1000,
+        codec: VideoStreamCodec = "h264",
+        *,
+        scale: Optional[float] = None,
+        include_pointer: bool = True,
+        require_auth: bool = False,
+        port: Optional[int] = None,
+    ) -> None:
+        """
+        Start streaming the display as video, viewable in the browser at `get_url()`.
+
+        :param fps: Number of frames encoded per second.
+        :param bitrate: Target bitrate in kbit/s. Static screens take far less.
+        :param codec: The video codec. Can be 'h264' or 'vp8'.
+        :param scale: Scale the screen down by this factor before it's encoded, e.g. `0.5`.
+        :param include_pointer: Draw the mouse pointer into the stream. Defaults to `True`.
+        :param require_auth: Require the key from `get_auth_key()` to watch the stream.
+        :param port: Port of the stream. Defaults to 6200 plus the display number.
+        :raises RuntimeError: If the stream is already running
+        :raises ValueError: If the options are invalid
+        """
+        if self.__handle is not None:
+            raise RuntimeError("Video stream is already running")
+
+        port = port or self._port
+        path = await self.__desktop._upload_script("video_stream.py")
+        command = video_stream_command(
+            self.__desktop._display,
+            path,
+            port,
+            fps=fps,
+            bitrate=bitrate,
+            codec=codec,
+            scale=scale,
+            include_pointer=include_pointer,
+        )
+        token = secrets.token_urlsafe(16) if require_auth else None
+
+        handle = await self.__desktop.commands.run(
+            command,
+            envs={"E2B_STREAM_TOKEN": token} if token else None,
+            background=True,
+            timeout=0,
+        )
+        ready = await self.__desktop._wait_until_ready(
+            port_condition(port), pid=handle.pid
+        )
+        if not ready.ready:
+            await handle.kill()
+            raise TimeoutException(
+                f"Could not start video stream: {ready.error or 'timed out'}"
+            )
+
+        self.__handle = handle
+        self._port = port
+        self._token = token
+
+    def get_url(self, auth_key: Optional[str] = None) -> str:
+        """
+        URL of the viewer page of the stream.
+
+        :param auth_key: The key from `get_auth_key()`, if the stream requires it.
+        """
+        url = f"{self.__desktop._service_url(self._port)}/"
+        return f"{url}?token={auth_key}" if auth_key else url
+
+    def get_auth_key(self) -> str:
+        if not self._token:
+            raise RuntimeError(
+                "Unable to retrieve video stream auth key, check if require_auth is enabled"
+            )
+        return self._token
+
+    async def stop(self) -> None:
+        if self.__handle:
+            await self.__handle.kill()
+            self.__handle = None
+        self._token = None
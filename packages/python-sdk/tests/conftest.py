@@ -1,7 +1,10 @@
 import pytest
 import os
 import logging
+from e2b import CommandResult
+from e2b.connection_config import ConnectionConfig
 from e2b_desktop import Sandbox
+from packaging.version import Version
 
 # Set up timeout and logger
 timeout = 60
@@ -38,3 +41,58 @@ def skip_by_debug(request, debug):
     if request.node.get_closest_marker("skip_debug"):
         if debug:
             pytest.skip("skipped because E2B_DEBUG is set")
+
+
+class FakeCommands:
+    """
+    Stand-in for the sandbox's `commands` that records the commands it runs.
+
+    A command is answered with the output of the first prefix in `outputs` it
+    starts with, or raises it if it's an exception. Commands in the background
+    get a handle from `handle`.
+    """
+
+    def __init__(self, outputs=None, handle=None):
+        self.runs = []
+        self.outputs = outputs or {}
+        self.handle = handle
+
+    @property
+    def commands(self):
+        return [cmd for cmd, _ in self.runs]
+
+    def run(self, cmd, background=False, envs=None, **kwargs):
+        self.runs.append((cmd, envs))
+        if background:
+            return self.handle()
+        for prefix, output in self.outputs.items():
+            if cmd.startswith(prefix):
+                if isinstance(output, Exception):
+                    raise output
+                return CommandResult(stdout=output, stderr="", exit_code=0, error=None)
+        return CommandResult(stdout="", stderr="", exit_code=0, error=None)
+
+
+@pytest.fixture
+def fake_commands():
+    return FakeCommands
+
+
+@pytest.fixture
+def offline_sandbox():
+    # Create sandboxes that never connect, with fake commands on display :0
+    def create(outputs=None, handle=None) -> Sandbox:
+        sbx = Sandbox(
+            sandbox_id="test",
+            envd_version=Version("0.2.0"),
+            envd_access_token=None,
+            sandbox_domain="e2b.local",
+            connection_config=ConnectionConfig(api_key="e2b_test"),
+        )
+        sbx._commands = FakeCommands(outputs, handle)
+        sbx._uploaded_scripts = set()
+        sbx._displays = {":0": sbx}
+        sbx._attach_display(":0")
+        return sbx
+
+    return create
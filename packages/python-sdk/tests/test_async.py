@@ -0,0 +1,50 @@
+import asyncio
+import io
+
+from PIL import Image
+
+from e2b_desktop import AsyncSandbox
+
+
+async def _with_sandbox(test):
+    sandbox = await AsyncSandbox.create(timeout=60)
+    try:
+        await test(sandbox)
+    finally:
+        await sandbox.kill()
+
+
+def test_controls():
+    async def test(sandbox: AsyncSandbox):
+        size = await sandbox.get_screen_size()
+        assert size == (1024, 768), f"Expected screen size (1024, 768), got {size}"
+
+        await sandbox.move_mouse(100, 200)
+        pos = await sandbox.get_cursor_position()
+        assert pos == (100, 200), f"Expected cursor position (100, 200), got {pos}"
+
+        await sandbox.drag((100, 200), (300, 400))
+        pos = await sandbox.get_cursor_position()
+        assert pos == (300, 400), f"Expected cursor position (300, 400), got {pos}"
+
+    asyncio.run(_with_sandbox(test))
+
+
+def test_screenshot():
+    async def test(sandbox: AsyncSandbox):
+        image = await sandbox.screenshot()
+        img = Image.open(io.BytesIO(image))
+        img.verify()
+
+    asyncio.run(_with_sandbox(test))
+
+
+def test_concurrent_sandboxes():
+    async def test(sandbox: AsyncSandbox):
+        await sandbox.move_mouse(10, 20)
+        assert await sandbox.get_cursor_position() == (10, 20)
+
+    async def run_all():
+        await asyncio.gather(*(_with_sandbox(test) for _ in range(3)))
+
+    asyncio.run(run_all())
@@ -1,5 +1,6 @@
 import time
-from e2b_desktop import Sandbox
+import pytest
+from e2b_desktop import FrameAssembler, Sandbox
 from PIL import ImageChops, Image
 import io
 
@@ -45,6 +46,18 @@ def test_right_click(sandbox: Sandbox):
     )
 
 
+def test_wait_for_screen_change(sandbox: Sandbox):
+    region = (0, 0, 400, 300)
+    before = sandbox.wait_until_stable(region, quiet_ms=1000, timeout=30)
+    assert before.done, "The screen did not become stable"
+
+    sandbox.right_click(200, 150)
+    change = sandbox.wait_for_screen_change(region, timeout=10, since=before.hash)
+    assert change.done, "The screen did not change after right-click"
+    x, y, width, height = change.box
+    assert 0 <= x < 400 and 0 <= y < 300 and width > 0 and height > 0
+
+
 def test_screenshot(sandbox: Sandbox):
     image = sandbox.screenshot()
     assert image, "Screenshot was not taken successfully"
@@ -83,3 +96,240 @@ def test_write(sandbox: Sandbox):
     assert content == "hello", (
         f"Expected content 'hello' in {text_file_path}, but got {content}"
     )
+
+
+def test_batch(sandbox: Sandbox):
+    result = (
+        sandbox.batch(delay_in_ms=10)
+        .move_mouse(100, 100)
+        .drag((100, 100), (200, 150))
+        .get_cursor_position()
+        .run()
+    )
+
+    assert [step.action for step in result.steps] == [
+        "move_mouse",
+        "drag",
+        "get_cursor_position",
+    ]
+    assert result[-1].result == (200, 150), (
+        f"Expected cursor position to be (200, 150), but got {result[-1].result}"
+    )
+    assert all(step.duration_ms >= 0 for step in result.steps)
+
+
+def test_screenshot_options(sandbox: Sandbox):
+    image = sandbox.screenshot(region=(100, 50, 400, 300), image_format="jpeg")
+    img = Image.open(io.BytesIO(image))
+    assert img.format == "JPEG"
+    assert img.size == (400, 300), f"Expected size (400, 300), but got {img.size}"
+
+    image = sandbox.screenshot(max_size=512, image_format="webp", quality=50)
+    img = Image.open(io.BytesIO(image))
+    assert img.format == "WEBP"
+    assert img.size == (512, 384), f"Expected size (512, 384), but got {img.size}"
+
+    image = sandbox.screenshot(scale=0.5, include_pointer=False)
+    img = Image.open(io.BytesIO(image))
+    assert img.size == (512, 384), f"Expected size (512, 384), but got {img.size}"
+
+
+def test_screenshot_delta(sandbox: Sandbox):
+    frames = FrameAssembler()
+
+    keyframe = sandbox.screenshot_delta(since=frames.hash, include_pointer=False)
+    assert keyframe.keyframe
+    frames.apply(keyframe)
+
+    unchanged = sandbox.screenshot_delta(since=frames.hash, include_pointer=False)
+    assert unchanged.not_modified and unchanged.hash == keyframe.hash
+
+    sandbox.right_click(300, 300)
+    time.sleep(2)
+    delta = sandbox.screenshot_delta(since=frames.hash, include_pointer=False)
+    assert not delta.keyframe and delta.tiles
+    assert delta.transferred_bytes < keyframe.transferred_bytes
+    image = frames.apply(delta)
+
+    full = Image.open(io.BytesIO(sandbox.screenshot(include_pointer=False)))
+    assert images_are_equal(full.convert("RGB"), image)
+
+
+def test_locate_on_screen(sandbox: Sandbox):
+    sandbox.wait_until_stable(quiet_ms=1000, timeout=30)
+    needle = io.BytesIO()
+    Image.open(io.BytesIO(sandbox.screenshot(include_pointer=False))).crop(
+        (0, 0, 120, 24)
+    ).save(needle, format="PNG")
+
+    match = sandbox.locate_on_screen(needle.getvalue(), confidence=0.99)
+    assert match is not None, "The cropped screenshot was not found on the screen"
+    assert (match.x, match.y, match.width, match.height) == (0, 0, 120, 24)
+
+    matches = sandbox.locate_all(needle.getvalue(), region=(0, 0, 400, 300))
+    assert matches and matches[0].x == 0 and matches[0].y == 0
+
+
+def test_find_text(sandbox: Sandbox):
+    sandbox.commands.run("xmessage -center 'Hello from the desktop'", background=True)
+    sandbox.wait_until_stable(quiet_ms=1000, timeout=30)
+
+    (found,) = sandbox.find_text("hello from the desktop")
+    assert found.text == "Hello from the desktop"
+    x, y = found.center
+    assert 200 < x < 824 and 150 < y < 618, f"Unexpected position {found.center}"
+
+    text = sandbox.read_region((found.x, found.y, found.width, found.height))
+    assert "Hello" in text.text
+    assert sandbox.read_region().cached, "The unchanged screen was recognized again"
+
+
+def test_frames(sandbox: Sandbox):
+    with sandbox.frames(fps=5, max_size=512, image_format="jpeg") as frames:
+        received = [next(frames) for _ in range(5)]
+
+    indexes = [frame.index for frame in received]
+    assert indexes == sorted(indexes), f"Expected increasing indexes, got {indexes}"
+    for frame in received:
+        img = Image.open(io.BytesIO(frame.data))
+        assert img.format == "JPEG"
+        assert img.size == (512, 384), f"Expected size (512, 384), but got {img.size}"
+
+
+def test_recording(sandbox: Sandbox):
+    sandbox.recording.start(fps=5, segment_seconds=1)
+    assert sandbox.recording.is_recording
+    time.sleep(3)
+    segments = sandbox.recording.stop()
+
+    assert not sandbox.recording.is_recording
+    assert len(segments) >= 2, f"Expected at least 2 segments, got {len(segments)}"
+    assert [segment.index for segment in segments] == list(range(len(segments)))
+    for segment in segments:
+        assert segment.name.endswith(".mp4")
+        assert segment.data[4:8] == b"ftyp", "Expected an MP4 segment"
+
+
+def test_boot_timings(sandbox: Sandbox):
+    timings = sandbox.boot_timings
+    assert {"sandbox", "x11", "total"} <= set(timings), f"Got {timings}"
+    assert 0 <= timings["x11"] < 10_000
+    assert timings["total"] >= timings["sandbox"]
+
+
+def test_wait_for_session():
+    sandbox = Sandbox.create(timeout=60, wait_for="session")
+    try:
+        assert sandbox.boot_timings["session"] >= sandbox.boot_timings["x11"]
+    finally:
+        sandbox.kill()
+
+
+def test_state_mirror(sandbox: Sandbox):
+    sandbox.state.start()
+    try:
+        assert sandbox.get_screen_size() == (1024, 768)
+
+        sandbox.move_mouse(100, 200)
+        assert sandbox.get_cursor_position() == (100, 200)
+
+        # Moves made outside of the SDK are reported by the watcher
+        sandbox.commands.run("xdotool mousemove --sync 300 400")
+        time.sleep(0.5)
+        assert sandbox.state._cache.pointer() == (300, 400)
+        assert sandbox.get_cursor_position() == (300, 400)
+
+        assert (
+            sandbox.get_current_window_id()
+            == sandbox.commands.run("xdotool getwindowfocus").stdout.strip()
+        )
+    finally:
+        sandbox.state.stop()
+    assert not sandbox.state.running
+
+
+def test_write_paste(sandbox: Sandbox):
+    text_file_path = "/home/user/paste.txt"
+    sandbox.files.write(text_file_path, "")
+    sandbox.commands.run(f"gedit {text_file_path}", background=True)
+    time.sleep(5)  # Wait for UI to load
+
+    # Pasted text keeps its indentation and Unicode characters as they are
+    text = "def héllo():\n    return '👋 wörld'\n" * 100
+    sandbox.write(text, mode="paste")
+    sandbox.press(["ctrl", "s"])
+    time.sleep(2)
+
+    content = sandbox.files.read(text_file_path)
+    assert content.rstrip("\n") == text.rstrip("\n")
+
+
+def test_add_display(sandbox: Sandbox):
+    display = sandbox.add_display(resolution=(800, 600))
+    try:
+        assert display.get_screen_size() == (800, 600)
+        assert sandbox.get_screen_size() == (1024, 768)
+
+        display.move_mouse(100, 200)
+        assert display.get_cursor_position() == (100, 200)
+        assert sandbox.get_cursor_position() != (100, 200)
+
+        image = Image.open(io.BytesIO(display.screenshot()))
+        assert image.size == (800, 600)
+    finally:
+        display.stop_display()
+    assert display.display not in sandbox._displays
+
+
+def test_stream_profile(sandbox: Sandbox):
+    sandbox.stream.start(profile="low_bandwidth")
+    try:
+        processes = sandbox.commands.run("ps -eo args").stdout
+        assert "-wait 100 -defer 200 -scale 0.75" in processes
+        assert "quality=2&compression=9" in sandbox.stream.get_url()
+    finally:
+        sandbox.stream.stop()
+
+
+def test_stream_on_create():
+    sandbox = Sandbox.create(timeout=60, stream=True)
+    try:
+        assert sandbox.boot_timings["stream"] >= sandbox.boot_timings["x11"]
+        assert set(sandbox.stream.start_timings) == {"vnc", "novnc"}
+        # Listening already, without waiting
+        sandbox.commands.run("curl -sf http://localhost:6080/vnc.html > /dev/null")
+
+        sandbox.stream.stop()
+        sandbox.stream.start()
+        assert sandbox.stream.start_timings["total"] > 0
+    finally:
+        sandbox.kill()
+
+
+@pytest.mark.parametrize("codec", ["h264", "vp8"])
+def test_video_stream(sandbox: Sandbox, codec):
+    sandbox.video_stream.start(fps=15, bitrate=500, codec=codec)
+    try:
+        page = sandbox.commands.run("curl -sf http://localhost:6200/").stdout
+        assert "VideoDecoder" in page
+        # The encoder keeps running behind the server
+        sandbox.wait(1000)
+        assert sandbox.video_stream.is_running
+        assert "ffmpeg" in sandbox.commands.run("ps -eo comm").stdout
+    finally:
+        sandbox.video_stream.stop()
+
+
+def test_openbox_session():
+    sandbox = Sandbox.create(timeout=60, session="openbox", wait_for="session")
+    try:
+        processes = sandbox.commands.run("ps -eo comm").stdout.split()
+        assert "openbox" in processes
+        assert "xfce4-panel" not in processes
+
+        # A session that exited is restarted
+        sandbox.commands.run(f"kill {sandbox._session_pid}")
+        assert sandbox.ensure_session()
+        assert not sandbox.ensure_session()
+    finally:
+        sandbox.kill()
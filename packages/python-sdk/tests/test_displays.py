@@ -0,0 +1,141 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from e2b_desktop.delta import parse_delta
+from e2b_desktop.displays import next_display, stop_display_command
+
+SCRIPTS = Path(__file__).parent.parent / "e2b_desktop" / "scripts"
+
+BOOT_OUTPUT = [
+    '{"phase": "x11", "ms": 1.0}\n',
+    '{"phase": "session_started", "ms": 2.0, "pid": 42}\n',
+    '{"phase": "stream", "ms": 30.0, "vnc_ms": 10.0, "novnc_ms": 25.0, "novnc_pid": 7}\n',
+]
+
+
+class FakeHandle:
+    pid = 1
+
+    def __iter__(self):
+        for line in BOOT_OUTPUT:
+            yield line, None, None
+
+    def disconnect(self):
+        pass
+
+
+@pytest.fixture
+def sbx(offline_sandbox):
+    return offline_sandbox(handle=FakeHandle)
+
+
+def load_script(name: str):
+    spec = importlib.util.spec_from_file_location(name, SCRIPTS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_next_display():
+    assert next_display([":0"]) == ":1"
+    assert next_display([":0", ":3", ":1"]) == ":4"
+
+
+def test_stop_display_command():
+    assert stop_display_command(":2", 42) == (
+        "kill -- -42 2>/dev/null; "
+        "[ -f /tmp/.X2-lock ] && kill $(cat /tmp/.X2-lock) 2>/dev/null; true"
+    )
+    assert stop_display_command(":2", None).startswith("[ -f /tmp/.X2-lock ]")
+
+
+def test_add_display(sbx):
+    commands = sbx._commands
+
+    display = sbx.add_display(resolution=(800, 600))
+    assert display.display == ":1"
+    assert display.boot_timings["x11"] == 1.0
+    assert display._session_pid == 42
+    assert sbx._displays == {":0": sbx, ":1": display}
+
+    # The launcher and every command of the handle target the new display
+    cmd, envs = commands.runs[-1]
+    assert '"display": ":1", "width": 800, "height": 600' in cmd
+    assert envs == {"DISPLAY": ":1"}
+    display.commands.run("xdotool getmouselocation", envs={"FOO": "bar"})
+    assert commands.runs[-1][1] == {"FOO": "bar", "DISPLAY": ":1"}
+
+    # Its services listen on their own ports
+    assert display.stream._port == 6081
+    assert display.stream._vnc_port == 5901
+    assert sbx.stream._port == 6080
+    assert display.stream is not sbx.stream
+
+    with pytest.raises(ValueError, match="already in use"):
+        sbx.add_display(display=":1")
+    assert display.add_display().display == ":2"
+
+    display.stop_display()
+    assert ":1" not in sbx._displays
+    assert commands.runs[-1][0].startswith("kill -- -42 ")
+
+    with pytest.raises(RuntimeError, match="kill the sandbox"):
+        sbx.stop_display()
+
+
+@pytest.mark.parametrize("display", [":20", ":120", "1", "localhost:1", ":x"])
+def test_add_display_invalid(sbx, display):
+    with pytest.raises(ValueError, match="display"):
+        sbx.add_display(display=display)
+    assert list(sbx._displays) == [":0"]
+
+
+def test_add_display_with_stream(sbx):
+    display = sbx.add_display(stream="low_bandwidth")
+
+    # The stream is started by the same launcher command and awaited with the boot
+    cmd, _ = sbx._commands.runs[-1]
+    assert '"stream": {"vnc_port": 5901, "port": 6081' in cmd
+    assert display.boot_timings["stream"] == 30.0
+    assert display.stream.start_timings == {"vnc": 10.0, "novnc": 25.0}
+    assert display.stream.get_url().startswith("https://6081-test.e2b.local/vnc.html")
+
+    with pytest.raises(ValueError, match="Unknown stream options"):
+        sbx.add_display(stream={"fps": 10})
+
+
+def test_delta_sessions_per_display(tmp_path, monkeypatch, capsys):
+    script = load_script("delta_capture")
+    monkeypatch.setattr(script, "CACHE_DIR", str(tmp_path))
+    screens = {
+        ":0": np.zeros((8, 8, 3), dtype=np.uint8),
+        ":1": np.full((8, 8, 3), 255, dtype=np.uint8),
+    }
+    monkeypatch.setattr(script, "capture", lambda display, _: screens[display])
+
+    def capture(display, since):
+        monkeypatch.setenv("DISPLAY", display)
+        monkeypatch.setattr(
+            sys, "argv", ["delta_capture.py", "default", since or "-", "4", "0"]
+        )
+        script.main()
+        return parse_delta(capsys.readouterr().out)
+
+    # Two handles in the same session don't replace each other's last frame
+    first = capture(":0", None)
+    second = capture(":1", None)
+    assert first.keyframe and second.keyframe
+    screens[":0"] = screens[":0"].copy()
+    screens[":0"][0, 0] = 1
+    delta = capture(":0", first.hash)
+    assert not delta.keyframe and len(delta.tiles) == 1
+    assert capture(":1", second.hash).not_modified
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "delta-0-default.npy",
+        "delta-0-default.npy.hash",
+        "delta-1-default.npy",
+        "delta-1-default.npy.hash",
+    ]
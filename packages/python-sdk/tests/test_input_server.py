@@ -0,0 +1,53 @@
+import httpx
+import pytest
+
+from e2b_desktop import Sandbox
+from e2b_desktop.input_server import _parse_response
+
+
+@pytest.fixture
+def input_sandbox():
+    sandbox = Sandbox.create(timeout=60, input_server=True)
+    try:
+        yield sandbox
+    finally:
+        sandbox.kill()
+
+
+def test_move_mouse(input_sandbox: Sandbox):
+    input_sandbox.move_mouse(100, 200)
+    pos = input_sandbox.get_cursor_position()
+    assert pos == (100, 200), f"Expected cursor position (100, 200), but got {pos}"
+
+    # The xdotool path sees the same pointer as the input server
+    output = input_sandbox.commands.run("xdotool getmouselocation").stdout
+    assert "x:100 y:200" in output, f"Unexpected xdotool output: {output}"
+
+
+def test_write(input_sandbox: Sandbox):
+    text_file_path = "/home/user/input.txt"
+    input_sandbox.files.write(text_file_path, "")
+    input_sandbox.launch("gedit", text_file_path)
+    input_sandbox.wait(3000)
+
+    input_sandbox.write("Hello, wörld!", delay_in_ms=10)
+    input_sandbox.press(["ctrl", "s"])
+    input_sandbox.wait(1000)
+
+    content = input_sandbox.files.read(text_file_path)
+    assert content.strip() == "Hello, wörld!", f"Unexpected content: {content}"
+
+
+def test_parse_response():
+    assert _parse_response(httpx.Response(200, json={"results": [None]})) == {
+        "results": [None]
+    }
+    # Errors of the server itself are passed on
+    assert _parse_response(httpx.Response(401, json={"error": "Unauthorized"})) == {
+        "error": "Unauthorized"
+    }
+
+    with pytest.raises(RuntimeError, match="Input server error: 502 Bad Gateway"):
+        _parse_response(httpx.Response(502, text="Bad Gateway"))
+    with pytest.raises(RuntimeError, match="401"):
+        _parse_response(httpx.Response(401, text="Invalid traffic access token"))
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from e2b_desktop import AsyncSandbox, CallRecord, LatencyRecorder, Sandbox
+from e2b_desktop.instrumentation import _COMPONENTS, set_instrumentation
+
+
+class FakeFiles:
+    def read(self, path, **kwargs):
+        return b"y" * 100
+
+    def write(self, path, data, **kwargs):
+        pass
+
+
+class FakeComponent:
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class FakeBase:
+    def kill(self):
+        pass
+
+
+class FakeDesktop(FakeBase):
+    """
+    Local stand-in with the same layout as `Sandbox`.
+    """
+
+    _input_server = None
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.files = FakeFiles()
+        self.stream = FakeComponent()
+        self.video_stream = FakeComponent()
+        self.recording = FakeComponent()
+        self.state = FakeComponent()
+
+    def press(self, key):
+        self.commands.run(f"xdotool key {key}")
+
+    def write(self, text):
+        # Nested calls are counted in the outer call
+        for key in text:
+            self.press(key)
+
+    def screenshot(self):
+        self.commands.run("screenshot")
+        return self.files.read("/tmp/screenshot.png")
+
+    def _run_input_ops(self, ops):
+        return self.commands.run("input"), 0.0
+
+    def fail(self):
+        raise ValueError("Failed")
+
+    async def async_press(self, key):
+        await asyncio.sleep(0)
+        self.commands.run(f"xdotool key {key}")
+
+
+@pytest.fixture
+def desktop(fake_commands):
+    return FakeDesktop(fake_commands({"": "x" * 10}))
+
+
+def test_records_calls(desktop):
+    records = []
+    set_instrumentation(desktop, FakeBase, records.append)
+
+    desktop.write("abc")
+    desktop.screenshot()
+    desktop.stream.start()
+    desktop._run_input_ops([["move", 1, 1]])
+    desktop.kill()
+
+    assert [record.method for record in records] == [
+        "write",
+        "screenshot",
+        "stream.start",
+        "batch.run",
+    ]
+    write, screenshot, _, _ = records
+    assert write.requests == 3
+    assert write.bytes_sent == len("xdotool key a") * 3
+    assert write.bytes_received == 30
+    assert screenshot.requests == 2 and screenshot.bytes_received == 110
+    assert 0 <= screenshot.remote_ms <= screenshot.wall_ms
+
+
+def test_records_component_calls(desktop):
+    recorder = LatencyRecorder()
+    set_instrumentation(desktop, FakeBase, recorder)
+
+    desktop.video_stream.start()
+    desktop.video_stream.stop()
+    desktop.state.start()
+
+    assert set(recorder.stats()) == {
+        "video_stream.start",
+        "video_stream.stop",
+        "state.start",
+    }
+
+
+@pytest.mark.parametrize("sandbox_class", [Sandbox, AsyncSandbox])
+def test_components_are_instrumented(sandbox_class):
+    # Every component the sandbox exposes as a property, `display` is only its name
+    properties = {
+        name
+        for name, value in vars(sandbox_class).items()
+        if isinstance(value, property) and name != "display"
+    }
+    assert properties == set(_COMPONENTS)
+
+
+def test_records_errors_and_async_calls(desktop):
+    records = []
+    set_instrumentation(desktop, FakeBase, records.append)
+
+    with pytest.raises(ValueError):
+        desktop.fail()
+    asyncio.run(desktop.async_press("a"))
+
+    fail, press = records
+    assert fail.method == "fail" and fail.error == "ValueError"
+    assert press.method == "async_press" and press.requests == 1
+
+
+def test_disable(desktop):
+    records = []
+    set_instrumentation(desktop, FakeBase, records.append)
+    set_instrumentation(desktop, FakeBase, None)
+
+    desktop.screenshot()
+    assert records == []
+    # The original methods are used again
+    assert "screenshot" not in vars(desktop)
+    assert "run" not in vars(desktop.commands)
+
+
+def test_latency_recorder():
+    recorder = LatencyRecorder()
+    for wall_ms in (3, 4, 150):
+        recorder(CallRecord(method="press", wall_ms=wall_ms, requests=1))
+    recorder(CallRecord(method="press", wall_ms=1, error="ValueError"))
+
+    stats = recorder.stats()["press"]
+    assert stats.calls == 4 and stats.errors == 1
+    assert stats.requests_per_call == 0.75
+    assert stats.mean_wall_ms == pytest.approx(39.5)
+    assert stats.percentile_wall_ms(50) == 5
+    assert stats.percentile_wall_ms(100) == 200
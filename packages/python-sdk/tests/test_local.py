@@ -0,0 +1,59 @@
+import asyncio
+import io
+import shutil
+
+import pytest
+from PIL import Image
+
+from e2b_desktop import AsyncLocalSandbox, LocalSandbox
+
+pytestmark = pytest.mark.skipif(
+    any(shutil.which(program) is None for program in ("Xvfb", "xdotool", "ffmpeg")),
+    reason="needs Xvfb, xdotool and ffmpeg on this machine",
+)
+
+# A window manager isn't needed for the input and capture tests
+SESSION = ["sleep", "infinity"]
+
+
+def test_local_controls():
+    desktop = LocalSandbox.create(session_command=SESSION)
+    try:
+        assert desktop.get_screen_size() == (1024, 768)
+
+        desktop.move_mouse(100, 200)
+        assert desktop.get_cursor_position() == (100, 200)
+
+        desktop.drag((100, 200), (300, 400))
+        assert desktop.get_cursor_position() == (300, 400)
+
+        image = Image.open(io.BytesIO(desktop.screenshot()))
+        assert image.size == (1024, 768)
+    finally:
+        desktop.kill()
+
+    assert not desktop.is_running()
+
+
+def test_local_input_server():
+    desktop = LocalSandbox.create(session_command=SESSION, input_server=True)
+    try:
+        desktop.move_mouse(50, 60)
+        assert desktop.get_cursor_position() == (50, 60)
+    finally:
+        desktop.kill()
+
+
+def test_async_local_controls():
+    async def test():
+        desktop = await AsyncLocalSandbox.create(session_command=SESSION)
+        try:
+            await desktop.move_mouse(100, 200)
+            assert await desktop.get_cursor_position() == (100, 200)
+
+            image = Image.open(io.BytesIO(await desktop.screenshot()))
+            assert image.size == (1024, 768)
+        finally:
+            await desktop.kill()
+
+    asyncio.run(test())
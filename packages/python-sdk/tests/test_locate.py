@@ -0,0 +1,130 @@
+import importlib.util
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from e2b_desktop.capture import locate_command
+from e2b_desktop.locate import decode_needle, needle_path, parse_matches
+from PIL import Image
+
+SCRIPT = Path(__file__).parent.parent / "e2b_desktop" / "scripts" / "locate.py"
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("locate_script", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def screen():
+    frame = np.random.default_rng(0).integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    # The same icon twice, once a little darker
+    frame[40:48, 60:72] = frame[5:13, 10:22] // 2 + 20
+    return frame
+
+
+def locate(screen, needle, confidence=0.9, limit=10, grayscale=False):
+    script = load_script()
+    scores = script.match_scores(
+        script.prepare(screen, grayscale), script.prepare(needle, grayscale)
+    )
+    height, width, _ = needle.shape
+    return script.best_matches(scores, width, height, confidence, limit)
+
+
+@pytest.mark.parametrize("grayscale", [False, True])
+def test_match_scores_brute_force(screen, grayscale):
+    script = load_script()
+    haystack = script.prepare(screen, grayscale)
+    needle = script.prepare(screen[20:26, 30:39], grayscale)
+    scores = script.match_scores(haystack, needle)
+    assert scores.shape == (55, 72)
+
+    centered = needle - needle.mean()
+    for y, x in [(0, 0), (20, 30), (54, 71), (33, 7)]:
+        window = haystack[y : y + 6, x : x + 9]
+        window = window - window.mean()
+        expected = (window * centered).sum() / np.sqrt(
+            (window * window).sum() * (centered * centered).sum()
+        )
+        assert scores[y, x] == pytest.approx(expected)
+
+
+def test_locate_all(screen):
+    matches = locate(screen, screen[5:13, 10:22])
+    # Brightness and contrast don't matter
+    assert [(x, y) for x, y, _ in matches] == [(10, 5), (60, 40)]
+    assert all(score > 0.99 for _, _, score in matches)
+
+
+def test_locate_limit_and_confidence(screen):
+    assert len(locate(screen, screen[5:13, 10:22], limit=1)) == 1
+    # Random pixels never correlate
+    matches = locate(screen, screen[30:38, 30:42], confidence=0.5)
+    assert [(x, y) for x, y, _ in matches] == [(30, 30)]
+
+
+def test_locate_flat_needle():
+    frame = np.zeros((20, 30, 3), dtype=np.uint8)
+    frame[5:15, 10:20] = 200
+    matches = locate(frame, np.full((4, 4, 3), 200, dtype=np.uint8), limit=100)
+    assert len(matches) == 4
+    assert all(10 <= x <= 16 and 5 <= y <= 11 for x, y, _ in matches)
+
+
+def test_locate_needle_larger_than_screen(screen):
+    assert locate(screen[:5, :5], screen[:10, :10]) == []
+
+
+def test_locate_command():
+    command = locate_command(
+        ":1",
+        "/tmp/locate.py",
+        "/tmp/needle.rgb",
+        (12, 8),
+        0.95,
+        1,
+        region=(10, 20, 300, 200),
+        grayscale=True,
+    )
+    assert command.startswith(
+        "DISPLAY=:1 python3 /tmp/locate.py /tmp/needle.rgb 12 8 0.95 1 1 10 20 300 200 -- ffmpeg"
+    )
+    assert "-video_size 300x200 -i :1+10,20" in command
+    assert command.endswith("-frames:v 1 -f rawvideo -pix_fmt rgb24 -")
+
+
+@pytest.mark.parametrize("options", [{"confidence": 0}, {"limit": 0}])
+def test_locate_command_invalid(options):
+    arguments = {"confidence": 0.9, "limit": 1, **options}
+    with pytest.raises(ValueError):
+        locate_command(":0", "/tmp/l.py", "/tmp/n.rgb", (1, 1), **arguments)
+
+
+def test_needle():
+    image = Image.new("RGBA", (3, 2), (10, 20, 30, 128))
+    data = io.BytesIO()
+    image.save(data, format="PNG")
+    png = data.getvalue()
+
+    assert decode_needle(png) == (bytes([10, 20, 30]) * 6, 3, 2)
+    assert needle_path(png) == needle_path(png)
+    assert needle_path(png) != needle_path(png + b"\0")
+
+
+def test_parse_matches():
+    output = json.dumps(
+        {
+            "matches": [{"x": 10, "y": 20, "width": 5, "height": 4, "score": 0.97}],
+            "capture_ms": 1.0,
+            "match_ms": 2.0,
+        }
+    )
+    (match,) = parse_matches(output)
+    assert match.center == (12, 22)
+    with pytest.raises(RuntimeError, match="capture failed"):
+        parse_matches(json.dumps({"error": "The screen capture failed"}))
@@ -0,0 +1,152 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from e2b_desktop.capture import ocr_command
+from e2b_desktop.ocr import (
+    ScreenText,
+    TextBox,
+    TextLine,
+    parse_screen_text,
+    validate_language,
+)
+
+SCRIPT = Path(__file__).parent.parent / "e2b_desktop" / "scripts" / "ocr.py"
+
+TSV = "\n".join(
+    [
+        "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext",
+        "1\t1\t0\t0\t0\t0\t0\t0\t400\t200\t-1\t",
+        "5\t1\t1\t1\t1\t1\t20\t40\t60\t20\t96\tSave",
+        "5\t1\t1\t1\t1\t2\t90\t40\t40\t20\t90\tas",
+        "5\t1\t2\t1\t1\t1\t20\t100\t80\t21\t88\tCancel",
+        "5\t1\t2\t1\t1\t2\t120\t100\t8\t20\t-1\t ",
+    ]
+)
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("ocr_script", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def word(text, x, y, width=10, height=10):
+    return TextBox(text=text, x=x, y=y, width=width, height=height, confidence=0.9)
+
+
+def line(*words):
+    return TextLine(
+        text=" ".join(w.text for w in words),
+        x=words[0].x,
+        y=words[0].y,
+        width=words[-1].x + words[-1].width - words[0].x,
+        height=10,
+        confidence=0.9,
+        words=list(words),
+    )
+
+
+def test_parse_tsv():
+    save, cancel = load_script().parse_tsv(TSV, 2)
+    assert save["text"] == "Save as"
+    assert (save["x"], save["y"], save["width"], save["height"]) == (10, 20, 55, 10)
+    assert save["confidence"] == pytest.approx(0.93)
+    assert [w["text"] for w in save["words"]] == ["Save", "as"]
+    assert cancel["text"] == "Cancel" and len(cancel["words"]) == 1
+
+
+def test_ocr_cache(tmp_path, monkeypatch, capsys):
+    script = load_script()
+    monkeypatch.setattr(script, "CACHE_DIR", str(tmp_path))
+    frames = []
+    monkeypatch.setattr(
+        script,
+        "recognize",
+        lambda frame, scale, language: frames.append(frame) or script.parse_tsv(TSV, 1),
+    )
+
+    def read(x, color):
+        capture = f"import sys; sys.stdout.buffer.write(bytes([{color}]) * 4 * 3 * 3)"
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["ocr.py", "1", "eng", str(x), "5", "4", "3", "--", sys.executable]
+            + ["-c", capture],
+        )
+        script.main()
+        return parse_screen_text(capsys.readouterr().out)
+
+    first = read(0, 0)
+    assert not first.cached and first.lines[0].words[0].x == 20
+    # The same pixels somewhere else are read from the cache, at their new position
+    moved = read(100, 0)
+    assert moved.cached and moved.hash == first.hash
+    assert moved.lines[0].x == 120 and moved.lines[0].words[0].x == 120
+    assert not read(100, 255).cached
+    assert len(frames) == 2 and frames[0].shape == (3, 4, 3)
+
+
+def test_prune_cache(tmp_path, monkeypatch):
+    script = load_script()
+    monkeypatch.setattr(script, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(script, "CACHE_SIZE", 2)
+    for name in ["ocr-a.json", "ocr-b.json", "ocr-c.json", "wait.npy"]:
+        (tmp_path / name).write_text("[]")
+    script.prune_cache()
+    assert len(list(tmp_path.glob("ocr-*"))) == 2
+    assert (tmp_path / "wait.npy").exists()
+
+
+def test_find_text():
+    text = ScreenText(
+        lines=[
+            line(word("Cancel", 10, 50, 40)),
+            line(word("File", 10, 10), word("Save", 30, 10), word("as...", 50, 10)),
+        ],
+        hash="ab",
+        cached=False,
+    )
+    assert text.text == "Cancel\nFile Save as..."
+
+    (found,) = text.find("save  AS")
+    assert found.text == "Save as"
+    assert (found.x, found.y, found.width, found.height) == (30, 10, 30, 10)
+    # Matches inside a word cover the whole word, lines are searched from the top
+    assert [box.text for box in text.find("a")] == ["a", "a", "a"]
+    assert [box.y for box in text.find("a")] == [10, 10, 50]
+    assert text.find("save", case_sensitive=True) == []
+    with pytest.raises(ValueError):
+        text.find(" ")
+
+
+def test_ocr_command():
+    command = ocr_command(":1", "/tmp/ocr.py", region=(10, 20, 300, 200), scale=3)
+    assert command.startswith(
+        "DISPLAY=:1 python3 /tmp/ocr.py 3 eng 10 20 300 200 -- ffmpeg"
+    )
+    assert "-video_size 300x200 -i :1+10,20" in command
+    assert command.endswith("-frames:v 1 -f rawvideo -pix_fmt rgb24 -")
+    with pytest.raises(ValueError):
+        ocr_command(":1", "/tmp/ocr.py", scale=5)
+
+
+@pytest.mark.parametrize("language", ["eng", "eng+deu", "chi_sim"])
+def test_validate_language(language):
+    validate_language(language)
+
+
+@pytest.mark.parametrize("language", ["", "eng+", "eng; reboot", "../eng"])
+def test_validate_language_invalid(language):
+    with pytest.raises(ValueError):
+        validate_language(language)
+
+
+def test_parse_screen_text_error():
+    with pytest.raises(RuntimeError, match="tesseract is not installed"):
+        parse_screen_text(
+            json.dumps({"error": "tesseract is not installed in the template"})
+        )
@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+import pytest
+from e2b_desktop import AsyncDesktopPool, DesktopPool
+
+
+class FakeSandbox:
+    """
+    Local stand-in for `Sandbox`, boots in `boot_time` seconds without the sandbox API.
+    """
+
+    boot_time = 0.05
+
+    def __init__(self, **opts):
+        self.opts = opts
+        self.killed = False
+        self.timeouts = []
+
+    @classmethod
+    def create(cls, **opts):
+        time.sleep(cls.boot_time)
+        return cls(**opts)
+
+    def kill(self):
+        self.killed = True
+        return True
+
+    def set_timeout(self, timeout):
+        self.timeouts.append(timeout)
+
+
+class SlowFakeSandbox(FakeSandbox):
+    boot_time = 0.5
+
+
+class FakeAsyncSandbox(FakeSandbox):
+    @classmethod
+    async def create(cls, **opts):
+        await asyncio.sleep(cls.boot_time)
+        return cls(**opts)
+
+    async def kill(self):
+        self.killed = True
+        return True
+
+    async def set_timeout(self, timeout):
+        self.timeouts.append(timeout)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Condition was not met in time"
+        time.sleep(0.01)
+
+
+def test_acquire_from_warm_pool():
+    with DesktopPool(
+        size=2,
+        template="desktop",
+        resolution=(1280, 800),
+        dpi=120,
+        timeout=120,
+        sandbox_class=FakeSandbox,
+    ) as pool:
+        wait_until(lambda: pool.stats.ready == 2)
+
+        desktop = pool.acquire()
+        assert desktop.opts == {
+            "timeout": 120,
+            "template": "desktop",
+            "resolution": (1280, 800),
+            "dpi": 120,
+        }
+        stats = pool.stats
+        assert stats.hits == 1 and stats.misses == 0
+        assert stats.acquire_ms[0] < FakeSandbox.boot_time * 1000
+
+        # The pool refills in the background
+        wait_until(lambda: pool.stats.ready == 2)
+
+        pool.release(desktop)
+        wait_until(lambda: desktop.killed)
+
+
+def test_acquire_from_empty_pool():
+    with DesktopPool(size=1, sandbox_class=SlowFakeSandbox) as pool:
+        desktop = pool.acquire()
+        assert pool.stats.misses == 1 and pool.stats.hits == 0
+        pool.release(desktop)
+
+
+def test_recycle():
+    with DesktopPool(size=1, recycle=True, sandbox_class=SlowFakeSandbox) as pool:
+        wait_until(lambda: pool.stats.ready == 1)
+        first = pool.acquire()
+        wait_until(lambda: pool.stats.booting == 0)
+
+        # The pool is full again, so the released desktop is killed
+        pool.release(first)
+        wait_until(lambda: first.killed)
+
+        second = pool.acquire()
+        pool.release(second)
+        assert not second.killed
+        assert pool.stats.recycled == 1
+        # The sandbox lasts its full timeout again
+        assert second.timeouts == [300]
+        assert pool.acquire() is second
+
+
+def test_recycled_desktops_idle_from_release():
+    with DesktopPool(
+        size=1, max_idle=0.3, recycle=True, sandbox_class=FakeSandbox
+    ) as pool:
+        wait_until(lambda: pool.stats.ready == 1)
+        desktop = pool.acquire()
+        wait_until(lambda: pool.stats.ready == 1)
+        # Used for longer than max_idle, which doesn't count towards the idle time
+        time.sleep(0.4)
+        # Take the desktop the pool refilled with, to make room for the released one
+        spare = pool._take()
+
+        pool.release(desktop)
+        assert pool.acquire() is desktop
+        assert not desktop.killed
+        pool.release(spare, recycle=False)
+
+
+def test_desktop_context_manager():
+    with DesktopPool(size=1, recycle=True, sandbox_class=FakeSandbox) as pool:
+        with pytest.raises(ValueError):
+            with pool.desktop() as desktop:
+                raise ValueError("Task failed")
+
+        # Desktops are not recycled after a failure
+        wait_until(lambda: desktop.killed)
+        assert pool.stats.recycled == 0
+
+
+def test_idle_desktops_are_replaced():
+    with DesktopPool(size=1, max_idle=0.2, sandbox_class=FakeSandbox) as pool:
+        wait_until(lambda: pool.stats.ready == 1)
+        time.sleep(0.3)
+
+        desktop = pool.acquire()
+        assert not desktop.killed
+        wait_until(lambda: pool.stats.killed >= 1)
+        pool.release(desktop)
+
+
+def test_close():
+    pool = DesktopPool(size=2, sandbox_class=FakeSandbox)
+    wait_until(lambda: pool.stats.ready == 2)
+    pool.close()
+
+    assert pool.stats.ready == 0
+    assert pool.stats.killed == 2
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_async_pool():
+    async def run():
+        async with AsyncDesktopPool(size=2, sandbox_class=FakeAsyncSandbox) as pool:
+            await asyncio.sleep(FakeAsyncSandbox.boot_time * 3)
+            assert pool.stats.ready == 2
+
+            async with pool.desktop() as desktop:
+                assert not desktop.killed
+
+            assert pool.stats.hits == 1
+            await asyncio.sleep(FakeAsyncSandbox.boot_time * 3)
+            assert desktop.killed
+            assert pool.stats.ready == 2
+        assert pool.stats.ready == 0
+
+    asyncio.run(run())
@@ -0,0 +1,143 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from e2b_desktop.capture import screen_wait_command
+from e2b_desktop.screen_wait import parse_screen_change
+
+SCRIPT = Path(__file__).parent.parent / "e2b_desktop" / "scripts" / "screen_wait.py"
+
+# Writes 16x12 frames forever: `changes` frames with a growing white patch, then the last one again
+CAPTURE = """
+import sys, time
+changes = int(sys.argv[1])
+n = 0
+while True:
+    frame = bytearray(16 * 12 * 3)
+    for row in range(5, 7):
+        for col in range(4, 4 + min(n, changes)):
+            frame[(row * 16 + col) * 3 : (row * 16 + col + 1) * 3] = b"\\xff\\xff\\xff"
+    sys.stdout.buffer.write(frame)
+    sys.stdout.buffer.flush()
+    n += 1
+    time.sleep(0.005)
+"""
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("screen_wait_script", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def wait(tmp_path, monkeypatch, capsys):
+    script = load_script()
+    monkeypatch.setattr(script, "CACHE_DIR", str(tmp_path))
+
+    def run(mode, changes, since="-", quiet_ms=0, timeout=5, display=":0"):
+        monkeypatch.setenv("DISPLAY", display)
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["screen_wait.py", mode, str(timeout), str(quiet_ms), "1", since]
+            + ["100", "200", "16", "12", "--", sys.executable, "-c", CAPTURE]
+            + [str(changes)],
+        )
+        script.main()
+        return parse_screen_change(capsys.readouterr().out)
+
+    return run
+
+
+def test_screen_wait_command():
+    command = screen_wait_command(
+        ":1", "/tmp/screen_wait.py", "stable", 5, fps=10, region=(10, 20, 300, 200)
+    )
+    assert command.startswith(
+        "DISPLAY=:1 python3 /tmp/screen_wait.py stable 5 0 1 - 10 20 300 200 -- ffmpeg"
+    )
+    assert "-framerate 10" in command
+    assert "-video_size 300x200 -i :1+10,20" in command
+    assert "-draw_mouse 0" in command
+    assert command.endswith("-f rawvideo -pix_fmt rgb24 -")
+
+
+def test_screen_wait_command_full_screen_since():
+    command = screen_wait_command(":0", "/tmp/w.py", "change", 5, fps=20, since="ab12")
+    assert "change 5 0 1 ab12 0 0 0 0 --" in command
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"mode": "idle"},
+        {"timeout": 0},
+        {"fps": 0},
+        {"quiet_ms": -1},
+        {"min_changed_pixels": 0},
+        {"since": "$(reboot)"},
+    ],
+)
+def test_screen_wait_command_invalid(options):
+    arguments = {"mode": "change", "timeout": 5, "fps": 20, **options}
+    with pytest.raises(ValueError):
+        screen_wait_command(":0", "/tmp/w.py", **arguments)
+
+
+def test_wait_for_change(wait):
+    result = wait("change", 1)
+    assert result.done and result.changed
+    assert result.box == (104, 205, 1, 2)
+
+
+def test_wait_for_change_since_last_frame(wait):
+    first = wait("change", 1)
+    # The patch disappeared before the next wait started, it still counts as a change
+    result = wait("change", 0, since=first.hash)
+    assert result.done and result.box == (104, 205, 1, 2)
+    # Without the hash, changes count from the first frame of the wait
+    assert not wait("change", 0, timeout=0.3).done
+    # Nothing changed since the last frame
+    result = wait("change", 0, since=result.hash, timeout=0.3)
+    assert not result.done and result.box is None
+
+
+def test_wait_since_last_frame_per_display(wait):
+    first = wait("change", 1)
+    # A wait on the same region of another display keeps its own last frame
+    wait("change", 0, timeout=0.3, display=":1")
+    result = wait("change", 0, since=first.hash)
+    assert result.done and result.box == (104, 205, 1, 2)
+
+
+def test_wait_until_stable(wait):
+    result = wait("stable", 5, quiet_ms=100)
+    assert result.done
+    assert result.box == (104, 205, 5, 2)
+    assert result.elapsed_ms >= 100
+
+
+def test_screen_capture_error(tmp_path, monkeypatch, capsys):
+    script = load_script()
+    monkeypatch.setattr(script, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["screen_wait.py", "change", "5", "0", "1", "-", "0", "0", "16", "12"]
+        + ["--", sys.executable, "-c", "pass"],
+    )
+    with pytest.raises(SystemExit):
+        script.main()
+    with pytest.raises(RuntimeError, match="screen capture exited"):
+        parse_screen_change(capsys.readouterr().out)
+
+
+def test_parse_screen_change():
+    result = parse_screen_change(
+        json.dumps({"done": True, "box": None, "elapsed_ms": 12.5, "hash": "ab"})
+    )
+    assert result.done and not result.changed
@@ -0,0 +1,66 @@
+import json
+import shlex
+
+import pytest
+from e2b_desktop.boot import BootProgress, session_command_for
+
+SESSION_OUTPUT = (
+    '{"phase": "session_started", "ms": 2.0, "pid": 43}\n'
+    '{"phase": "session", "ms": 80.0}\n'
+)
+
+
+@pytest.fixture
+def make_sandbox(offline_sandbox):
+    def create(alive: bool, session_command):
+        sbx = offline_sandbox(
+            {"ps ": "alive\n" if alive else "", "python3 -c": SESSION_OUTPUT}
+        )
+        sbx._session_pid = 42
+        sbx._session_command = session_command
+        return sbx
+
+    return create
+
+
+def test_session_command_for():
+    assert session_command_for("xfce") == ["startxfce4"]
+    assert session_command_for("openbox") == ["openbox"]
+    assert session_command_for("none") == []
+    # A custom command takes precedence
+    assert session_command_for("xfce", ["fluxbox"]) == ["fluxbox"]
+
+    with pytest.raises(ValueError, match="session must be one of"):
+        session_command_for("kde")
+
+
+def test_boot_without_session():
+    # The launcher reports no pid and the session right away
+    progress = BootProgress("x11")
+    assert not progress.feed('{"phase": "x11", "ms": 1.0}\n')
+    assert progress.feed('{"phase": "session_started", "ms": 1.5, "pid": null}\n')
+    assert progress.session_started and progress.session_pid is None
+
+
+def test_ensure_session(make_sandbox):
+    sbx = make_sandbox(alive=True, session_command=["openbox"])
+    assert not sbx.ensure_session()
+    assert sbx._commands.commands == [
+        "ps -o stat= -p 42 | grep -qv '^Z' && echo alive; true"
+    ]
+
+    # Only the session is restarted, on the running display
+    sbx = make_sandbox(alive=False, session_command=["openbox"])
+    assert sbx.ensure_session()
+    config = json.loads(shlex.split(sbx._commands.commands[-1])[-1])
+    assert config == {
+        "display": ":0",
+        "session_command": ["openbox"],
+        "session_timeout": 60,
+    }
+    assert sbx._session_pid == 43
+
+    # There is nothing to restart without a session
+    sbx = make_sandbox(alive=False, session_command=[])
+    assert not sbx.ensure_session()
+    assert sbx._commands.commands == []
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from e2b_desktop.state import _AsyncDesktopState, _DesktopState, _StateCache
+
+SNAPSHOT = {
+    "screen": [1024, 768],
+    "pointer": [10, 20],
+    "focus": 4194311,
+    "windows": [
+        [4194305, "xfce4-panel", "Xfce4-panel", "xfce4-panel", True],
+        [4194311, "Navigator", "firefox", "Mozilla Firefox", True],
+        [4194320, "Navigator", "firefox", "Hidden", False],
+    ],
+}
+
+
+def report(**fields) -> str:
+    return json.dumps(fields) + "\n"
+
+
+def test_cache_answers_from_reports():
+    cache = _StateCache()
+    assert cache.pointer() is None
+
+    cache.feed(report(**SNAPSHOT))
+    assert cache.pointer() == (10, 20)
+    assert cache.screen() == (1024, 768)
+    assert cache.focus() == "4194311"
+    assert cache.application_windows("Firefox") == ["4194311"]
+    assert cache.application_windows("chrome") is None
+    assert cache.window_title("4194320") == "Hidden"
+    assert cache.window_title("1") is None
+
+    # Reports split across chunks only contain the changed fields
+    cache.feed('{"pointer": [30,')
+    assert cache.pointer() == (10, 20)
+    cache.feed(" 40]}\n")
+    assert cache.pointer() == (30, 40)
+    assert cache.screen() == (1024, 768)
+
+
+def test_cache_staleness_and_input():
+    cache = _StateCache()
+    cache.max_staleness = 0.05
+    cache.feed(report(**SNAPSHOT))
+
+    # The pointer position after a move is known, a key press may change the focus
+    cache.applied([["move", 100, 200], ["key", "Return"]])
+    assert cache.pointer() == (100, 200)
+    assert cache.focus() is None
+    cache.feed(report())
+    assert cache.focus() == "4194311"
+
+    time.sleep(0.1)
+    assert cache.pointer() is None
+    assert cache.screen() is None
+
+
+class FakeHandle:
+    def __init__(self, lines):
+        self.pid = 1
+        self._lines = lines
+        self._killed = threading.Event()
+
+    def __iter__(self):
+        for line in self._lines:
+            yield line, None, None
+        self._killed.wait()
+
+    def kill(self):
+        self._killed.set()
+        return True
+
+
+class FakeDesktop:
+    def __init__(self, commands):
+        self.commands = commands
+
+    def _upload_script(self, name):
+        return f"/tmp/{name}"
+
+
+def test_state_start_stop(fake_commands):
+    desktop = FakeDesktop(
+        fake_commands(handle=lambda: FakeHandle([report(**SNAPSHOT)]))
+    )
+    state = _DesktopState(desktop)
+    state.start(max_staleness=2)
+
+    assert state.running
+    assert desktop.commands.commands == ["python3 /tmp/state_watcher.py 20 1000"]
+    assert state._cache.pointer() == (10, 20)
+
+    with pytest.raises(RuntimeError):
+        state.start()
+
+    state.stop()
+    assert not state.running
+    assert state._cache.pointer() is None
+
+
+def test_state_start_timeout(fake_commands):
+    state = _DesktopState(FakeDesktop(fake_commands(handle=lambda: FakeHandle([]))))
+    with pytest.raises(Exception, match="state watcher"):
+        state.start(timeout=0.1)
+    assert not state.running
+
+
+class FakeAsyncHandle:
+    def __init__(self):
+        self.pid = 1
+        self._killed = asyncio.Event()
+
+    async def wait(self):
+        await self._killed.wait()
+
+    async def kill(self):
+        self._killed.set()
+        return True
+
+
+class FakeAsyncCommands:
+    async def run(self, cmd, on_stdout=None, **kwargs):
+        handle = FakeAsyncHandle()
+        asyncio.get_running_loop().call_soon(on_stdout, report(**SNAPSHOT))
+        return handle
+
+
+class FakeAsyncDesktop:
+    commands = FakeAsyncCommands()
+
+    async def _upload_script(self, name):
+        return f"/tmp/{name}"
+
+
+def test_async_state_start_stop():
+    async def test():
+        state = _AsyncDesktopState(FakeAsyncDesktop())
+        await state.start()
+        assert state._cache.application_windows("firefox") == ["4194311"]
+        await state.stop()
+        assert state._cache.pointer() is None
+
+    asyncio.run(test())
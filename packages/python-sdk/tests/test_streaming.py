@@ -0,0 +1,122 @@
+import json
+import shlex
+
+import pytest
+from e2b import CommandExitException
+from e2b_desktop import StreamSettings
+from e2b_desktop.boot import BootProgress
+from e2b_desktop.streaming import (
+    stream_options,
+    stream_settings,
+    viewer_params,
+    x11vnc_flags,
+)
+
+STREAM_OUTPUT = '{"phase": "stream", "ms": 30.0, "vnc_ms": 10.0, "novnc_ms": 25.0, "novnc_pid": 7}\n'
+
+
+def launcher_config(cmd: str) -> dict:
+    return json.loads(shlex.split(cmd)[-1])
+
+
+def test_stream_settings():
+    assert stream_settings() == StreamSettings()
+    assert x11vnc_flags(stream_settings()) == ["-wait", "50"]
+    assert viewer_params(stream_settings()) == []
+
+    # Options override the profile
+    settings = stream_settings("low_bandwidth", quality=4)
+    assert settings.quality == 4
+    assert settings.compression == 9
+    assert x11vnc_flags(settings) == ["-wait", "100", "-defer", "200", "-scale", "0.75"]
+    assert viewer_params(settings) == ["quality=4", "compression=9"]
+
+    assert x11vnc_flags(stream_settings(client_cache=10))[-2:] == ["-ncache", "10"]
+
+    with pytest.raises(ValueError, match="profile"):
+        stream_settings("fast")  # type: ignore
+    with pytest.raises(ValueError, match="quality"):
+        stream_settings(quality=10)
+    with pytest.raises(ValueError, match="scale"):
+        stream_settings(scale=2)
+
+
+def test_stream_options():
+    assert stream_options(False) is None
+    assert stream_options(True) == {}
+    assert stream_options("quality") == {"profile": "quality"}
+    assert stream_options({"require_auth": True, "max_fps": 10}) == {
+        "require_auth": True,
+        "max_fps": 10,
+    }
+
+    with pytest.raises(ValueError, match="Unknown stream options: fps"):
+        stream_options({"fps": 10})
+    with pytest.raises(ValueError, match="profile"):
+        stream_options("fast")  # type: ignore
+
+
+def test_stream_start_with_profile(offline_sandbox):
+    sbx = offline_sandbox({"python3 -c": STREAM_OUTPUT})
+    sbx.stream.start(profile="low_latency", scale=0.5)
+
+    # x11vnc and the proxy are started and awaited in a single request
+    (cmd,) = sbx._commands.commands
+    assert launcher_config(cmd) == {
+        "display": ":0",
+        "stream": {
+            "vnc_port": 5900,
+            "port": 6080,
+            "flags": ["-wait", "10", "-defer", "17", "-scale", "0.5"],
+            "password": None,
+            "window_id": None,
+            "timeout": 10,
+        },
+    }
+    assert sbx.stream.get_url() == (
+        "https://6080-test.e2b.local/vnc.html"
+        "?autoconnect=true&resize=scale&quality=6&compression=1"
+    )
+    assert sbx.stream.start_timings["vnc"] == 10.0
+    assert sbx.stream.start_timings["novnc"] == 25.0
+    assert "total" in sbx.stream.start_timings
+
+    sbx.stream.stop()
+    assert sbx._commands.commands[-1] == (
+        "pkill -f '[x]11vnc -display :0 '; kill -- -7 2>/dev/null; true"
+    )
+
+
+def stream_error(message: str) -> CommandExitException:
+    return CommandExitException(
+        stdout=f'{{"error": "{message}", "ms": 1.0}}\n',
+        stderr="",
+        exit_code=1,
+        error=None,
+    )
+
+
+def test_stream_start_errors(offline_sandbox):
+    sbx = offline_sandbox({"python3 -c": stream_error("Stream is already running")})
+    with pytest.raises(RuntimeError, match="already running"):
+        sbx.stream.start(port=7000, require_auth=True)
+    # The options are only applied once the stream started
+    assert sbx.stream._port == 6080
+    assert sbx.stream._novnc_password is None
+
+    sbx._commands.outputs["python3 -c"] = stream_error(
+        "Timed out waiting for the stream"
+    )
+    with pytest.raises(Exception, match="Could not start the stream: Timed out"):
+        sbx.stream.start()
+
+
+def test_boot_progress_awaits_stream():
+    progress = BootProgress("x11", stream=True)
+    assert not progress.feed('{"phase": "x11", "ms": 1.0}\n')
+    assert not progress.feed('{"phase": "session_started", "ms": 2.0, "pid": 42}\n')
+    assert progress.feed(STREAM_OUTPUT)
+    assert progress.timings == {"x11": 1.0, "stream": 30.0}
+    assert progress.stream["novnc_pid"] == 7
+
+    assert BootProgress("none", stream=True).feed(STREAM_OUTPUT)
@@ -0,0 +1,121 @@
+import asyncio
+import importlib.util
+import struct
+from pathlib import Path
+
+import pytest
+from e2b_desktop.capture import video_stream_command
+
+SCRIPT = Path(__file__).parent.parent / "e2b_desktop" / "scripts" / "video_stream.py"
+
+
+def load_server():
+    spec = importlib.util.spec_from_file_location("video_stream_server", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def flv_tag(timestamp: int, data: bytes) -> bytes:
+    return (
+        bytes([9])
+        + len(data).to_bytes(3, "big")
+        + timestamp.to_bytes(3, "big")
+        + bytes(4)
+        + data
+        + (11 + len(data)).to_bytes(4, "big")
+    )
+
+
+def parse(reader, data: bytes):
+    async def run():
+        stream = asyncio.StreamReader()
+        stream.feed_data(data)
+        stream.feed_eof()
+        configs, frames = [], []
+        with pytest.raises(asyncio.IncompleteReadError):
+            await reader(stream, configs.append, lambda *frame: frames.append(frame))
+        return configs, frames
+
+    return asyncio.run(run())
+
+
+def test_video_stream_command():
+    command = video_stream_command(":1", "/tmp/server.py", 6201, 20, 800, "h264")
+    assert command.startswith("exec python3 /tmp/server.py 6201 flv -- ffmpeg ")
+    assert "-framerate 20 -f x11grab -draw_mouse 1 -i :1 " in command
+    assert "-b:v 800k -maxrate 800k -bufsize 800k -g 40 " in command
+
+    command = video_stream_command(
+        ":0", "/tmp/server.py", 6200, 10, 500, "vp8", scale=0.5
+    )
+    assert " 6200 ivf -- " in command
+    assert "'scale=trunc(iw*0.5/2)*2:trunc(ih*0.5/2)*2'" in command
+    assert "-c:v libvpx " in command
+
+    with pytest.raises(ValueError, match="bitrate"):
+        video_stream_command(":0", "/tmp/server.py", 6200, 10, 0, "h264")
+    with pytest.raises(ValueError, match="codec"):
+        video_stream_command(":0", "/tmp/server.py", 6200, 10, 500, "av1")  # type: ignore
+
+
+def test_read_flv():
+    server = load_server()
+    record = b"\x01\x42\xc0\x1f\xff\xe1\x00\x04SPS!"
+    data = (
+        b"FLV\x01\x01"
+        + (9).to_bytes(4, "big")
+        + bytes(4)
+        # Metadata is skipped
+        + bytes([18])
+        + (3).to_bytes(3, "big")
+        + bytes(7)
+        + b"abc"
+        + (14).to_bytes(4, "big")
+        + flv_tag(0, bytes([0x17, 0, 0, 0, 0]) + record)
+        + flv_tag(0, bytes([0x17, 1, 0, 0, 0]) + b"key")
+        + flv_tag(40, bytes([0x27, 1, 0, 0, 10]) + b"delta")
+    )
+
+    configs, frames = parse(server.read_flv, data)
+    assert configs[0]["codec"] == "avc1.42c01f"
+    assert frames == [(True, 0, b"key"), (False, 50_000, b"delta")]
+
+
+def test_read_ivf():
+    server = load_server()
+    header = b"DKIF" + struct.pack("<HH4sHHIII4x", 0, 32, b"VP80", 64, 48, 30, 1, 0)
+    data = (
+        header
+        + struct.pack("<IQ", 2, 0)
+        + b"\x00k"
+        + struct.pack("<IQ", 2, 3)
+        + b"\x01d"
+    )
+
+    configs, frames = parse(server.read_ivf, data)
+    assert configs == [{"codec": "vp8", "description": None}]
+    assert frames == [(True, 0, b"\x00k"), (False, 100_000, b"\x01d")]
+
+
+def test_new_viewer_starts_at_keyframe():
+    server = load_server()
+
+    class Writer:
+        def __init__(self):
+            self.written = []
+
+        def write(self, data):
+            self.written.append(data)
+
+    broadcaster = server.Broadcaster()
+    broadcaster.on_config({"codec": "vp8", "description": None})
+    for n in range(5):
+        broadcaster.on_frame(n == 2, n, bytes([n]))
+
+    # The config right away, then the frames since the last keyframe
+    writer = Writer()
+    viewer = server.Viewer(writer)
+    broadcaster.add(viewer)
+    assert b'"codec": "vp8"' in writer.written[0]
+    assert [message[-1] for _, message in viewer.pending] == [2, 3, 4]
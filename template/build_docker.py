@@ -1,5 +1,11 @@
+import sys
+
 from e2b import Template
-from template import template
 
-# output the template to stdout to pipe into docker buildx
-print(Template.to_dockerfile(template))
+from template import template, variant_template
+
+# output the template to stdout to pipe into docker buildx,
+# pass a variant name (minimal, browser, full) to output that variant instead
+print(
+    Template.to_dockerfile(variant_template(sys.argv[1]) if sys.argv[1:] else template)
+)
@@ -1,12 +1,20 @@
+import sys
+
 from dotenv import load_dotenv
 from e2b import Template, default_build_logger
-from template import template_with_user_workdir
+
+from template import template_with_user_workdir, variant_template, with_user_workdir
 
 load_dotenv()
 
+# Pass a variant name (minimal, browser) to build it as desktop-<variant>
+variant = sys.argv[1] if len(sys.argv) > 1 else "full"
+
 Template.build(
-    template_with_user_workdir,
-    alias="desktop",
+    template_with_user_workdir
+    if variant == "full"
+    else with_user_workdir(variant_template(variant)),
+    alias="desktop" if variant == "full" else f"desktop-{variant}",
     cpu_count=8,
     memory_mb=8192,
     on_build_logs=default_build_logger(),
@@ -1,127 +1,233 @@
+from typing import Literal
+
 from e2b import CopyItem, Template
+from e2b.template.main import TemplateBuilder
 
-template = (
-    Template(file_context_path="files")
-    .from_image("ubuntu:22.04")
-    .set_user("root")
-    .set_workdir("/")
-    .set_envs(
-        {
-            # Avoid system prompts
-            "DEBIAN_FRONTEND": "noninteractive",
-            "DEBIAN_PRIORITY": "high",
-            # Pip settings
-            "PIP_DEFAULT_TIMEOUT": "100",
-            "PIP_DISABLE_PIP_VERSION_CHECK": "1",
-            "PIP_NO_CACHE_DIR": "1",
-        }
-    )
-    # Initial system setup and packages
-    .run_cmd("yes | unminimize")
-    .apt_install(
-        [
-            "xserver-xorg",
-            "x11-xserver-utils",
-            "xvfb",
-            "x11-utils",
-            "xauth",
-            "xfce4",
-            "xfce4-goodies",
-            "util-linux",
-            "sudo",
-            "curl",
-            "git",
-            "wget",
-            "python3-pip",
-            "xdotool",
-            "scrot",
-            "ffmpeg",
-            "x11vnc",
-            "net-tools",
-            "netcat",
-            "x11-apps",
-            "libreoffice",
-            "xpdf",
-            "gedit",
-            "xpaint",
-            "tint2",
-            "galculator",
-            "pcmanfm",
-            "software-properties-common",
-            "apt-transport-https",
-            "libgtk-3-bin",
-        ]
-    )
-    .pip_install("numpy")
-    # Setup NoVNC and websockify
-    .git_clone(
-        "https://github.com/e2b-dev/noVNC.git", "/opt/noVNC", branch="e2b-desktop"
+Session = Literal["xfce", "openbox"]
+
+# What the SDK itself runs in the sandbox: the X server, a window manager for
+# `session="openbox"`, input, screenshots, recording, the stream and OCR
+X11_PACKAGES = [
+    "x11-xserver-utils",
+    "xvfb",
+    "x11-utils",
+    "xauth",
+    "util-linux",
+    "sudo",
+    "curl",
+    "git",
+    "wget",
+    "python3-pip",
+    "xdotool",
+    "scrot",
+    "ffmpeg",
+    "x11vnc",
+    "net-tools",
+    "netcat",
+    "xdg-utils",
+    "openbox",
+    # English only, add `tesseract-ocr-<language>` packages for other languages
+    "tesseract-ocr",
+]
+
+SESSION_PACKAGES: dict[Session, list[str]] = {
+    "xfce": [
+        "xserver-xorg",
+        "xfce4",
+        "xfce4-goodies",
+        "x11-apps",
+        "tint2",
+        "pcmanfm",
+        "libgtk-3-bin",
+    ],
+    # The window manager alone, it's part of every variant
+    "openbox": [],
+}
+
+OFFICE_PACKAGES = ["libreoffice", "xpdf", "gedit", "xpaint", "galculator"]
+
+# Needed to add the repositories of the browsers and VS Code
+REPOSITORY_PACKAGES = ["software-properties-common", "apt-transport-https"]
+
+BROWSER_REPOSITORIES = [
+    "add-apt-repository ppa:mozillateam/ppa",
+    "wget -q -O - https://dl-ssl.google.com/linux/linux_signing_key.pub | apt-key add -",
+    'echo "deb [arch=amd64] http://dl.google.com/linux/chrome/deb/ stable main" > /etc/apt/sources.list.d/google-chrome.list',
+]
+
+VSCODE_REPOSITORIES = [
+    "wget -qO- https://packages.microsoft.com/keys/microsoft.asc | apt-key add -",
+    'add-apt-repository -y "deb [arch=amd64] https://packages.microsoft.com/repos/vscode stable main"',
+]
+
+
+def desktop_template(
+    session: Session = "xfce",
+    browsers: bool = True,
+    office: bool = True,
+    vscode: bool = True,
+) -> TemplateBuilder:
+    """
+    Build the desktop template from the layers an agent needs.
+
+    Every layer that is left out makes the image smaller and the sandbox boot faster.
+
+    :param session: Desktop session the template provides. 'xfce' is the full desktop,
+        'openbox' only the window manager, start it with `Sandbox.create(session="openbox")`.
+    :param browsers: Install Firefox and Google Chrome.
+    :param office: Install LibreOffice and the small desktop applications (gedit, xpdf, ...).
+    :param vscode: Install VS Code.
+    """
+    template = (
+        Template(file_context_path="files")
+        .from_image("ubuntu:22.04")
+        .set_user("root")
+        .set_workdir("/")
+        .set_envs(
+            {
+                # Avoid system prompts
+                "DEBIAN_FRONTEND": "noninteractive",
+                "DEBIAN_PRIORITY": "high",
+                # Pip settings
+                "PIP_DEFAULT_TIMEOUT": "100",
+                "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+                "PIP_NO_CACHE_DIR": "1",
+            }
+        )
     )
-    .make_symlink("/opt/noVNC/vnc.html", "/opt/noVNC/index.html")
-    .git_clone(
-        "https://github.com/novnc/websockify.git",
-        "/opt/noVNC/utils/websockify",
-        branch="v0.12.0",
+    if session == "xfce":
+        # Restore man pages and the rest of a regular system for the full desktop
+        template = template.run_cmd("yes | unminimize")
+
+    packages = X11_PACKAGES + SESSION_PACKAGES[session]
+    if office:
+        packages += OFFICE_PACKAGES
+    if browsers or vscode:
+        packages += REPOSITORY_PACKAGES
+    template = (
+        template.apt_install(packages)
+        .pip_install("numpy")
+        # Setup NoVNC and websockify
+        .git_clone(
+            "https://github.com/e2b-dev/noVNC.git", "/opt/noVNC", branch="e2b-desktop"
+        )
+        .make_symlink("/opt/noVNC/vnc.html", "/opt/noVNC/index.html")
+        .git_clone(
+            "https://github.com/novnc/websockify.git",
+            "/opt/noVNC/utils/websockify",
+            branch="v0.12.0",
+        )
     )
-    # Install browsers and set up repositories
-    .run_cmd(
-        [
-            "add-apt-repository ppa:mozillateam/ppa",
-            "wget -q -O - https://dl-ssl.google.com/linux/linux_signing_key.pub | apt-key add -",
-            'echo "deb [arch=amd64] http://dl.google.com/linux/chrome/deb/ stable main" > /etc/apt/sources.list.d/google-chrome.list',
-            "wget -qO- https://packages.microsoft.com/keys/microsoft.asc | apt-key add -",
-            'add-apt-repository -y "deb [arch=amd64] https://packages.microsoft.com/repos/vscode stable main"',
-            "apt-get update",
-        ],
+
+    # Install browsers and VS Code from their repositories
+    repositories = (BROWSER_REPOSITORIES if browsers else []) + (
+        VSCODE_REPOSITORIES if vscode else []
     )
-    # Install browsers and VS Code
-    .apt_install(["firefox-esr", "google-chrome-stable", "code"])
+    if repositories:
+        template = template.run_cmd(repositories + ["apt-get update"]).apt_install(
+            (["firefox-esr", "google-chrome-stable"] if browsers else [])
+            + (["code"] if vscode else [])
+        )
+
     # Configure system settings
-    .make_symlink(
-        "/usr/bin/xfce4-terminal.wrapper",
-        "/etc/alternatives/x-terminal-emulator",
-        force=True,
-    )
-    .run_cmd("update-alternatives --set x-www-browser /usr/bin/firefox-esr")
-    .make_dir("/home/user/.config/Code/User")
-    .make_dir("/home/user/.config/xfce4/xfconf/xfce-perchannel-xml/")
-    .make_dir("/home/user/.config/autostart")
-    .run_cmd("update-desktop-database /usr/share/applications/")
-    # Copy all configuration files
-    .copy_items(
-        [
-            CopyItem(
-                src="google-chrome.desktop",
-                dest="/usr/share/applications/google-chrome.desktop",
-            ),
-            CopyItem(
-                src="settings.json",
-                dest="/home/user/.config/Code/User/settings.json",
-            ),
-            CopyItem(
-                src="wallpaper.png",
-                dest="/usr/share/backgrounds/xfce/wallpaper.png",
-            ),
-            CopyItem(
-                src="xfce4-desktop.xml",
-                dest="/home/user/.config/xfce4/xfconf/xfce-perchannel-xml/xfce4-desktop.xml",
-            ),
-            CopyItem(
-                src="screensaver.desktop",
-                dest="/home/user/.config/autostart/screensaver.desktop",
-            ),
-            CopyItem(
-                src="firefox-policies.json",
-                dest="/usr/lib/firefox-esr/distribution/policies.json",
-            ),
-            CopyItem(
-                src="firefox-autoconfig.js",
-                dest="/usr/lib/firefox-esr/defaults/pref/autoconfig.js",
-            ),
-            CopyItem(src="firefox.cfg", dest="/usr/lib/firefox-esr/firefox.cfg"),
-        ]
-    )
-)
+    if session == "xfce":
+        template = (
+            template.make_symlink(
+                "/usr/bin/xfce4-terminal.wrapper",
+                "/etc/alternatives/x-terminal-emulator",
+                force=True,
+            )
+            .make_dir("/home/user/.config/xfce4/xfconf/xfce-perchannel-xml/")
+            .make_dir("/home/user/.config/autostart")
+            .copy_items(
+                [
+                    CopyItem(
+                        src="wallpaper.png",
+                        dest="/usr/share/backgrounds/xfce/wallpaper.png",
+                    ),
+                    CopyItem(
+                        src="xfce4-desktop.xml",
+                        dest="/home/user/.config/xfce4/xfconf/xfce-perchannel-xml/xfce4-desktop.xml",
+                    ),
+                    CopyItem(
+                        src="screensaver.desktop",
+                        dest="/home/user/.config/autostart/screensaver.desktop",
+                    ),
+                ]
+            )
+        )
+    if browsers:
+        template = (
+            template.run_cmd(
+                "update-alternatives --set x-www-browser /usr/bin/firefox-esr"
+            )
+            .copy_items(
+                [
+                    CopyItem(
+                        src="google-chrome.desktop",
+                        dest="/usr/share/applications/google-chrome.desktop",
+                    ),
+                    CopyItem(
+                        src="firefox-policies.json",
+                        dest="/usr/lib/firefox-esr/distribution/policies.json",
+                    ),
+                    CopyItem(
+                        src="firefox-autoconfig.js",
+                        dest="/usr/lib/firefox-esr/defaults/pref/autoconfig.js",
+                    ),
+                    CopyItem(
+                        src="firefox.cfg", dest="/usr/lib/firefox-esr/firefox.cfg"
+                    ),
+                ]
+            )
+            .run_cmd("update-desktop-database /usr/share/applications/")
+        )
+    if vscode:
+        template = template.make_dir("/home/user/.config/Code/User").copy_items(
+            [
+                CopyItem(
+                    src="settings.json",
+                    dest="/home/user/.config/Code/User/settings.json",
+                )
+            ]
+        )
+    return template
+
+
+def with_user_workdir(template: TemplateBuilder) -> TemplateBuilder:
+    """
+    Run the sandbox as the regular user in its home directory.
+    """
+    return template.set_user("user").set_workdir("/home/user")
+
+
+VARIANTS = {
+    # The X server and what the SDK runs, with a bare window manager
+    "minimal": {
+        "session": "openbox",
+        "browsers": False,
+        "office": False,
+        "vscode": False,
+    },
+    # A browser agent: Firefox and Chrome, nothing else
+    "browser": {"session": "openbox", "office": False, "vscode": False},
+    # The full desktop of the `desktop` template
+    "full": {},
+}
+
+
+def variant_template(variant: str) -> TemplateBuilder:
+    """
+    The template of one of the `VARIANTS`.
+    """
+    if variant not in VARIANTS:
+        raise ValueError(
+            f"variant must be one of {', '.join(VARIANTS)}, got {variant!r}"
+        )
+    return desktop_template(**VARIANTS[variant])
+
+
+template = desktop_template()
 
 # Template with user and workdir set
-template_with_user_workdir = template.set_user("user").set_workdir("/home/user")
+template_with_user_workdir = with_user_workdir(template)